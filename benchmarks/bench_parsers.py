@@ -0,0 +1,39 @@
+# -*- coding:utf-8 -*-
+"""
+历史行情解析性能对比
+
+对比逐行split + 逐列to_numeric的旧解析方式（parse_rows_legacy）与按固定列类型一次解析的parse_rows，
+数据为 fixtures 目录下按接口格式保存的 klines（5分钟K线）和 trends（分时）响应，
+重复拼接以模拟多只股票的数据量。
+
+运行方式: PYTHONPATH=src python benchmarks/bench_parsers.py
+"""
+import json
+import os
+import time
+import pandas as pd
+from nebula.core.kline_parser import KLINE_MINUTE, TRENDS, parse_rows, parse_rows_legacy
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+# 每个响应重复的次数，相当于同时解析的股票数
+REPEAT = 100
+
+def load_rows(filename: str, data_key: str) -> list:
+    with open(os.path.join(FIXTURES, filename), encoding="utf-8") as f:
+        return json.load(f)["data"][data_key]
+
+def run(name: str, func, rows: list) -> pd.DataFrame:
+    start = time.perf_counter()
+    result = func(rows)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<32} {len(rows):>8} rows  {elapsed:8.3f}s  {len(rows) / elapsed:>12,.0f} rows/s")
+    return result
+
+if __name__ == "__main__":
+    for filename, data_key, schema in [("kline_5min_600900.json", "klines", KLINE_MINUTE),
+                                       ("trends_1min_600900.json", "trends", TRENDS)]:
+        rows = load_rows(filename, data_key) * REPEAT
+        print(f"{data_key} ({filename} x {REPEAT})")
+        legacy = run("  parse_rows_legacy", lambda r: parse_rows_legacy(r, schema["columns"]), rows)
+        fast = run("  parse_rows", lambda r: parse_rows(r, schema), rows)
+        pd.testing.assert_frame_equal(legacy, fast)
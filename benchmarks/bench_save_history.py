@@ -0,0 +1,74 @@
+# -*- coding:utf-8 -*-
+"""
+历史行情写入性能对比
+
+对比逐行execute的旧实现、executemany版本的save_history_data以及按列批量写入的save_history_frame，
+数据为5年的5分钟K线（约6万行）。
+
+运行方式: PYTHONPATH=src python benchmarks/bench_save_history.py
+"""
+import os
+import sqlite3
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from nebula.utils.database import DatabaseManager
+
+ROWS = 5 * 250 * 48
+
+def make_minute_frame(rows: int = ROWS) -> pd.DataFrame:
+    """生成模拟的5分钟K线数据"""
+    rng = np.random.default_rng(0)
+    close = 20 + np.cumsum(rng.normal(0, 0.02, rows))
+    return pd.DataFrame({
+        "时间": pd.date_range("2020-01-02 09:35:00", periods=rows, freq="5min").astype(str),
+        "开盘": close + rng.normal(0, 0.01, rows),
+        "收盘": close,
+        "最高": close + 0.05,
+        "最低": close - 0.05,
+        "成交量": rng.integers(100, 100000, rows),
+        "成交额": rng.uniform(1e5, 1e8, rows),
+        "振幅": rng.uniform(0, 2, rows),
+        "涨跌幅": rng.normal(0, 1, rows),
+        "涨跌额": rng.normal(0, 0.1, rows),
+        "换手率": rng.uniform(0, 1, rows),
+    })
+
+def legacy_save_history_data(db_path: str, symbol: str, history_data: list) -> int:
+    """旧实现：每行重新拼接SQL并单独execute"""
+    saved_count = 0
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        columns = ['symbol', 'datetime', 'open', 'high', 'low', 'close', 'volume', 'amount', 'average',
+                   'period', 'adjust']
+        for row in history_data:
+            values = (symbol, row['时间'], float(row['开盘']), float(row['最高']), float(row['最低']),
+                      float(row['收盘']), int(row['成交量']), float(row['成交额']), float(row.get('均价', 0)),
+                      '5', '')
+            placeholders = ', '.join(['?' for _ in columns])
+            insert_sql = f'''
+                INSERT OR REPLACE INTO stock_minute
+                ({', '.join(columns)})
+                VALUES ({placeholders})
+            '''
+            cursor.execute(insert_sql, values)
+            saved_count += 1
+        conn.commit()
+    return saved_count
+
+def run(name: str, func) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseManager(os.path.join(tmp_dir, "bench.db"))
+        start = time.perf_counter()
+        count = func(db)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<32} {count:>8} rows  {elapsed:8.3f}s  {count / elapsed:>12,.0f} rows/s")
+
+if __name__ == "__main__":
+    frame = make_minute_frame()
+    # 旧调用方需要先把DataFrame转换为记录列表，这部分开销计入前两项
+    run("legacy per-row execute", lambda db: legacy_save_history_data(db.db_path, "600900",
+                                                                      frame.to_dict(orient="records")))
+    run("save_history_data", lambda db: db.save_history_data("600900", frame.to_dict(orient="records"), "5"))
+    run("save_history_frame", lambda db: db.save_history_frame("600900", frame, "5"))
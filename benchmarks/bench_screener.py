@@ -0,0 +1,56 @@
+# -*- coding:utf-8 -*-
+"""
+选股器性能测试
+
+对约5000只股票的模拟快照执行多条件筛选并按成交额取前N，对比逐只股票循环判断、
+pandas布尔表达式和Screener（首次筛选含建立排序索引，之后复用索引）。
+
+运行方式: PYTHONPATH=src python benchmarks/bench_screener.py
+"""
+import time
+import numpy as np
+import pandas as pd
+from nebula.screener import Screener
+
+ROWS = 5000
+REPEAT = 100
+CONDITIONS = ["涨跌幅 > 2", "换手率 between 1 and 10", "最新价 > EMA20"]
+
+def make_snapshot(rows: int = ROWS) -> pd.DataFrame:
+    """生成模拟的全市场快照和指标列"""
+    rng = np.random.default_rng(0)
+    price = rng.uniform(2, 200, rows)
+    return pd.DataFrame({
+        "代码": [f"{i:06d}" for i in range(rows)],
+        "最新价": price,
+        "涨跌幅": rng.normal(0, 3, rows),
+        "换手率": rng.uniform(0, 20, rows),
+        "成交额": rng.uniform(1e6, 1e10, rows),
+        "EMA20": price * rng.uniform(0.9, 1.1, rows),
+    })
+
+def loop_screen(records: list) -> list:
+    """旧方式：逐只股票判断后排序"""
+    selected = [row for row in records
+                if row["涨跌幅"] > 2 and 1 <= row["换手率"] <= 10 and row["最新价"] > row["EMA20"]]
+    return sorted(selected, key=lambda row: row["成交额"], reverse=True)[:20]
+
+def pandas_screen(frame: pd.DataFrame) -> pd.DataFrame:
+    mask = (frame["涨跌幅"] > 2) & frame["换手率"].between(1, 10) & (frame["最新价"] > frame["EMA20"])
+    return frame[mask].nlargest(20, "成交额")
+
+def run(name: str, func) -> None:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        func()
+    elapsed = (time.perf_counter() - start) / REPEAT
+    print(f"{name:<32} {elapsed * 1000:8.3f} ms/screen")
+
+if __name__ == "__main__":
+    frame = make_snapshot()
+    records = frame.to_dict(orient="records")
+    run("per-symbol loop", lambda: loop_screen(records))
+    run("pandas boolean mask", lambda: pandas_screen(frame))
+    run("Screener (new instance)", lambda: Screener(frame).screen(CONDITIONS, rank_by="成交额", top=20))
+    screener = Screener(frame)
+    run("Screener (reused indexes)", lambda: screener.screen(CONDITIONS, rank_by="成交额", top=20))
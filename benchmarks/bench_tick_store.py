@@ -0,0 +1,54 @@
+# -*- coding:utf-8 -*-
+"""
+逐笔快照存储性能测试
+
+模拟一个交易日内每3秒一次、每次300只股票的快照（约144万条记录），测量追加写入速度，
+以及回放时全量扫描、按时间区间定位和按股票过滤的耗时，并与解析JSON行的方式对比。
+
+运行方式: PYTHONPATH=src python benchmarks/bench_tick_store.py
+"""
+import json
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from nebula.utils.tick_store import TickStore, TICK_COLUMNS
+
+SYMBOLS = 300
+SNAPSHOTS = 4800
+
+def make_snapshot(rng: np.random.Generator) -> dict:
+    """生成一次模拟快照"""
+    snapshot = {"代码": [f"{600000 + i}" for i in range(SYMBOLS)]}
+    for _, _, label in TICK_COLUMNS[2:]:
+        snapshot[label] = rng.uniform(1, 100, SYMBOLS).round(2).tolist()
+    return snapshot
+
+def timed(name: str, func, rows: int):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<32} {elapsed * 1000:10.1f} ms  {rows / elapsed / 1e6:8.2f} M rows/s")
+    return result
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    snapshots = [make_snapshot(rng) for _ in range(20)]
+    frames = [pd.DataFrame(snapshot) for snapshot in snapshots]
+    times = pd.date_range("2026-10-16 09:30:00", periods=SNAPSHOTS, freq="3s")
+    total = SYMBOLS * SNAPSHOTS
+
+    with tempfile.TemporaryDirectory() as root:
+        store = TickStore(root)
+        timed("append", lambda: [store.append(frames[i % 20], t) for i, t in enumerate(times)],
+              total)
+
+        timed("replay full day (memmap)", lambda: sum(float(chunk["last"].sum()) for chunk in store.replay()), total)
+        window = timed("slice 10 minutes", lambda: store.read("2026-10-16 10:00:00", "2026-10-16 10:10:00"), total)
+        print(f"{'':<32} {len(window)} rows in window")
+        timed("filter 1 symbol", lambda: store.read(symbols=["600100"]), total)
+        timed("to_frame (full day)", lambda: store.to_frame(store.read()), total)
+
+        lines = [json.dumps(dict(zip(snapshots[0], row)), ensure_ascii=False)
+                 for row in zip(*snapshots[0].values())] * (total // SYMBOLS // 10)
+        timed("json lines parse (1/10 day)", lambda: [json.loads(line) for line in lines], len(lines))
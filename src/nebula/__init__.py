@@ -1,6 +1,8 @@
-from .core.realtime_quote import get_stock_realtime_quote
+from .core.realtime_quote import get_stock_realtime_quote, get_stock_realtime_quotes
 from .core.history_quote import get_stock_history_quote
 from .core.stock_info import get_stock_info
 from .core.board_quote import get_stock_board_quote
 from .core.hot_rank import get_stock_hot_rank
-from .core.indicators import get_stock_indicators
\ No newline at end of file
+from .core.indicators import get_stock_indicators
+from .core.market_snapshot import get_market_snapshot
+from .core.subscriptions import subscribe, SubscriptionManager
\ No newline at end of file
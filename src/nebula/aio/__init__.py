@@ -0,0 +1,9 @@
+from .realtime_quote import get_stock_realtime_quote, get_stock_realtime_quotes
+from .history_quote import get_stock_history_quote
+from .stock_info import get_stock_info
+from .board_quote import get_stock_board_quote
+from .hot_rank import get_stock_hot_rank
+from .indicators import get_stock_indicators
+from .market_snapshot import get_market_snapshot
+from .cache import AsyncCacheManager, async_cache_manager
+from .transport import AsyncTransport, async_transport
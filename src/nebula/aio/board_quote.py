@@ -0,0 +1,25 @@
+# -*- coding:utf-8 -*-
+import json
+from typing import Optional
+from ..core.board_quote import BOARD_URL, BOARD_PARAMS, _parse_board_quote
+from ..utils.errors import NetworkError
+from ..utils.retry import DeadlineExceeded
+from .transport import async_transport, deadline_timeout
+
+async def get_stock_board_quote(deadline: Optional[float] = None) -> str:
+    """
+    东方财富网-行情中心-沪深京板块-概念板块-名称（异步）
+    :param deadline: 整个调用的最长耗时（秒），超过时放弃请求，默认不限
+    :return: 概念板块-名称（JSON 格式）
+    """
+    try:
+        async with deadline_timeout(deadline):
+            data_json = await async_transport.get_json(BOARD_URL, params=BOARD_PARAMS)
+        temp_df = _parse_board_quote(data_json)
+        if temp_df is None:
+            return json.dumps({"error": "No data found"}, ensure_ascii=False)
+        return temp_df.to_json(orient='records', force_ascii=False, indent=2)
+    except (NetworkError, DeadlineExceeded) as e:
+        return json.dumps({"error": f"Request failed: {str(e)}"}, ensure_ascii=False)
+    except Exception as e:
+        return json.dumps({"error": f"An unexpected error occurred: {str(e)}"}, ensure_ascii=False)
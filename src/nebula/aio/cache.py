@@ -0,0 +1,175 @@
+# -*- coding:utf-8 -*-
+import asyncio
+import json
+import redis.asyncio as aioredis
+from typing import Optional, Any, Dict, List
+from ..utils.cache import LocalCache
+from ..utils.config import config
+from ..utils.logger import logger
+
+class AsyncCacheManager:
+    """异步缓存管理器，使用redis.asyncio客户端，连接失败时退回进程内LRU缓存"""
+    
+    def __init__(self, url: Optional[str] = None, host: Optional[str] = None, port: Optional[int] = None,
+                 db: Optional[int] = None, password: Optional[str] = None, default_ttl: Optional[int] = None):
+        """
+        初始化异步缓存管理器
+        
+        Args:
+            url: Redis连接URL（优先使用）
+            host: Redis服务器地址
+            port: Redis服务器端口
+            db: Redis数据库编号
+            password: Redis密码（如果需要）
+            default_ttl: 默认过期时间（秒）
+        """
+        redis_config = config.get_redis_config()
+        self.url = url or redis_config['url']
+        self.host = host or redis_config['host']
+        self.port = port or redis_config['port']
+        self.db = db or redis_config['db']
+        self.password = password or redis_config['password']
+        self.default_ttl = default_ttl or redis_config['default_ttl']
+        
+        self.redis_client = None
+        cache_config = config.get_cache_config()
+        self._local_cache = LocalCache(cache_config['l1_max_items'], cache_config['l1_max_bytes'])
+        self._loop = None
+        self._connect_lock = None
+        self._lock_loop = None
+    
+    async def _get_client(self):
+        """获取当前事件循环上的Redis客户端，首次使用时连接"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return self.redis_client
+        
+        # 每个事件循环只创建一次连接锁，同一循环上并发的首次调用共用同一把锁
+        if self._lock_loop is not loop:
+            self._connect_lock = asyncio.Lock()
+            self._lock_loop = loop
+        async with self._connect_lock:
+            if self._loop is loop:
+                return self.redis_client
+            try:
+                if self.url and self.url != 'redis://localhost:6379/0':
+                    client = aioredis.from_url(self.url, decode_responses=True)
+                else:
+                    client = aioredis.Redis(host=self.host, port=self.port, db=self.db,
+                                            password=self.password, decode_responses=True)
+                await client.ping()
+                self.redis_client = client
+                logger.info("异步客户端成功连接到Redis服务器")
+            except Exception as e:
+                logger.warning(f"异步客户端无法连接到Redis服务器: {e}，将使用进程内缓存作为后备缓存")
+                self.redis_client = None
+            self._loop = loop
+        return self.redis_client
+    
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        """设置缓存值"""
+        try:
+            serialized_value = json.dumps(value, ensure_ascii=False)
+            expire_time = ttl if ttl is not None else self.default_ttl
+            client = await self._get_client()
+            if client:
+                return bool(await client.setex(key, expire_time, serialized_value))
+            return self._local_cache.set(key, serialized_value, expire_time)
+        except Exception as e:
+            logger.error(f"设置缓存时出错: {e}")
+            return False
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """获取缓存值，不存在或过期时返回None"""
+        try:
+            client = await self._get_client()
+            if client:
+                serialized_value = await client.get(key)
+            else:
+                serialized_value = self._local_cache.get(key)
+            return json.loads(serialized_value) if serialized_value is not None else None
+        except Exception as e:
+            logger.error(f"获取缓存时出错: {e}")
+            return None
+    
+    async def delete(self, key: str) -> bool:
+        """删除缓存值"""
+        try:
+            client = await self._get_client()
+            if client:
+                return await client.delete(key) > 0
+            return self._local_cache.delete(key)
+        except Exception as e:
+            logger.error(f"删除缓存时出错: {e}")
+            return False
+    
+    async def exists(self, key: str) -> bool:
+        """检查缓存键是否存在且未过期"""
+        try:
+            client = await self._get_client()
+            if client:
+                return await client.exists(key) > 0
+            return await self.get(key) is not None
+        except Exception as e:
+            logger.error(f"检查缓存存在时出错: {e}")
+            return False
+    
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """批量获取缓存值（Redis上为一次MGET），不包含不存在或过期的键"""
+        try:
+            keys = list(dict.fromkeys(keys))
+            if not keys:
+                return {}
+            client = await self._get_client()
+            if client:
+                values = await client.mget(keys)
+                serialized = {key: value for key, value in zip(keys, values) if value is not None}
+            else:
+                serialized = self._local_cache.get_many(keys)
+            return {key: json.loads(serialized[key]) for key in keys if key in serialized}
+        except Exception as e:
+            logger.error(f"批量获取缓存时出错: {e}")
+            return {}
+    
+    async def set_many(self, mapping: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """批量设置缓存值（Redis上为一次管道往返）"""
+        if not mapping:
+            return True
+        try:
+            serialized = {key: json.dumps(value, ensure_ascii=False) for key, value in mapping.items()}
+            expire_time = ttl if ttl is not None else self.default_ttl
+            client = await self._get_client()
+            if client:
+                pipe = client.pipeline(transaction=False)
+                for key, serialized_value in serialized.items():
+                    pipe.setex(key, expire_time, serialized_value)
+                return all(await pipe.execute())
+            self._local_cache.set_many(serialized, expire_time)
+            return True
+        except Exception as e:
+            logger.error(f"批量设置缓存时出错: {e}")
+            return False
+    
+    async def delete_many(self, keys: List[str]) -> int:
+        """批量删除缓存值，返回删除的键数量"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return 0
+        try:
+            client = await self._get_client()
+            if client:
+                return await client.delete(*keys)
+            return self._local_cache.delete_many(keys)
+        except Exception as e:
+            logger.error(f"批量删除缓存时出错: {e}")
+            return 0
+    
+    async def close(self):
+        """关闭Redis连接"""
+        if self.redis_client is not None:
+            await self.redis_client.aclose()
+        self.redis_client = None
+        self._loop = None
+
+# 全局异步缓存管理器实例
+async_cache_manager = AsyncCacheManager()
@@ -0,0 +1,114 @@
+# -*- coding:utf-8 -*-
+import asyncio
+import json
+import pandas as pd
+from typing import Optional
+from ..core.history_quote import (
+    RANGE_CACHE_PERIODS, _build_history_request, _parse_history, _history_store,
+    _range_bounds, _range_cache_key, _plan_range_fetch, _merge_range
+)
+from ..utils.errors import NetworkError
+from ..utils.logger import logger
+from ..utils.retry import DeadlineExceeded
+from ..utils.trading_calendar import ttl_policy
+from .cache import async_cache_manager
+from .transport import async_transport, deadline_timeout
+
+async def _fetch_history(symbol: str, period: str, start_date: Optional[str], end_date: Optional[str],
+                         adjust: str, timeout: Optional[float]):
+    """请求一个区间的历史行情（异步）"""
+    request = _build_history_request(symbol, period, start_date, end_date, adjust)
+    data_json = await async_transport.get_json(request["url"], params=request["params"], timeout=timeout)
+    return _parse_history(data_json, request)
+
+async def get_stock_history_frame(
+    symbol: str = "600900",
+    period: str = "5",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    adjust: str = "",
+    timeout: Optional[float] = None,
+    use_cache: bool = True,
+    save_to_db: bool = True,
+    storage: Optional[str] = None,
+    deadline: Optional[float] = None
+) -> pd.DataFrame:
+    """
+    获取股票历史行情DataFrame（异步），请求失败时抛出异常，日线和分钟线使用区间缓存，各缺口并发请求
+    :param deadline: 整个调用的最长耗时（秒），各缺口请求共用，超过时抛出 DeadlineExceeded，默认不限
+    """
+    async with deadline_timeout(deadline):
+        return await _get_history_frame(symbol, period, start_date, end_date, adjust, timeout,
+                                        use_cache, save_to_db, storage)
+
+async def _get_history_frame(symbol: str, period: str, start_date: Optional[str], end_date: Optional[str],
+                             adjust: str, timeout: Optional[float], use_cache: bool, save_to_db: bool,
+                             storage: Optional[str]) -> pd.DataFrame:
+    """获取历史行情DataFrame，参数同 get_stock_history_frame"""
+    if use_cache and period in RANGE_CACHE_PERIODS:
+        start, end = _range_bounds(period, start_date, end_date)
+        cache_key = _range_cache_key(symbol, period, adjust)
+        entry = await async_cache_manager.get(cache_key)
+        gaps = _plan_range_fetch(entry, start, end)
+        fetched = await asyncio.gather(*[
+            _fetch_history(symbol, period, gap_start, gap_end, adjust, timeout) for gap_start, gap_end in gaps
+        ])
+        temp_df, new_entry = _merge_range(entry, list(fetched), start, end, period)
+        if new_entry is not None:
+            await async_cache_manager.set(cache_key, new_entry, ttl_policy.ttl('history', end=new_entry["end"]))
+
+        fetched = [frame for frame in fetched if frame is not None and not frame.empty]
+        if save_to_db and fetched:
+            saved_count = await asyncio.to_thread(_history_store(storage).save_history_frame, symbol,
+                                                  pd.concat(fetched, ignore_index=True), period, adjust)
+            logger.info(f"历史行情数据已保存到数据库: {symbol}, 保存了 {saved_count} 条记录")
+        return temp_df if temp_df is not None else pd.DataFrame()
+
+    cache_key = f"history_quote_{symbol}_{period}_{start_date}_{end_date}_{adjust}"
+    if use_cache:
+        cached_data = await async_cache_manager.get(cache_key)
+        if cached_data:
+            logger.info(f"从缓存获取历史行情数据: {symbol}, period={period}")
+            return pd.DataFrame(json.loads(cached_data) if isinstance(cached_data, str) else cached_data)
+
+    temp_df = await _fetch_history(symbol, period, start_date, end_date, adjust, timeout)
+    if temp_df is None:
+        return pd.DataFrame()
+
+    if use_cache:
+        await async_cache_manager.set(cache_key, temp_df.to_dict(orient='records'),
+                                      ttl_policy.ttl('history', end=end_date))
+        logger.info(f"历史行情数据已缓存: {symbol}, period={period}")
+
+    if save_to_db:
+        saved_count = await asyncio.to_thread(_history_store(storage).save_history_frame, symbol, temp_df,
+                                              period, adjust)
+        logger.info(f"历史行情数据已保存到数据库: {symbol}, 保存了 {saved_count} 条记录")
+
+    return temp_df
+
+async def get_stock_history_quote(
+    symbol: str = "600900",
+    period: str = "5",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    adjust: str = "",
+    timeout: Optional[float] = None,
+    use_cache: bool = True,
+    save_to_db: bool = True,
+    storage: Optional[str] = None,
+    deadline: Optional[float] = None
+) -> str:
+    """获取股票历史行情数据（异步），参数同 get_stock_history_frame"""
+    try:
+        temp_df = await get_stock_history_frame(symbol, period, start_date, end_date, adjust, timeout,
+                                                use_cache, save_to_db, storage, deadline)
+        if temp_df.empty:
+            return "[]"
+        return temp_df.to_json(orient='records', force_ascii=False, indent=2)
+    except (NetworkError, DeadlineExceeded) as e:
+        logger.error(f"请求历史行情数据时出错: {str(e)}")
+        return f"请求错误: {str(e)}"
+    except Exception as e:
+        logger.error(f"获取历史行情数据时出错: {str(e)}")
+        return f"发生错误: {str(e)}"
@@ -0,0 +1,18 @@
+# -*- coding:utf-8 -*-
+import json
+from typing import Optional
+from ..core.hot_rank import RANK_URL, RANK_PAYLOAD, QUOTE_URL, _build_rank_quote_params, _parse_hot_rank, to_json
+from .transport import async_transport, deadline_timeout
+
+async def get_stock_hot_rank(deadline: Optional[float] = None) -> str:
+    """
+    东方财富-个股人气榜-人气榜（异步）
+    :param deadline: 整个调用的最长耗时（秒），两次请求共用，超过时放弃请求，默认不限
+    """
+    try:
+        async with deadline_timeout(deadline):
+            rank_json = await async_transport.post_json(RANK_URL, json=RANK_PAYLOAD)
+            quote_json = await async_transport.get_json(QUOTE_URL, params=_build_rank_quote_params(rank_json))
+        return to_json(_parse_hot_rank(rank_json, quote_json))
+    except Exception as e:
+        return json.dumps({"error": str(e)}, ensure_ascii=False)
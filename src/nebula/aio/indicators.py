@@ -0,0 +1,44 @@
+# -*- coding:utf-8 -*-
+import asyncio
+import json
+from typing import Optional
+from ..core.indicators import calculate_indicators, interpret_indicators, get_last_50_trading_days
+from ..utils.database import db_manager
+from ..utils.logger import logger
+from ..utils.trading_calendar import ttl_policy
+from .cache import async_cache_manager
+from .history_quote import get_stock_history_frame
+from .transport import deadline_timeout
+
+async def get_stock_indicators(symbol: str = "600900", period: str = 'daily', use_cache: bool = True,
+                               save_to_db: bool = True, deadline: Optional[float] = None) -> str:
+    """
+    计算股票技术指标并给出操作建议（异步），请求失败时抛出异常
+    :param deadline: 整个调用的最长耗时（秒），超过时抛出 DeadlineExceeded，默认不限
+    """
+    async with deadline_timeout(deadline):
+        return await _get_stock_indicators(symbol, period, use_cache, save_to_db)
+
+async def _get_stock_indicators(symbol: str, period: str, use_cache: bool, save_to_db: bool) -> str:
+    """计算技术指标并写入缓存和数据库，参数同 get_stock_indicators"""
+    if use_cache:
+        cache_key = f"stock_indicators_{symbol}_{period}"
+        cached_data = await async_cache_manager.get(cache_key)
+        if cached_data:
+            logger.info(f"从缓存获取技术指标数据: {symbol}")
+            return json.dumps(cached_data, ensure_ascii=False, indent=2)
+
+    start_date, end_date = get_last_50_trading_days()
+    history_df = await get_stock_history_frame(symbol=symbol, period=period, start_date=start_date, end_date=end_date)
+    indicators_df = calculate_indicators(history_df)
+    advice = interpret_indicators(indicators_df)
+
+    if use_cache:
+        await async_cache_manager.set(cache_key, advice, ttl_policy.ttl('indicators'))
+        logger.info(f"技术指标数据已缓存: {symbol}")
+
+    if save_to_db:
+        saved_count = await asyncio.to_thread(db_manager.save_indicators, symbol, end_date, advice)
+        logger.info(f"技术指标数据已保存到数据库: {symbol}, 保存了 {saved_count} 条记录")
+
+    return json.dumps(advice, ensure_ascii=False, indent=2)
@@ -0,0 +1,69 @@
+# -*- coding:utf-8 -*-
+import asyncio
+import json
+import math
+from typing import Optional
+from ..core.market_snapshot import (
+    SNAPSHOT_URL, SNAPSHOT_CACHE_KEY, _build_snapshot_params, _parse_snapshot_page, _snapshot_columns
+)
+from ..utils.config import config
+from ..utils.database import db_manager
+from ..utils.errors import NetworkError
+from ..utils.logger import logger
+from ..utils.retry import DeadlineExceeded
+from ..utils.trading_calendar import ttl_policy
+from .cache import async_cache_manager
+from .transport import async_transport, deadline_timeout
+
+async def _fetch_snapshot_page(page: int, page_size: int, timeout: Optional[float]):
+    data_json = await async_transport.get_json(SNAPSHOT_URL, params=_build_snapshot_params(page, page_size),
+                                               timeout=timeout)
+    return _parse_snapshot_page(data_json)
+
+async def get_market_snapshot(use_cache: bool = True, save_to_db: bool = True, page_size: Optional[int] = None,
+                              timeout: Optional[float] = None, deadline: Optional[float] = None) -> str:
+    """
+    沪深京A股全市场快照（异步），第一页之后的各页并发请求，并发数受传输层信号量限制
+    :param deadline: 整个调用的最长耗时（秒），各页请求共用，超过时放弃请求，默认不限
+    """
+    try:
+        async with deadline_timeout(deadline):
+            return await _get_market_snapshot(use_cache, save_to_db, page_size, timeout)
+    except DeadlineExceeded as e:
+        logger.error(f"请求全市场快照超时: {str(e)}")
+        return json.dumps({"error": f"Request failed: {str(e)}"}, ensure_ascii=False)
+
+async def _get_market_snapshot(use_cache: bool, save_to_db: bool, page_size: Optional[int],
+                               timeout: Optional[float]) -> str:
+    """获取全市场快照的紧凑JSON字符串，参数同 get_market_snapshot"""
+    if use_cache:
+        cached_data = await async_cache_manager.get(SNAPSHOT_CACHE_KEY)
+        if cached_data:
+            logger.info("从缓存获取全市场快照")
+            return json.dumps(cached_data, ensure_ascii=False, separators=(",", ":"))
+
+    try:
+        page_size = page_size or config.get_snapshot_config()['page_size']
+        total, rows = await _fetch_snapshot_page(1, page_size, timeout)
+        pages = math.ceil(total / page_size) if total else 1
+        for _, page_rows in await asyncio.gather(*[
+            _fetch_snapshot_page(page, page_size, timeout) for page in range(2, pages + 1)
+        ]):
+            rows.extend(page_rows)
+        result = _snapshot_columns(rows)
+        logger.info(f"全市场快照: {total} 只股票，{pages} 页")
+
+        if use_cache:
+            await async_cache_manager.set(SNAPSHOT_CACHE_KEY, result, ttl_policy.ttl('snapshot'))
+        if save_to_db:
+            saved_count = await asyncio.to_thread(db_manager.save_stock_info_batch, [
+                {"symbol": code, "name": name} for code, name in zip(result["代码"], result["名称"])
+            ])
+            logger.info(f"全市场快照已保存到数据库: {saved_count} 只股票")
+        return json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+    except NetworkError as e:
+        logger.error(f"请求全市场快照时出错: {str(e)}")
+        return json.dumps({"error": f"Request failed: {str(e)}"}, ensure_ascii=False)
+    except Exception as e:
+        logger.error(f"获取全市场快照时出错: {str(e)}")
+        return json.dumps({"error": f"An unexpected error occurred: {str(e)}"}, ensure_ascii=False)
@@ -0,0 +1,133 @@
+# -*- coding:utf-8 -*-
+import asyncio
+import json
+import pandas as pd
+from typing import List, Optional
+from ..core.realtime_quote import (
+    BASE_URL, ULIST_URL, BATCH_SIZE, _build_quote_params, _build_list_params,
+    _build_tick_dict, _chunk_symbols, _merge_quote_frames, _parse_quote_list,
+    _quote_cache_key, _split_rows, _join_rows
+)
+from ..utils.config import config
+from ..utils.database import db_manager
+from ..utils.logger import logger
+from ..utils.retry import DeadlineExceeded
+from ..utils.trading_calendar import ttl_policy
+from .cache import async_cache_manager
+from .transport import async_transport, deadline_timeout
+
+async def get_stock_realtime_quote(symbol: str = "600900", use_cache: bool = True, save_to_db: bool = True,
+                                   deadline: Optional[float] = None) -> str:
+    """
+    东方财富-行情报价（异步）
+    :param symbol: 股票代码
+    :param use_cache: 是否使用缓存
+    :param save_to_db: 是否保存到数据库
+    :param deadline: 整个调用的最长耗时（秒），超过时放弃请求，默认不限
+    :return: 行情报价的JSON字符串
+    """
+    try:
+        async with deadline_timeout(deadline):
+            return await _get_stock_realtime_quote(symbol, use_cache, save_to_db)
+    except DeadlineExceeded as e:
+        logger.error(f"获取实时行情数据超时: {str(e)}")
+        return json.dumps({"error": f"Request failed: {str(e)}"}, ensure_ascii=False)
+
+async def _get_stock_realtime_quote(symbol: str, use_cache: bool, save_to_db: bool) -> str:
+    """获取单只股票的行情报价JSON字符串，参数同 get_stock_realtime_quote"""
+    if use_cache:
+        cache_key = f"realtime_quote_{symbol}"
+        cached_data = await async_cache_manager.get(cache_key)
+        if cached_data:
+            logger.info(f"从缓存获取实时行情数据: {symbol}")
+            return json.dumps(cached_data, ensure_ascii=False, indent=2)
+
+    try:
+        data_json = await async_transport.get_json(BASE_URL, params=_build_quote_params(symbol),
+                                                   timeout=config.get_api_config()['timeout'])
+        if "data" not in data_json:
+            return '{"error": "No data found"}'
+
+        tick_dict = _build_tick_dict(data_json["data"])
+        temp_df = pd.DataFrame(list(tick_dict.items()), columns=["item", "value"])
+        result = temp_df.to_dict(orient='records')
+
+        if use_cache:
+            await async_cache_manager.set(cache_key, result, ttl_policy.ttl('realtime'))
+            logger.info(f"实时行情数据已缓存: {symbol}")
+
+        if save_to_db:
+            await asyncio.to_thread(db_manager.save_stock_info, symbol, result)
+            logger.info(f"实时行情数据已保存到数据库: {symbol}")
+
+        return temp_df.to_json(orient='records', force_ascii=False, indent=2)
+
+    except Exception as e:
+        logger.error(f"获取实时行情数据时出错: {str(e)}")
+        return json.dumps({"error": f"An unexpected error occurred: {str(e)}"}, ensure_ascii=False)
+
+async def get_stock_realtime_quotes(symbols: List[str], batch_size: int = BATCH_SIZE,
+                                    use_cache: bool = True, save_to_db: bool = True,
+                                    deadline: Optional[float] = None) -> str:
+    """
+    东方财富-批量行情报价（异步），各批次并发请求
+    :param symbols: 股票代码列表
+    :param batch_size: 每次请求包含的股票数量
+    :param use_cache: 是否使用缓存
+    :param save_to_db: 是否保存到数据库
+    :param deadline: 整个调用的最长耗时（秒），各批次共用，超过时放弃请求，默认不限
+    :return: 按列组织的行情报价JSON字符串
+    """
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return json.dumps({}, ensure_ascii=False)
+    try:
+        async with deadline_timeout(deadline):
+            return await _get_stock_realtime_quotes(symbols, batch_size, use_cache, save_to_db)
+    except DeadlineExceeded as e:
+        logger.error(f"获取批量实时行情数据超时: {str(e)}")
+        return json.dumps({"error": f"Request failed: {str(e)}"}, ensure_ascii=False)
+
+async def _get_stock_realtime_quotes(symbols: List[str], batch_size: int, use_cache: bool, save_to_db: bool) -> str:
+    """获取去重后非空股票列表的批量行情报价JSON字符串，参数同 get_stock_realtime_quotes"""
+
+    cached_rows = {}
+    if use_cache:
+        cached = await async_cache_manager.get_many([_quote_cache_key(symbol) for symbol in symbols])
+        cached_rows = {symbol: cached[_quote_cache_key(symbol)] for symbol in symbols
+                       if _quote_cache_key(symbol) in cached}
+        if len(cached_rows) == len(symbols):
+            logger.info(f"从缓存获取批量实时行情数据: {len(symbols)} 只股票")
+            columns = list(next(iter(cached_rows.values())))
+            return json.dumps(_join_rows(cached_rows, symbols, columns), ensure_ascii=False)
+
+    try:
+        missing = [symbol for symbol in symbols if symbol not in cached_rows]
+        timeout = config.get_api_config()['timeout']
+        responses = await asyncio.gather(*[
+            async_transport.get_json(ULIST_URL, params=_build_list_params(chunk), timeout=timeout)
+            for chunk in _chunk_symbols(missing, batch_size)
+        ])
+        fetched = _merge_quote_frames([_parse_quote_list(data_json) for data_json in responses], missing)
+        fetched_rows = _split_rows(fetched)
+
+        if use_cache:
+            await async_cache_manager.set_many(
+                {_quote_cache_key(symbol): row for symbol, row in fetched_rows.items()},
+                ttl_policy.ttl('realtime')
+            )
+            logger.info(f"批量实时行情数据已缓存: {len(fetched_rows)} 只股票，缓存命中 {len(cached_rows)} 只")
+
+        if save_to_db:
+            saved_count = await asyncio.to_thread(
+                db_manager.save_stock_info_batch,
+                [{"symbol": code, "name": name} for code, name in zip(fetched["代码"], fetched["名称"])]
+            )
+            logger.info(f"批量实时行情数据已保存到数据库: {saved_count} 只股票")
+
+        result = _join_rows({**cached_rows, **fetched_rows}, symbols, list(fetched))
+        return json.dumps(result, ensure_ascii=False)
+
+    except Exception as e:
+        logger.error(f"获取批量实时行情数据时出错: {str(e)}")
+        return json.dumps({"error": f"An unexpected error occurred: {str(e)}"}, ensure_ascii=False)
@@ -0,0 +1,27 @@
+# -*- coding:utf-8 -*-
+import json
+from typing import Optional
+from ..core.stock_info import BASE_URL, _build_info_params, _parse_stock_info
+from ..utils.errors import NetworkError
+from ..utils.retry import DeadlineExceeded
+from .transport import async_transport, deadline_timeout
+
+async def get_stock_info(symbol: str = "600900", timeout: float = None, deadline: Optional[float] = None) -> str:
+    """
+    东方财富-个股-股票信息（异步）
+    :param symbol: 股票代码
+    :param timeout: 请求超时时间
+    :param deadline: 整个调用的最长耗时（秒），超过时放弃请求，默认不限
+    :return: 股票信息的JSON字符串
+    """
+    try:
+        async with deadline_timeout(deadline):
+            data_json = await async_transport.get_json(BASE_URL, params=_build_info_params(symbol), timeout=timeout)
+        df = _parse_stock_info(data_json)
+        if df is None:
+            return json.dumps({"error": "No data found"}, ensure_ascii=False, indent=2)
+        return df.to_json(orient='records', force_ascii=False, indent=2)
+    except (NetworkError, DeadlineExceeded) as e:
+        return json.dumps({"error": f"Request failed: {str(e)}"}, ensure_ascii=False, indent=2)
+    except Exception as e:
+        return json.dumps({"error": f"An unexpected error occurred: {str(e)}"}, ensure_ascii=False, indent=2)
@@ -0,0 +1,170 @@
+# -*- coding:utf-8 -*-
+import asyncio
+import aiohttp
+from contextlib import asynccontextmanager
+from typing import Optional, Any, AsyncIterator
+from ..utils.config import config
+from ..utils.errors import NetworkError, APIError, DataParseError
+from ..utils.logger import logger
+from ..utils.rate_limit import RateLimiter, rate_limiter, is_overload_status
+from ..utils.retry import DeadlineExceeded
+
+@asynccontextmanager
+async def deadline_timeout(seconds: Optional[float]) -> AsyncIterator[None]:
+    """
+    异步版本的 deadline_scope：代码块内的全部请求（含并发请求和排队等待）共用一个截止时间，嵌套时取更早的截止时间
+
+    Args:
+        seconds: 距现在的秒数，None或0表示不另设截止时间
+
+    Raises:
+        DeadlineExceeded: 超过截止时间
+    """
+    if not seconds:
+        yield
+        return
+    try:
+        async with asyncio.timeout(seconds) as scope:
+            yield
+    except TimeoutError as e:
+        # 只转换本截止时间触发的超时，请求自身的超时照常抛出
+        if scope.expired():
+            raise DeadlineExceeded(f"超过截止时间: {seconds}秒") from e
+        raise
+
+class AsyncTransport:
+    """
+    异步HTTP传输层，在单个事件循环上复用连接并限制并发请求数
+
+    Session绑定创建它的事件循环：在新的事件循环上使用前（例如多次调用 asyncio.run），
+    应在原事件循环结束前 await close()，否则旧Session中的连接无法正常关闭
+    """
+    
+    def __init__(self, max_concurrency: Optional[int] = None, connect_timeout: Optional[float] = None,
+                 read_timeout: Optional[float] = None, limiter: Optional[RateLimiter] = None):
+        """
+        初始化异步传输层
+        
+        Args:
+            max_concurrency: 同时在途的最大请求数
+            connect_timeout: 建立连接的超时时间（秒）
+            read_timeout: 读取响应的默认超时时间（秒）
+            limiter: 按主机限流的限流器，默认使用与同步传输层共用的全局限流器
+        """
+        aio_config = config.get_aio_config()
+        self.max_concurrency = max_concurrency or aio_config['max_concurrency']
+        self.connect_timeout = connect_timeout or aio_config['connect_timeout']
+        self.read_timeout = read_timeout or aio_config['read_timeout']
+        self.limiter = limiter or rate_limiter
+        
+        self._session = None
+        self._semaphore = None
+        self._loop = None
+    
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        """获取当前事件循环上的Session，事件循环变化时重新创建"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._discard_session()
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+            logger.debug(f"异步HTTP会话已创建: max_concurrency={self.max_concurrency}")
+        return self._session
+    
+    def _discard_session(self):
+        """
+        丢弃属于其他事件循环的旧Session
+
+        原事件循环仍在其他线程中运行时在该循环上关闭；原事件循环已停止时无法再等待关闭，
+        只能分离Session，其中的连接会遗留到被回收，因此切换事件循环前应先 await close()
+        """
+        session, loop = self._session, self._loop
+        self._session = None
+        if session is None or session.closed:
+            return
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+            return
+        session.detach()
+        logger.warning("旧事件循环已停止，异步HTTP会话未关闭即被丢弃，切换事件循环前请先调用 close()")
+    
+    async def request_json(self, method: str, url: str, params: Optional[dict] = None,
+                           json: Any = None, timeout: Optional[float] = None) -> Any:
+        """
+        发送HTTP请求并解析JSON响应
+        
+        Args:
+            method: 请求方法
+            url: 请求URL
+            params: 查询参数
+            json: JSON请求体
+            timeout: 读取超时时间，默认使用配置文件中的值
+            
+        Returns:
+            解析后的JSON数据
+            
+        Raises:
+            NetworkError: 网络错误
+            APIError: API错误
+            DataParseError: 数据解析错误
+        """
+        session = self._ensure_session()
+        client_timeout = aiohttp.ClientTimeout(
+            sock_connect=self.connect_timeout,
+            sock_read=timeout if timeout is not None else self.read_timeout
+        )
+        host_limiter = self.limiter.for_url(url)
+        async with self._semaphore:
+            overloaded = False
+            try:
+                if host_limiter is not None:
+                    await host_limiter.acquire_async(self.limiter.max_wait)
+            except asyncio.TimeoutError as e:
+                logger.error(f"等待限流许可超时: {url}")
+                raise NetworkError(f"等待限流许可超时: {url}") from e
+            try:
+                async with session.request(method, url, params=params, json=json,
+                                           timeout=client_timeout) as response:
+                    if response.status >= 400:
+                        overloaded = is_overload_status(response.status)
+                        raise APIError(f"HTTP错误: {response.status} - {response.reason}", response.status)
+                    try:
+                        return await response.json(content_type=None)
+                    except ValueError as e:
+                        raise DataParseError(f"JSON解析失败: {str(e)}") from e
+            except asyncio.TimeoutError as e:
+                overloaded = True
+                logger.error(f"异步请求超时: {url}")
+                raise NetworkError(f"请求超时: {url}") from e
+            except aiohttp.ClientError as e:
+                logger.error(f"异步请求错误: {str(e)}")
+                raise NetworkError(f"请求错误: {str(e)}") from e
+            finally:
+                if host_limiter is not None:
+                    host_limiter.release(overloaded)
+    
+    async def get_json(self, url: str, params: Optional[dict] = None, timeout: Optional[float] = None) -> Any:
+        """发送GET请求并解析JSON响应"""
+        return await self.request_json('GET', url, params=params, timeout=timeout)
+    
+    async def post_json(self, url: str, json: Any = None, timeout: Optional[float] = None) -> Any:
+        """发送POST请求并解析JSON响应"""
+        return await self.request_json('POST', url, json=json, timeout=timeout)
+    
+    async def close(self):
+        """关闭Session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+# 全局异步传输层实例
+async_transport = AsyncTransport()
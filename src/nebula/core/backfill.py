@@ -0,0 +1,188 @@
+# -*- coding:utf-8 -*-
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import pandas as pd
+from .history_quote import _fetch_history, _history_store
+from ..utils.config import config
+from ..utils.database import DatabaseManager, db_manager
+from ..utils.logger import logger
+
+class BackfillEngine:
+    """
+    全市场历史行情回填
+
+    多个线程并发请求各 (股票, 周期) 的历史行情，请求结果交给调用 run 的线程依次批量写入，
+    避免多个线程同时写 SQLite。每完成一项就在 backfill_checkpoint 表中记录进度，
+    中断后以相同参数重新运行时跳过已完成的项，失败的项会重新请求
+    """
+
+    def __init__(self, symbols: Iterable[str], periods: Iterable[str] = ('daily',),
+                 start_date: Optional[str] = None, end_date: Optional[str] = None, adjust: str = "",
+                 workers: Optional[int] = None, storage: Optional[str] = None, timeout: Optional[float] = None,
+                 db: Optional[DatabaseManager] = None, progress_interval: Optional[float] = None,
+                 on_progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        初始化回填任务
+        :param symbols: 股票代码列表
+        :param periods: 周期列表，如 ('daily', '5')
+        :param start_date: 开始日期
+        :param end_date: 结束日期
+        :param adjust: 复权方式
+        :param workers: 并发请求的线程数，默认读取配置项 BACKFILL_WORKERS
+        :param storage: 历史行情存储后端，'sqlite' 或 'columnar'
+        :param timeout: 请求超时时间
+        :param db: 记录回填进度（以及使用SQLite存储时写入行情）的数据库，默认使用全局数据库管理器
+        :param progress_interval: 输出进度日志的间隔（秒），默认读取配置项 BACKFILL_PROGRESS_INTERVAL
+        :param on_progress: 每完成一项后调用，参数为 progress() 的返回值
+        """
+        backfill_config = config.get_backfill_config()
+        self.db = db or db_manager
+        self.symbols = list(dict.fromkeys(symbols))
+        self.periods = list(dict.fromkeys(periods))
+        self.start_date = start_date or ""
+        self.end_date = end_date or ""
+        self.adjust = adjust
+        self.workers = workers or backfill_config['workers']
+        store = _history_store(storage)
+        # SQLite存储与进度表使用同一个数据库
+        self.store = self.db if store is db_manager else store
+        self.timeout = timeout
+        self.progress_interval = progress_interval if progress_interval is not None \
+            else backfill_config['progress_interval']
+        self.on_progress = on_progress
+        self._lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._stats = {'total': len(self.symbols) * len(self.periods), 'skipped': 0, 'done': 0, 'failed': 0,
+                       'rows': 0}
+        self._started = None
+        self._last_report = 0.0
+
+    def pending(self) -> List[Tuple[str, str]]:
+        """尚未完成的 (股票, 周期) 列表"""
+        checkpoints = self.db.get_backfill_checkpoints(self.adjust, self.start_date, self.end_date)
+        return [(symbol, period) for symbol in self.symbols for period in self.periods
+                if checkpoints.get((symbol, period), {}).get('status') != 'done']
+
+    def _fetch(self, symbol: str, period: str) -> Optional[pd.DataFrame]:
+        return _fetch_history(symbol, period, self.start_date or None, self.end_date or None,
+                              self.adjust, self.timeout)
+
+    def _checkpoint(self, symbol: str, period: str, status: str, rows: int = 0, error: Optional[str] = None):
+        self.db.save_backfill_checkpoint(symbol, period, self.adjust, self.start_date, self.end_date,
+                                         status, rows, error)
+
+    def progress(self) -> Dict[str, Any]:
+        """
+        当前进度
+        :return: total、skipped、done、failed、rows 计数，以及 elapsed（秒）、rows_per_sec、
+                 tasks_per_sec 和按当前速度估算的剩余时间 eta（秒）
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        finished = stats['done'] + stats['failed']
+        remaining = stats['total'] - stats['skipped'] - finished
+        tasks_per_sec = finished / elapsed if elapsed > 0 else 0.0
+        stats.update({
+            'elapsed': elapsed,
+            'rows_per_sec': stats['rows'] / elapsed if elapsed > 0 else 0.0,
+            'tasks_per_sec': tasks_per_sec,
+            'eta': remaining / tasks_per_sec if tasks_per_sec > 0 else None,
+        })
+        return stats
+
+    def _report(self, force: bool = False):
+        """按间隔输出进度日志"""
+        now = time.monotonic()
+        if not force and now - self._last_report < self.progress_interval:
+            return
+        self._last_report = now
+        stats = self.progress()
+        eta = f"{stats['eta']:.0f}秒" if stats['eta'] is not None else "未知"
+        logger.info(f"回填进度: {stats['done'] + stats['failed']}/{stats['total'] - stats['skipped']}，"
+                    f"失败 {stats['failed']}，写入 {stats['rows']} 条，{stats['rows_per_sec']:.0f} 条/秒，"
+                    f"预计剩余 {eta}")
+
+    def _record(self, symbol: str, period: str, frame: Optional[pd.DataFrame], error: Optional[Exception]):
+        """在写入线程中保存一项的结果和进度，请求或写入失败的项记为 failed，下次运行时重新请求"""
+        rows = 0
+        if error is None and frame is not None and not frame.empty:
+            try:
+                rows = self.store.save_history_frame(symbol, frame, period, self.adjust, raise_errors=True)
+            except Exception as e:
+                error = e
+        if error is not None:
+            logger.warning(f"回填失败: {symbol}, period={period}, 错误: {error}")
+            self._checkpoint(symbol, period, 'failed', error=str(error))
+            with self._lock:
+                self._stats['failed'] += 1
+            return
+        # 数据写入后再记录进度，中断时最多重复请求正在写入的一项
+        self._checkpoint(symbol, period, 'done', rows)
+        with self._lock:
+            self._stats['done'] += 1
+            self._stats['rows'] += rows
+
+    def _drain(self, pool: ThreadPoolExecutor, tasks: List[Tuple[str, str]]):
+        """
+        分批提交请求并依次写入结果
+
+        同时在途的请求不超过线程数的2倍，写入跟不上时不再提交新的请求，避免请求结果在内存中堆积
+        """
+        queue = iter(tasks)
+        futures = {}
+
+        def submit(count: int):
+            for symbol, period in itertools.islice(queue, count):
+                futures[pool.submit(self._fetch, symbol, period)] = (symbol, period)
+
+        submit(2 * self.workers)
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                symbol, period = futures.pop(future)
+                try:
+                    frame, error = future.result(), None
+                except Exception as e:
+                    frame, error = None, e
+                self._record(symbol, period, frame, error)
+                self._report()
+                if self.on_progress is not None:
+                    self.on_progress(self.progress())
+            submit(len(done))
+
+    def run(self) -> Dict[str, Any]:
+        """
+        执行回填
+        :return: 结束时的 progress()
+        """
+        self._reset_stats()
+        tasks = self.pending()
+        self._stats['skipped'] = self._stats['total'] - len(tasks)
+        self._started = time.monotonic()
+        logger.info(f"开始回填: {len(tasks)} 项，跳过已完成的 {self._stats['skipped']} 项，{self.workers} 个线程")
+
+        if tasks:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(tasks))) as pool:
+                try:
+                    self._drain(pool, tasks)
+                except BaseException:
+                    # 中断或写入线程出错时取消排队中的请求，只等待正在执行的请求结束
+                    pool.shutdown(cancel_futures=True)
+                    raise
+
+        self._report(force=True)
+        return self.progress()
+
+def backfill_history(symbols: Iterable[str], periods: Iterable[str] = ('daily',), start_date: Optional[str] = None,
+                     end_date: Optional[str] = None, adjust: str = "", **kwargs) -> Dict[str, Any]:
+    """
+    回填历史行情，参数同 BackfillEngine
+    :return: 回填结束时的进度统计
+    """
+    return BackfillEngine(symbols, periods, start_date, end_date, adjust, **kwargs).run()
@@ -0,0 +1,287 @@
+# -*- coding:utf-8 -*-
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple, Iterable
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 均线周期
+MA_PERIODS = [5, 10, 20, 30, 40, 50]
+
+# 以下函数的输入均为二维数组 (股票数 × K线数)，沿最后一维计算；
+# 股票历史长度不同时在左侧用NaN补齐，计算口径与 ta 库（fillna=False）一致
+
+def _rolling(values: np.ndarray, window: int, func) -> np.ndarray:
+    """沿最后一维做窗口计算，窗口内有NaN或不足window根时结果为NaN"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(values.shape, np.nan)
+    if values.shape[-1] >= window:
+        out[..., window - 1:] = func(sliding_window_view(values, window, axis=-1), axis=-1)
+    return out
+
+def ema(values: np.ndarray, window: Optional[int] = None, alpha: Optional[float] = None,
+        min_periods: Optional[int] = None) -> np.ndarray:
+    """
+    指数移动平均，等价于 pandas ewm(adjust=False)
+
+    逐根K线递推，每一步对所有股票做向量化运算；前导NaN被跳过，中间的缺失值沿用前值
+    :param window: 窗口长度，alpha = 2 / (window + 1)
+    :param alpha: 平滑系数，给出时优先使用
+    :param min_periods: 有效数据少于该数量时结果为NaN，默认等于window
+    """
+    values = np.asarray(values, dtype=np.float64)
+    alpha = alpha if alpha is not None else 2.0 / (window + 1)
+    min_periods = min_periods if min_periods is not None else window
+    out = np.full(values.shape, np.nan)
+    state = np.full(values.shape[:-1], np.nan)
+    count = np.zeros(values.shape[:-1], dtype=np.int64)
+    for t in range(values.shape[-1]):
+        x = values[..., t]
+        valid = ~np.isnan(x)
+        state = np.where(valid, np.where(np.isnan(state), x, (1 - alpha) * state + alpha * x), state)
+        count += valid
+        out[..., t] = np.where(count >= min_periods, state, np.nan)
+    return out
+
+def sma(values: np.ndarray, window: int) -> np.ndarray:
+    """简单移动平均"""
+    return _rolling(values, window, np.mean)
+
+def rolling_min(values: np.ndarray, window: int) -> np.ndarray:
+    """滚动最小值"""
+    return _rolling(values, window, np.min)
+
+def rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    """滚动最大值"""
+    return _rolling(values, window, np.max)
+
+def rsi(close: np.ndarray, window: int = 14) -> np.ndarray:
+    """相对强弱指数（Wilder平滑）"""
+    close = np.asarray(close, dtype=np.float64)
+    diff = np.diff(close, axis=-1, prepend=np.nan)
+    missing = np.isnan(close)
+    up = np.where(missing, np.nan, np.where(diff > 0, diff, 0.0))
+    down = np.where(missing, np.nan, np.where(diff < 0, -diff, 0.0))
+    ema_up = ema(up, alpha=1.0 / window, min_periods=window)
+    ema_down = ema(down, alpha=1.0 / window, min_periods=window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(ema_down == 0, 100.0, 100 - 100 / (1 + ema_up / ema_down))
+
+def kdj(high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int = 14,
+        smooth_window: int = 3) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """随机指标，返回 (K, D, J)"""
+    lowest = rolling_min(low, window)
+    highest = rolling_max(high, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = 100 * (np.asarray(close, dtype=np.float64) - lowest) / (highest - lowest)
+    d = sma(k, smooth_window)
+    return k, d, 3 * k - 2 * d
+
+def macd(close: np.ndarray, window_fast: int = 12, window_slow: int = 26,
+         window_sign: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """MACD，返回 (MACD线, 信号线, 柱状图)"""
+    macd_line = ema(close, window_fast) - ema(close, window_slow)
+    signal = ema(macd_line, window_sign)
+    return macd_line, signal, macd_line - signal
+
+def centered_extrema(values: np.ndarray, windows: Iterable[int], func=np.minimum) -> Dict[int, np.ndarray]:
+    """
+    居中滚动极值：位置i的结果为 [i-w, i+w] 区间内的极值，区间越界时为NaN
+
+    利用 m_w[i] = func(m_{w-1}[i-1], m_{w-1}[i], m_{w-1}[i+1]) 逐级扩大窗口，
+    一次遍历即可得到所有窗口的结果，每一级都是整个矩阵上的向量化运算
+    :param windows: 半窗口长度列表
+    :param func: np.minimum 或 np.maximum
+    :return: {半窗口长度: 与输入同形状的数组}
+    """
+    values = np.asarray(values, dtype=np.float64)
+    windows = sorted(set(windows))
+    result = {0: values} if 0 in windows else {}
+    current = values
+    for w in range(1, windows[-1] + 1):
+        extended = np.full(values.shape, np.nan)
+        if values.shape[-1] > 2:
+            extended[..., 1:-1] = func(func(current[..., :-2], current[..., 1:-1]), current[..., 2:])
+        current = extended
+        if w in windows:
+            result[w] = current
+    return result
+
+def find_pivots(high: np.ndarray, low: np.ndarray, windows: Iterable[int] = (5,)) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """
+    查找枢轴点：最低价等于前后w根K线内最低值的位置为支撑点，最高价等于区间最高值的位置为阻力点
+    :return: {半窗口长度: (支撑点掩码, 阻力点掩码)}
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    lowest = centered_extrema(low, windows, np.minimum)
+    highest = centered_extrema(high, windows, np.maximum)
+    return {w: (low == lowest[w], high == highest[w]) for w in lowest}
+
+def cluster_levels(levels: np.ndarray, tolerance: float = 0.005) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    合并相近的价位：升序排列后，与前一价位的相对差距不超过tolerance的归为同一组
+    :return: (各组平均价位, 各组包含的枢轴点数量)，按价位升序
+    """
+    levels = np.sort(np.asarray(levels, dtype=np.float64))
+    levels = levels[~np.isnan(levels)]
+    if len(levels) == 0:
+        return levels, np.empty(0, dtype=np.int64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gaps = np.diff(levels) / np.abs(levels[:-1])
+    group = np.concatenate([[0], np.cumsum(gaps > tolerance)])
+    counts = np.bincount(group)
+    return np.bincount(group, weights=levels) / counts, counts
+
+def _nearest_levels(candidates: np.ndarray, count: int, descending: bool) -> np.ndarray:
+    """沿最后一维取最接近当前价的count个价位，不足时以NaN补齐（np.sort 总是把NaN排在末尾）"""
+    ordered = -np.sort(-candidates, axis=-1) if descending else np.sort(candidates, axis=-1)
+    out = np.full(candidates.shape[:-1] + (count,), np.nan)
+    width = min(count, ordered.shape[-1])
+    out[..., :width] = ordered[..., :width]
+    return out
+
+def support_resistance(high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int = 5,
+                       count: int = 3, tolerance: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    批量计算支撑位和阻力位，规则与 find_support_resistance 一致
+    :param window: 枢轴点的半窗口长度
+    :param count: 支撑位和阻力位各保留的数量
+    :param tolerance: 给出时先用 cluster_levels 合并相近的枢轴点
+    :return: (支撑位矩阵, 阻力位矩阵)，形状为 (股票数, count)；支撑位从高到低、阻力位从低到高，不足时为NaN
+    """
+    high = np.atleast_2d(np.asarray(high, dtype=np.float64))
+    low = np.atleast_2d(np.asarray(low, dtype=np.float64))
+    close = np.atleast_2d(np.asarray(close, dtype=np.float64))
+    support_mask, resistance_mask = find_pivots(high, low, [window])[window]
+    current = close[:, -1:]
+    supports = np.where(support_mask & (low < current), low, np.nan)
+    resistances = np.where(resistance_mask & (high > current), high, np.nan)
+
+    if tolerance is not None:
+        clustered = []
+        for candidates in (supports, resistances):
+            rows = [cluster_levels(row, tolerance)[0] for row in candidates]
+            width = max([len(row) for row in rows] + [count])
+            matrix = np.full((len(rows), width), np.nan)
+            for i, row in enumerate(rows):
+                matrix[i, :len(row)] = row
+            clustered.append(matrix)
+        supports, resistances = clustered
+
+    return _nearest_levels(supports, count, True), _nearest_levels(resistances, count, False)
+
+def support_resistance_items(supports: Iterable[float], resistances: Iterable[float]) -> List[dict]:
+    """生成支撑位和阻力位的指标解读"""
+    supports = [s for s in supports if not np.isnan(s)]
+    resistances = [r for r in resistances if not np.isnan(r)]
+    items = []
+    if supports:
+        items.append({
+            "指标名称": "支撑位",
+            "值": ", ".join([f"{s:.2f}" for s in supports]),
+            "操作": "在接近支撑位时考虑买入"
+        })
+    else:
+        items.append({
+            "指标名称": "支撑位",
+            "值": "未找到有效支撑位",
+            "操作": "需要进一步观察"
+        })
+    if resistances:
+        items.append({
+            "指标名称": "阻力位",
+            "值": ", ".join([f"{r:.2f}" for r in resistances]),
+            "操作": "在接近阻力位时考虑卖出"
+        })
+    else:
+        items.append({
+            "指标名称": "阻力位",
+            "值": "未找到有效阻力位",
+            "操作": "需要进一步观察"
+        })
+    return items
+
+def stack_history(frames: Dict[str, pd.DataFrame], bars: int = 50) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+    """
+    将多只股票的历史行情拼成右对齐的矩阵
+    :param frames: {股票代码: 历史行情DataFrame}，列名与 get_stock_history_quote 返回一致
+    :param bars: 每只股票保留最近的K线数量，与 calculate_indicators 一样默认50根
+    :return: (股票代码列表, 收盘价矩阵, 最高价矩阵, 最低价矩阵)，历史不足的股票左侧补NaN
+    """
+    symbols = list(frames)
+    matrices = {column: np.full((len(symbols), bars), np.nan) for column in ('收盘', '最高', '最低')}
+    for row, symbol in enumerate(symbols):
+        df = frames[symbol].sort_values('时间').tail(bars)
+        for column, matrix in matrices.items():
+            values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+            if len(values):
+                matrix[row, -len(values):] = values
+    return symbols, matrices['收盘'], matrices['最高'], matrices['最低']
+
+def calculate_indicators_batch(close: np.ndarray, high: np.ndarray, low: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    批量计算技术指标
+    :return: {指标名称: 二维数组}，指标名称与 calculate_indicators 生成的列名一致
+    """
+    result = {}
+    for period in MA_PERIODS:
+        result[f'EMA{period}'] = ema(close, period)
+        result[f'SMA{period}'] = sma(close, period)
+    result['K'], result['D'], result['J'] = kdj(high, low, close)
+    result['RSI'] = rsi(close)
+    result['MACD'], result['MACD_signal'], result['MACD_histogram'] = macd(close)
+    return result
+
+def _cross_action(close: np.ndarray, value: np.ndarray) -> np.ndarray:
+    return np.select([close > value, close < value], ["买入", "卖出"], "中立")
+
+def signal_frame(symbols: List[str], close: np.ndarray, indicators: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """
+    按最新一根K线批量生成操作信号，判断规则与 interpret_indicators 一致
+    :return: 以股票代码为索引的DataFrame，包含各指标最新值及对应的“操作”列
+    """
+    latest_close = np.asarray(close, dtype=np.float64)[:, -1]
+    latest = {name: values[:, -1] for name, values in indicators.items()}
+    frame = pd.DataFrame(latest, index=pd.Index(symbols, name='代码'))
+    frame['close'] = latest_close
+    for period in MA_PERIODS:
+        frame[f'EMA{period}_操作'] = _cross_action(latest_close, latest[f'EMA{period}'])
+        frame[f'SMA{period}_操作'] = _cross_action(latest_close, latest[f'SMA{period}'])
+    frame['KDJ_操作'] = _cross_action(latest['K'], latest['D'])
+    frame['RSI_操作'] = np.select([latest['RSI'] > 70, latest['RSI'] < 30], ["卖出", "买入"], "中立")
+    frame['MACD_操作'] = np.where(latest['MACD'] > latest['MACD_signal'], "买入", "卖出")
+    return frame
+
+def interpret_indicators_batch(symbols: List[str], close: np.ndarray, indicators: Dict[str, np.ndarray],
+                               high: Optional[np.ndarray] = None,
+                               low: Optional[np.ndarray] = None) -> Dict[str, List[dict]]:
+    """
+    批量生成与 interpret_indicators 相同格式的指标解读
+    :param high: 最高价矩阵，与 low 同时给出时追加支撑位和阻力位
+    :return: {股票代码: 指标解读列表}
+    """
+    rows = signal_frame(symbols, close, indicators).to_dict(orient='index')
+    levels = support_resistance(high, low, close) if high is not None and low is not None else None
+    result = {}
+    for index, symbol in enumerate(symbols):
+        row = rows[symbol]
+        items = []
+        for period in MA_PERIODS:
+            for prefix in ('EMA', 'SMA'):
+                name = f'{prefix}{period}'
+                items.append({"指标名称": name, "值": f"{row[name]:.2f}", "操作": row[f'{name}_操作']})
+        items.append({
+            "指标名称": "KDJ",
+            "值": f"K:{row['K']:.2f}, D:{row['D']:.2f}, J:{row['J']:.2f}",
+            "操作": row['KDJ_操作']
+        })
+        items.append({"指标名称": "RSI", "值": f"{row['RSI']:.2f}", "操作": row['RSI_操作']})
+        items.append({
+            "指标名称": "MACD",
+            "值": f"MACD:{row['MACD']:.2f}, Signal:{row['MACD_signal']:.2f}, Histogram:{row['MACD_histogram']:.2f}",
+            "操作": row['MACD_操作']
+        })
+        if levels is not None:
+            items.extend(support_resistance_items(levels[0][index], levels[1][index]))
+        result[symbol] = items
+    return result
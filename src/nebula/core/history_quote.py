@@ -1,11 +1,18 @@
 # -*- coding:utf-8 -*-
+import json
 import requests
 import pandas as pd
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List, Tuple
+from .kline_parser import KLINE_DAILY, KLINE_MINUTE, TRENDS, parse_rows
 from ..utils.cache import cache_manager
+from ..utils.config import config
+from ..utils.column_store import column_store
 from ..utils.database import db_manager
+from ..utils.http import http_transport
 from ..utils.logger import logger
+from ..utils.retry import deadline_scope
+from ..utils.trading_calendar import ttl_policy, trading_calendar
 
 # 常量定义
 BASE_URL = "https://push2his.eastmoney.com/api/qt/stock/kline/get"
@@ -13,6 +20,8 @@ MINUTE_URL = "https://push2his.eastmoney.com/api/qt/stock/trends2/get"
 ADJUST_MAP = {"": "0", "qfq": "1", "hfq": "2"}
 PERIOD_MAP = {"daily": "101", "weekly": "102", "monthly": "103"}
 MINUTE_PERIODS = {'1', '5', '15', '30', '60'}
+# 使用区间缓存的周期；周线和月线的K线时间随区间结束日期变化，仍按请求参数缓存
+RANGE_CACHE_PERIODS = {'daily'} | MINUTE_PERIODS
 
 def _to_date(dt_str: Optional[str]) -> str:
     """转为 'YYYYMMDD' 格式字符串"""
@@ -34,41 +43,23 @@ def _to_datetime(dt_str: Optional[str], default_time: str = "00:00:00") -> str:
         return f"{datetime.strptime(dt_str, '%Y%m%d').strftime('%Y-%m-%d')} {default_time}"
     return dt_str
 
-def get_stock_history_quote(
-    symbol: str = "600900",
-    period: str = "5",
-    start_date: Optional[str] = None,
-    end_date: Optional[str] = None,
-    adjust: str = "",
-    timeout: Optional[float] = None,
-    use_cache: bool = True,
-    save_to_db: bool = True
-) -> str:
-    """获取股票历史行情数据"""
-    # 尝试从缓存获取数据
-    if use_cache:
-        cache_key = f"history_quote_{symbol}_{period}_{start_date}_{end_date}_{adjust}"
-        cached_data = cache_manager.get(cache_key)
-        if cached_data:
-            logger.info(f"从缓存获取历史行情数据: {symbol}, period={period}")
-            return cached_data
-    
+def _build_history_request(symbol: str, period: str, start_date: Optional[str],
+                           end_date: Optional[str], adjust: str) -> dict:
+    """
+    构建历史行情请求
+    :return: 包含 url、params、data_key（klines/trends）、columns、解析用的 schema 及过滤区间 sdt/edt 的字典
+    """
     market_code = 1 if symbol.startswith("6") else 0
-    is_minute = period in MINUTE_PERIODS
-
     start_date = start_date or "1970-01-01"
     end_date = end_date or "2099-12-31"
 
-    session = requests.Session()
-
-    try:
-        if is_minute:
-            sdt = _to_datetime(start_date, "00:00:00")
-            edt = _to_datetime(end_date, "23:59:59")
-            
-            if period == "1":
-                url = MINUTE_URL
-                params = {
+    if period in MINUTE_PERIODS:
+        sdt = _to_datetime(start_date, "00:00:00")
+        edt = _to_datetime(end_date, "23:59:59")
+        if period == "1":
+            return {
+                "url": MINUTE_URL,
+                "params": {
                     "fields1": "f1,f2,f3,f4,f5,f6,f7,f8,f9,f10,f11,f12,f13",
                     "fields2": "f51,f52,f53,f54,f55,f56,f57,f58",
                     "ut": "7eea3edcaed734bea9cbfc24409ed989",
@@ -76,91 +67,319 @@ def get_stock_history_quote(
                     "iscr": "0",
                     "secid": f"{market_code}.{symbol}",
                     "_": "1623766962675",
-                }
-                columns = ["时间", "开盘", "收盘", "最高", "最低", "成交量", "成交额", "均价"]
-            else:
-                url = BASE_URL
-                params = {
-                    "fields1": "f1,f2,f3,f4,f5,f6",
-                    "fields2": "f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61",
-                    "ut": "7eea3edcaed734bea9cbfc24409ed989",
-                    "klt": period,
-                    "fqt": ADJUST_MAP[adjust],
-                    "secid": f"{market_code}.{symbol}",
-                    "beg": "0",
-                    "end": "20500000",
-                    "_": "1630930917857",
-                }
-                columns = ["时间", "开盘", "收盘", "最高", "最低", "成交量", "成交额", "振幅", "涨跌幅", "涨跌额", "换手率"]
-
-            response = session.get(url, params=params, timeout=timeout)
-            response.raise_for_status()
-            data_json = response.json()
-
-            if not (data_json.get("data") and data_json["data"].get("trends" if period == "1" else "klines")):
-                return "[]"
-
-            temp_df = pd.DataFrame([item.split(",") for item in data_json["data"]["trends" if period == "1" else "klines"]])
-            temp_df.columns = columns
-            
-            temp_df.index = pd.to_datetime(temp_df["时间"])
-            temp_df = temp_df[(temp_df.index >= pd.to_datetime(sdt)) & (temp_df.index <= pd.to_datetime(edt))]
-            temp_df.reset_index(drop=True, inplace=True)
-            
-            num_cols = [col for col in columns if col != "时间"]
-            temp_df[num_cols] = temp_df[num_cols].apply(pd.to_numeric, errors="coerce")
-            temp_df["时间"] = pd.to_datetime(temp_df["时间"]).astype(str)
-
-        else:
-            sdt = _to_date(start_date)
-            edt = _to_date(end_date)
-            params = {
+                },
+                "data_key": "trends",
+                "columns": TRENDS["columns"],
+                "schema": TRENDS,
+                "sdt": sdt,
+                "edt": edt,
+            }
+        return {
+            "url": BASE_URL,
+            "params": {
                 "fields1": "f1,f2,f3,f4,f5,f6",
-                "fields2": "f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61,f116",
+                "fields2": "f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61",
                 "ut": "7eea3edcaed734bea9cbfc24409ed989",
-                "klt": PERIOD_MAP[period],
+                "klt": period,
                 "fqt": ADJUST_MAP[adjust],
                 "secid": f"{market_code}.{symbol}",
-                "beg": sdt,
-                "end": edt,
-                "_": "1623766962675",
-            }
-            response = session.get(BASE_URL, params=params, timeout=timeout)
-            response.raise_for_status()
-            data_json = response.json()
-
-            if not (data_json["data"] and data_json["data"]["klines"]):
-                return "[]"
-
-            temp_df = pd.DataFrame([item.split(",") for item in data_json["data"]["klines"]])
-            temp_df.columns = ["时间", "开盘", "收盘", "最高", "最低", "成交量", "成交额", "振幅", "涨跌幅", "涨跌额", "换手率"]
-            temp_df["时间"] = pd.to_datetime(temp_df["时间"]).astype(str)
-            num_cols = ["开盘", "收盘", "最高", "最低", "成交量", "成交额", "振幅", "涨跌幅", "涨跌额", "换手率"]
-            temp_df[num_cols] = temp_df[num_cols].apply(pd.to_numeric, errors="coerce")
-
-        result = temp_df.to_json(orient='records', force_ascii=False, indent=2)
-        
-        # 缓存数据
-        if use_cache:
-            cache_manager.set(cache_key, result, 300)  # 缓存5分钟
-            logger.info(f"历史行情数据已缓存: {symbol}, period={period}")
-        
-        # 保存到数据库
-        if save_to_db:
-            data_list = temp_df.to_dict(orient='records')
-            saved_count = db_manager.save_history_data(symbol, data_list, 'minute' if is_minute else 'daily')
+                "beg": _to_date(sdt[:10]),
+                "end": "20500000",
+                "_": "1630930917857",
+            },
+            "data_key": "klines",
+            "columns": KLINE_MINUTE["columns"],
+            "schema": KLINE_MINUTE,
+            "sdt": sdt,
+            "edt": edt,
+        }
+
+    sdt = _to_date(start_date)
+    edt = _to_date(end_date)
+    return {
+        "url": BASE_URL,
+        "params": {
+            "fields1": "f1,f2,f3,f4,f5,f6",
+            "fields2": "f51,f52,f53,f54,f55,f56,f57,f58,f59,f60,f61,f116",
+            "ut": "7eea3edcaed734bea9cbfc24409ed989",
+            "klt": PERIOD_MAP[period],
+            "fqt": ADJUST_MAP[adjust],
+            "secid": f"{market_code}.{symbol}",
+            "beg": sdt,
+            "end": edt,
+            "_": "1623766962675",
+        },
+        "data_key": "klines",
+        "columns": KLINE_DAILY["columns"],
+        "schema": KLINE_DAILY,
+        "sdt": None,
+        "edt": None,
+    }
+
+def _parse_history(data_json: dict, request: dict) -> Optional[pd.DataFrame]:
+    """
+    解析历史行情接口返回的数据
+    :param data_json: 接口返回的JSON
+    :param request: _build_history_request 返回的请求描述
+    :return: 历史行情DataFrame，无数据时返回None
+    """
+    data_key = request["data_key"]
+    if not (data_json.get("data") and data_json["data"].get(data_key)):
+        return None
+
+    temp_df = parse_rows(data_json["data"][data_key], request["schema"])
+
+    if request["sdt"] is not None:
+        # 分钟数据接口不支持按时间过滤，需要在本地截取；“时间”列已统一为 'YYYY-MM-DD HH:MM:SS'，可直接按字符串比较
+        sdt = pd.Timestamp(request["sdt"]).strftime("%Y-%m-%d %H:%M:%S")
+        edt = pd.Timestamp(request["edt"]).strftime("%Y-%m-%d %H:%M:%S")
+        temp_df = temp_df[(temp_df["时间"] >= sdt) & (temp_df["时间"] <= edt)].reset_index(drop=True)
+    return temp_df
+
+def _range_bounds(period: str, start_date: Optional[str], end_date: Optional[str]) -> Tuple[str, str]:
+    """将请求区间规范化为与K线“时间”列相同格式的字符串"""
+    if period in MINUTE_PERIODS:
+        return (_to_datetime(start_date or "1970-01-01", "00:00:00"),
+                _to_datetime(end_date or "2099-12-31", "23:59:59"))
+    return (pd.to_datetime(_to_date(start_date or "1970-01-01")).strftime("%Y-%m-%d"),
+            pd.to_datetime(_to_date(end_date or "2099-12-31")).strftime("%Y-%m-%d"))
+
+def _coverage_cap(period: str) -> str:
+    """最近一次收盘的时间，此后的K线可能仍在变化，不计入缓存覆盖区间"""
+    last_close = trading_calendar.last_close()
+    return last_close.strftime("%Y-%m-%d %H:%M:%S" if period in MINUTE_PERIODS else "%Y-%m-%d")
+
+def _range_cache_key(symbol: str, period: str, adjust: str) -> str:
+    return f"history_series_{symbol}_{period}_{adjust}"
+
+def _plan_range_fetch(entry: Optional[dict], start: str, end: str) -> List[Tuple[str, str]]:
+    """
+    计算需要请求的区间
+    :param entry: 缓存的序列，包含覆盖区间 start/end
+    :return: [(开始, 结束), ...]，与覆盖区间相邻的缺口会连同中间的空白一起请求，保证覆盖区间连续
+    """
+    if entry is None:
+        return [(start, end)]
+    gaps = []
+    if start < entry["start"]:
+        gaps.append((start, entry["start"]))
+    if end > entry["end"]:
+        gaps.append((entry["end"], end))
+    return gaps
+
+def _merge_range(entry: Optional[dict], fetched: List[Optional[pd.DataFrame]], start: str, end: str,
+                 period: str) -> Tuple[Optional[pd.DataFrame], Optional[dict]]:
+    """
+    合并缓存序列与新请求的数据
+    :return: (请求区间内的DataFrame或None, 需要写回缓存的序列或None)
+    """
+    frames = [frame for frame in fetched if frame is not None and not frame.empty]
+    if entry is not None:
+        frames.insert(0, pd.DataFrame(entry["rows"], columns=entry["columns"]))
+    if not frames:
+        return None, None
+
+    merged = pd.concat(frames, ignore_index=True)
+    merged = merged.drop_duplicates(subset="时间", keep="last").sort_values("时间").reset_index(drop=True)
+
+    new_entry = None
+    if fetched:
+        cov_start = min(start, entry["start"]) if entry else start
+        cov_end = min(max(end, entry["end"]) if entry else end, _coverage_cap(period))
+        if cov_start <= cov_end:
+            stored = merged[(merged["时间"] >= cov_start) & (merged["时间"] <= cov_end)]
+            new_entry = {"start": cov_start, "end": cov_end, "columns": list(merged.columns),
+                         "rows": stored.values.tolist()}
+
+    result = merged[(merged["时间"] >= start) & (merged["时间"] <= end)].reset_index(drop=True)
+    return (result if not result.empty else None), new_entry
+
+def _fetch_history(symbol: str, period: str, start_date: Optional[str], end_date: Optional[str],
+                   adjust: str, timeout: Optional[float]) -> Optional[pd.DataFrame]:
+    """请求一个区间的历史行情"""
+    request = _build_history_request(symbol, period, start_date, end_date, adjust)
+    response = http_transport.get(request["url"], params=request["params"], timeout=timeout)
+    response.raise_for_status()
+    return _parse_history(response.json(), request)
+
+def _get_history_range_cached(symbol: str, period: str, start_date: Optional[str], end_date: Optional[str],
+                              adjust: str, timeout: Optional[float]) -> Tuple[Optional[pd.DataFrame], List[pd.DataFrame]]:
+    """
+    通过区间缓存获取历史行情：请求区间在已缓存的覆盖区间内时直接截取，否则只请求缺口并合并
+    :return: (请求区间内的DataFrame或None, 新请求到的数据列表)
+    """
+    start, end = _range_bounds(period, start_date, end_date)
+    cache_key = _range_cache_key(symbol, period, adjust)
+    entry = cache_manager.get(cache_key)
+
+    gaps = _plan_range_fetch(entry, start, end)
+    fetched = [_fetch_history(symbol, period, gap_start, gap_end, adjust, timeout) for gap_start, gap_end in gaps]
+    result, new_entry = _merge_range(entry, fetched, start, end, period)
+    if new_entry is not None:
+        cache_manager.set(cache_key, new_entry, ttl_policy.ttl('history', end=new_entry["end"]))
+    if gaps:
+        logger.info(f"历史行情区间缓存: {symbol}, period={period}, 请求缺口 {gaps}")
+    else:
+        logger.info(f"从区间缓存获取历史行情数据: {symbol}, period={period}")
+    return result, [frame for frame in fetched if frame is not None and not frame.empty]
+
+def _history_store(storage: Optional[str] = None):
+    """
+    获取历史行情存储后端
+    :param storage: 'sqlite' 或 'columnar'，默认使用配置文件中的值
+    """
+    storage = storage or config.get_database_config()['history_storage']
+    return column_store if storage == 'columnar' else db_manager
+
+def _sync_history(symbol: str, period: str, start_date: Optional[str], end_date: Optional[str],
+                  adjust: str, timeout: Optional[float], storage: Optional[str] = None) -> Optional[pd.DataFrame]:
+    """
+    增量同步历史行情：只请求数据库中最新一根K线之后的数据，以及请求区间内早于已有最早K线的交易日，
+    合并入库后从本地读取请求区间
+    :return: 请求区间内的历史行情DataFrame，无数据时返回None
+    """
+    if period in MINUTE_PERIODS:
+        sdt = _to_datetime(start_date or "1970-01-01", "00:00:00")
+        edt = _to_datetime(end_date or "2099-12-31", "23:59:59")
+    else:
+        sdt = pd.to_datetime(_to_date(start_date or "1970-01-01")).strftime("%Y-%m-%d")
+        edt = pd.to_datetime(_to_date(end_date or "2099-12-31")).strftime("%Y-%m-%d")
+
+    store = _history_store(storage)
+    latest = store.get_latest_timestamp(symbol, period, adjust)
+    if latest and start_date:
+        earliest = store.get_earliest_timestamp(symbol, period, adjust)
+        first_day = pd.Timestamp(sdt).date()
+        if not trading_calendar.is_trading_day(first_day):
+            first_day = trading_calendar.next_trading_day(first_day)
+        # 已从更早的日期请求过时，开头缺少的部分在上游也不存在（如早于上市日期），不再重复请求
+        head = store.get_sync_head(symbol, period, adjust)
+        covered = head is not None and first_day >= pd.Timestamp(head).date()
+        # 请求区间开始后、已有最早K线之前还有交易日时，补齐开头缺少的部分，与已有数据重叠的最早一根K线按时间覆盖
+        if earliest and not covered and first_day < pd.Timestamp(earliest).date():
+            head_df = _fetch_history(symbol, period, start_date, earliest, adjust, timeout)
+            if head_df is not None and not head_df.empty:
+                saved_count = store.save_history_frame(symbol, head_df, period, adjust)
+                logger.info(f"补齐历史行情: {symbol}, period={period}, 区间={start_date}~{earliest}, "
+                            f"新增 {saved_count} 条记录")
+            store.save_sync_head(symbol, sdt[:10], period, adjust)
+
+    # 从最新一根K线开始重新拉取，以覆盖其在上次同步时尚未收盘的情况
+    fetch_start = latest or start_date
+    request = _build_history_request(symbol, period, fetch_start, None, adjust)
+    response = http_transport.get(request["url"], params=request["params"], timeout=timeout)
+    response.raise_for_status()
+    tail_df = _parse_history(response.json(), request)
+
+    if tail_df is not None and not tail_df.empty:
+        if latest:
+            store.delete_history_data(symbol, latest, period, adjust)
+        saved_count = store.save_history_frame(symbol, tail_df, period, adjust)
+        logger.info(f"增量同步历史行情: {symbol}, period={period}, 起始={fetch_start}, 新增 {saved_count} 条记录")
+        if not latest and start_date:
+            store.save_sync_head(symbol, sdt[:10], period, adjust)
+
+    stored_df = store.get_history_data(symbol, sdt, edt, period, adjust)
+    if stored_df is None:
+        return None
+    columns = [col for col in request["columns"] if col in stored_df.columns]
+    return stored_df[columns]
+
+def get_stock_history_frame(
+    symbol: str = "600900",
+    period: str = "5",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    adjust: str = "",
+    timeout: Optional[float] = None,
+    use_cache: bool = True,
+    save_to_db: bool = True,
+    sync: bool = False,
+    storage: Optional[str] = None,
+    deadline: Optional[float] = None
+) -> pd.DataFrame:
+    """
+    获取股票历史行情数据，返回带数值类型的DataFrame，请求失败时抛出异常
+    :param use_cache: 是否使用缓存；日线和分钟线按 (股票, 周期, 复权方式) 缓存整段序列，只请求未覆盖的区间
+    :param sync: 增量同步模式，只下载数据库中缺失的最新K线，并从数据库返回完整区间
+    :param storage: 历史行情存储后端，'sqlite' 或 'columnar'，默认使用配置文件中的值
+    :param deadline: 整个调用的最长耗时（秒），超过时放弃请求，默认不限
+    :return: 历史行情DataFrame，无数据时为空DataFrame
+    """
+    with deadline_scope(deadline):
+        return _get_history_frame(symbol, period, start_date, end_date, adjust, timeout,
+                                  use_cache, save_to_db, sync, storage)
+
+def _get_history_frame(symbol: str, period: str, start_date: Optional[str], end_date: Optional[str], adjust: str,
+                       timeout: Optional[float], use_cache: bool, save_to_db: bool, sync: bool,
+                       storage: Optional[str]) -> pd.DataFrame:
+    if use_cache and not sync and period in RANGE_CACHE_PERIODS:
+        temp_df, fetched = _get_history_range_cached(symbol, period, start_date, end_date, adjust, timeout)
+        # 只保存新请求到的数据
+        if save_to_db and fetched:
+            saved_count = _history_store(storage).save_history_frame(
+                symbol, pd.concat(fetched, ignore_index=True), period, adjust
+            )
             logger.info(f"历史行情数据已保存到数据库: {symbol}, 保存了 {saved_count} 条记录")
-        
-        return result
+        return temp_df if temp_df is not None else pd.DataFrame()
+
+    # 尝试从缓存获取数据
+    cache_key = f"history_quote_{symbol}_{period}_{start_date}_{end_date}_{adjust}"
+    if use_cache:
+        cached_data = cache_manager.get(cache_key)
+        if cached_data:
+            logger.info(f"从缓存获取历史行情数据: {symbol}, period={period}")
+            return pd.DataFrame(json.loads(cached_data) if isinstance(cached_data, str) else cached_data)
 
+    if sync:
+        temp_df = _sync_history(symbol, period, start_date, end_date, adjust, timeout, storage)
+    else:
+        temp_df = _fetch_history(symbol, period, start_date, end_date, adjust, timeout)
+    if temp_df is None:
+        return pd.DataFrame()
+
+    # 缓存数据
+    if use_cache:
+        # 已收盘的区间缓存到下一个交易日开盘
+        cache_manager.set(cache_key, temp_df.to_dict(orient='records'), ttl_policy.ttl('history', end=end_date))
+        logger.info(f"历史行情数据已缓存: {symbol}, period={period}")
+
+    # 保存到数据库（增量同步模式下已写入）
+    if save_to_db and not sync:
+        saved_count = _history_store(storage).save_history_frame(symbol, temp_df, period, adjust)
+        logger.info(f"历史行情数据已保存到数据库: {symbol}, 保存了 {saved_count} 条记录")
+
+    return temp_df
+
+def get_stock_history_quote(
+    symbol: str = "600900",
+    period: str = "5",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    adjust: str = "",
+    timeout: Optional[float] = None,
+    use_cache: bool = True,
+    save_to_db: bool = True,
+    sync: bool = False,
+    storage: Optional[str] = None,
+    deadline: Optional[float] = None
+) -> str:
+    """
+    获取股票历史行情数据，参数同 get_stock_history_frame
+    :return: 历史行情的JSON字符串，出错时返回错误信息
+    """
+    try:
+        temp_df = get_stock_history_frame(symbol, period, start_date, end_date, adjust, timeout,
+                                          use_cache, save_to_db, sync, storage, deadline)
+        if temp_df.empty:
+            return "[]"
+        return temp_df.to_json(orient='records', force_ascii=False, indent=2)
     except requests.RequestException as e:
         logger.error(f"请求历史行情数据时出错: {str(e)}")
         return f"请求错误: {str(e)}"
     except Exception as e:
         logger.error(f"获取历史行情数据时出错: {str(e)}")
         return f"发生错误: {str(e)}"
-    finally:
-        session.close()
 
 if __name__ == "__main__":
     print(get_stock_history_quote(symbol="600900", period='15', start_date='2025-07-09 13:00:00', end_date='2025-07-09 15:00:00'))
@@ -1,53 +1,68 @@
 # -*- coding:utf-8 -*-
 import pandas as pd
-import requests
 import json
+from typing import Optional
+from ..utils.http import http_transport
+from ..utils.retry import deadline_scope
 
 def to_json(df: pd.DataFrame) -> str:
     """Convert DataFrame to JSON string"""
     return df.to_json(orient='records', force_ascii=False, indent=2)
 
-def get_stock_hot_rank() -> str:
-    """东方财富-个股人气榜-人气榜"""
-    url = "https://emappdata.eastmoney.com/stockrank/getAllCurrentList"
-    payload = {
-        "appId": "appId01",
-        "globalId": "786e4c21-70dc-435a-93bb-38",
-        "marketType": "",
-        "pageNo": 1,
-        "pageSize": 100,
+RANK_URL = "https://emappdata.eastmoney.com/stockrank/getAllCurrentList"
+RANK_PAYLOAD = {
+    "appId": "appId01",
+    "globalId": "786e4c21-70dc-435a-93bb-38",
+    "marketType": "",
+    "pageNo": 1,
+    "pageSize": 100,
+}
+QUOTE_URL = "https://push2.eastmoney.com/api/qt/ulist.np/get"
+
+def _build_rank_quote_params(rank_json: dict) -> dict:
+    """根据人气榜结果构建批量行情请求参数"""
+    marks = ["0" + "." + item[2:] if "SZ" in item else "1" + "." + item[2:]
+             for item in (row["sc"] for row in rank_json["data"])]
+    return {
+        "ut": "f057cbcbce2a86e2866ab8877db1d059",
+        "fltt": "2",
+        "invt": "2",
+        "fields": "f14,f3,f12,f2",
+        "secids": ",".join(marks) + ",?v=08926209912590994",
     }
-    try:
-        r = requests.post(url, json=payload)
+
+def _parse_hot_rank(rank_json: dict, quote_json: dict) -> pd.DataFrame:
+    """合并人气榜和行情数据"""
+    temp_rank_df = pd.DataFrame(rank_json["data"])
+    temp_df = pd.DataFrame(quote_json["data"]["diff"])
+    temp_df.columns = ["最新价", "涨跌幅", "代码", "股票名称"]
+    temp_df["最新价"] = pd.to_numeric(temp_df["最新价"], errors="coerce")
+    temp_df["涨跌幅"] = pd.to_numeric(temp_df["涨跌幅"], errors="coerce")
+    temp_df["涨跌额"] = temp_df["最新价"] * temp_df["涨跌幅"] / 100
+    temp_df["当前排名"] = temp_rank_df["rk"]
+    temp_df["代码"] = temp_rank_df["sc"]
+    temp_df = temp_df[["当前排名", "代码", "股票名称", "最新价", "涨跌额", "涨跌幅"]]
+    temp_df["当前排名"] = pd.to_numeric(temp_df["当前排名"], errors="coerce")
+    return temp_df
+
+def get_stock_hot_rank_frame(deadline: Optional[float] = None) -> pd.DataFrame:
+    """东方财富-个股人气榜-人气榜，请求失败时抛出异常，deadline 为两次请求合计的最长耗时（秒）"""
+    with deadline_scope(deadline):
+        r = http_transport.post(RANK_URL, json=RANK_PAYLOAD)
         r.raise_for_status()
-        data_json = r.json()
-        temp_rank_df = pd.DataFrame(data_json["data"])
-
-        temp_rank_df["mark"] = ["0" + "." + item[2:] if "SZ" in item else "1" + "." + item[2:] for item in temp_rank_df["sc"]]
-        params = {
-            "ut": "f057cbcbce2a86e2866ab8877db1d059",
-            "fltt": "2",
-            "invt": "2",
-            "fields": "f14,f3,f12,f2",
-            "secids": ",".join(temp_rank_df["mark"]) + ",?v=08926209912590994",
-        }
-        url = "https://push2.eastmoney.com/api/qt/ulist.np/get"
-        r = requests.get(url, params=params)
+        rank_json = r.json()
+
+        r = http_transport.get(QUOTE_URL, params=_build_rank_quote_params(rank_json))
         r.raise_for_status()
-        data_json = r.json()
-        temp_df = pd.DataFrame(data_json["data"]["diff"])
-        temp_df.columns = ["最新价", "涨跌幅", "代码", "股票名称"]
-        temp_df["最新价"] = pd.to_numeric(temp_df["最新价"], errors="coerce")
-        temp_df["涨跌幅"] = pd.to_numeric(temp_df["涨跌幅"], errors="coerce")
-        temp_df["涨跌额"] = temp_df["最新价"] * temp_df["涨跌幅"] / 100
-        temp_df["当前排名"] = temp_rank_df["rk"]
-        temp_df["代码"] = temp_rank_df["sc"]
-        temp_df = temp_df[["当前排名", "代码", "股票名称", "最新价", "涨跌额", "涨跌幅"]]
-        temp_df["当前排名"] = pd.to_numeric(temp_df["当前排名"], errors="coerce")
-        return to_json(temp_df)
+        return _parse_hot_rank(rank_json, r.json())
+
+def get_stock_hot_rank(deadline: Optional[float] = None) -> str:
+    """东方财富-个股人气榜-人气榜"""
+    try:
+        return to_json(get_stock_hot_rank_frame(deadline))
     except Exception as e:
         return json.dumps({"error": str(e)}, ensure_ascii=False)
 
 
 if __name__ == "__main__":
-    print(get_stock_hot_rank())
\ No newline at end of file
+    print(get_stock_hot_rank())
@@ -1,14 +1,19 @@
 # -*- coding:utf-8 -*-
 import json
 import pandas as pd
+from typing import Optional
 from ta.trend import EMAIndicator, SMAIndicator
 from ta.momentum import StochasticOscillator, RSIIndicator
 from ta.trend import MACD
-from .history_quote import get_stock_history_quote
+from .history_quote import get_stock_history_frame
+from .batch_indicators import MA_PERIODS, support_resistance, support_resistance_items
 from datetime import datetime, timedelta
 from ..utils.cache import cache_manager
 from ..utils.database import db_manager
 from ..utils.logger import logger
+from ..utils.retry import deadline_scope
+from ..utils.singleflight import single_flight
+from ..utils.trading_calendar import ttl_policy
 
 def get_last_50_trading_days(end_date=None):
     if end_date is None:
@@ -33,7 +38,7 @@ def calculate_indicators(json_data):
     # 只保留最近50个交易日的数据
     df = df.tail(50)
     
-    for period in [5, 10, 20, 30, 40, 50]:
+    for period in MA_PERIODS:
         ema = EMAIndicator(close=df['close'], window=period)
         sma = SMAIndicator(close=df['close'], window=period)
         df[f'EMA{period}'] = ema.ema_indicator()
@@ -54,27 +59,15 @@ def calculate_indicators(json_data):
     
     return df
 
-def find_support_resistance(df, window=5):
-    supports = []
-    resistances = []
-    
-    for i in range(window, len(df) - window):
-        if df['low'].iloc[i] == min(df['low'].iloc[i-window:i+window+1]):
-            supports.append(df['low'].iloc[i])
-        if df['high'].iloc[i] == max(df['high'].iloc[i-window:i+window+1]):
-            resistances.append(df['high'].iloc[i])
-    
-    current_price = df['close'].iloc[-1]
-    
-    # 筛选出低于当前价格的支撑位
-    supports = [s for s in supports if s < current_price]
-    # 筛选出高于当前价格的阻力位
-    resistances = [r for r in resistances if r > current_price]
-    
-    # 取最近的3个支撑位和阻力位
-    supports = sorted(supports, reverse=True)[:3]
-    resistances = sorted(resistances)[:3]
-    
+def find_support_resistance(df, window=5, tolerance=None):
+    # 最低价等于前后window根K线内最低值的为支撑位，最高价等于区间最高值的为阻力位；
+    # 只保留低于（高于）当前价格且最接近的3个，tolerance 给出时先合并相近价位
+    supports, resistances = support_resistance(
+        df['high'].to_numpy(dtype=float), df['low'].to_numpy(dtype=float),
+        df['close'].to_numpy(dtype=float), window=window, tolerance=tolerance
+    )
+    supports = [s for s in supports[0] if not pd.isna(s)]
+    resistances = [r for r in resistances[0] if not pd.isna(r)]
     return supports, resistances
 
 def interpret_indicators(df):
@@ -82,7 +75,7 @@ def interpret_indicators(df):
     result = []
 
     # EMA 和 SMA 解释
-    for period in [5, 10, 20, 30, 40, 50]:
+    for period in MA_PERIODS:
         ema_value = latest[f'EMA{period}']
         sma_value = latest[f'SMA{period}']
         close = latest['close']
@@ -122,60 +115,83 @@ def interpret_indicators(df):
 
     # 支撑位和阻力位
     supports, resistances = find_support_resistance(df)
-    if supports:
-        result.append({
-            "指标名称": "支撑位",
-            "值": ", ".join([f"{s:.2f}" for s in supports]),
-            "操作": "在接近支撑位时考虑买入"
-        })
-    else:
-        result.append({
-            "指标名称": "支撑位",
-            "值": "未找到有效支撑位",
-            "操作": "需要进一步观察"
-        })
-    
-    if resistances:
-        result.append({
-            "指标名称": "阻力位",
-            "值": ", ".join([f"{r:.2f}" for r in resistances]),
-            "操作": "在接近阻力位时考虑卖出"
-        })
-    else:
-        result.append({
-            "指标名称": "阻力位",
-            "值": "未找到有效阻力位",
-            "操作": "需要进一步观察"
-        })
+    result.extend(support_resistance_items(supports, resistances))
 
     return result
 
-def get_stock_indicators(symbol: str = "600900", period: str = 'daily', use_cache: bool = True, save_to_db: bool = True) -> str:
+def _get_indicator_advice(symbol: str, period: str, use_cache: bool, save_to_db: bool,
+                          stale_while_revalidate: bool) -> list:
+    """获取技术指标解读列表，失败时抛出异常"""
+    cache_key = f"stock_indicators_{symbol}_{period}"
+    # 缓存软过期后立即返回旧数据，并在后台重新计算
+    if use_cache and stale_while_revalidate:
+        return cache_manager.get_or_refresh(
+            cache_key,
+            lambda: single_flight.do(cache_key, lambda: _compute_stock_indicators(symbol, period, save_to_db)),
+            ttl_policy.ttl('indicators')
+        )
+    
     # 尝试从缓存获取数据
     if use_cache:
-        cache_key = f"stock_indicators_{symbol}_{period}"
         cached_data = cache_manager.get(cache_key)
         if cached_data:
             logger.info(f"从缓存获取技术指标数据: {symbol}")
-            return json.dumps(cached_data, ensure_ascii=False, indent=2)
+            return cached_data
+        # 缓存未命中时，同一股票的并发请求只计算一次
+        return single_flight.do(cache_key, lambda: _load_stock_indicators(symbol, period, use_cache, save_to_db))
     
-    start_date, end_date = get_last_50_trading_days()
-    data = get_stock_history_quote(symbol=symbol, period=period, start_date=start_date, end_date=end_date)
-    json_data = json.loads(data)
-    indicators_df = calculate_indicators(json_data)
-    advice = interpret_indicators(indicators_df)
+    return _load_stock_indicators(symbol, period, use_cache, save_to_db)
+
+def get_stock_indicators_frame(symbol: str = "600900", period: str = 'daily', use_cache: bool = True,
+                               save_to_db: bool = True, stale_while_revalidate: bool = False,
+                               deadline: Optional[float] = None) -> pd.DataFrame:
+    """
+    获取技术指标解读，请求失败时抛出异常
+    :param deadline: 整个调用的最长耗时（秒），超过时放弃请求，默认不限
+    :return: 包含 指标名称、值、操作 三列的DataFrame
+    """
+    with deadline_scope(deadline):
+        advice = _get_indicator_advice(symbol, period, use_cache, save_to_db, stale_while_revalidate)
+    return pd.DataFrame(advice, columns=["指标名称", "值", "操作"])
+
+def get_stock_indicators(symbol: str = "600900", period: str = 'daily', use_cache: bool = True, save_to_db: bool = True,
+                         stale_while_revalidate: bool = False, deadline: Optional[float] = None) -> str:
+    with deadline_scope(deadline):
+        advice = _get_indicator_advice(symbol, period, use_cache, save_to_db, stale_while_revalidate)
+    return json.dumps(advice, ensure_ascii=False, indent=2)
+
+def _load_stock_indicators(symbol: str, period: str, use_cache: bool, save_to_db: bool) -> list:
+    """获取历史行情并计算技术指标，写入缓存和数据库"""
+    cache_key = f"stock_indicators_{symbol}_{period}"
+    if use_cache:
+        # 等待其他进程计算完成后，缓存中可能已有数据
+        cached_data = cache_manager.get(cache_key)
+        if cached_data:
+            return cached_data
+    
+    advice = _compute_stock_indicators(symbol, period, save_to_db)
     
     # 缓存数据
     if use_cache:
-        cache_manager.set(cache_key, advice, 300)  # 缓存5分钟
+        cache_manager.set(cache_key, advice, ttl_policy.ttl('indicators'))
         logger.info(f"技术指标数据已缓存: {symbol}")
     
+    return advice
+
+def _compute_stock_indicators(symbol: str, period: str, save_to_db: bool) -> list:
+    """获取历史行情并计算技术指标（不读写缓存）"""
+    start_date, end_date = get_last_50_trading_days()
+    # 直接使用带类型的DataFrame，避免JSON序列化和解析
+    history_df = get_stock_history_frame(symbol=symbol, period=period, start_date=start_date, end_date=end_date)
+    indicators_df = calculate_indicators(history_df)
+    advice = interpret_indicators(indicators_df)
+    
     # 保存到数据库
     if save_to_db:
         saved_count = db_manager.save_indicators(symbol, end_date, advice)
         logger.info(f"技术指标数据已保存到数据库: {symbol}, 保存了 {saved_count} 条记录")
     
-    return json.dumps(advice, ensure_ascii=False, indent=2)
+    return advice
 
 if __name__ == "__main__":
     result = get_stock_indicators("600900", "daily")
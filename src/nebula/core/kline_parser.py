@@ -0,0 +1,71 @@
+# -*- coding:utf-8 -*-
+"""
+历史行情 klines/trends 接口的快速解析
+
+接口每行数据是逗号分隔的字符串，各接口的列固定。这里把所有行拼接后交给 pandas 的C解析器，
+按预先给定的列类型一次完成切分和类型转换，不再生成逐行的Python列表和逐列 to_numeric
+"""
+import io
+from typing import List
+import pandas as pd
+
+# 各接口的列定义：columns 为列名，time_length 为接口返回的“时间”字符串长度，
+# 日线为 'YYYY-MM-DD'，分钟线为 'YYYY-MM-DD HH:MM'
+KLINE_DAILY = {
+    "columns": ["时间", "开盘", "收盘", "最高", "最低", "成交量", "成交额", "振幅", "涨跌幅", "涨跌额", "换手率"],
+    "time_length": 10,
+}
+KLINE_MINUTE = {
+    "columns": ["时间", "开盘", "收盘", "最高", "最低", "成交量", "成交额", "振幅", "涨跌幅", "涨跌额", "换手率"],
+    "time_length": 16,
+}
+TRENDS = {
+    "columns": ["时间", "开盘", "收盘", "最高", "最低", "成交量", "成交额", "均价"],
+    "time_length": 16,
+}
+
+# 成交量为整数（手），其余数值列为浮点数
+INTEGER_COLUMNS = {"成交量"}
+
+def _column_dtypes(columns: List[str]) -> dict:
+    return {col: "str" if col == "时间" else "int64" if col in INTEGER_COLUMNS else "float64" for col in columns}
+
+def _normalize_times(times: pd.Series, time_length: int) -> pd.Series:
+    """统一“时间”列格式：日线为 'YYYY-MM-DD'，分钟线为 'YYYY-MM-DD HH:MM:SS'"""
+    lengths = times.str.len()
+    if (lengths == time_length).all():
+        return times + ":00" if time_length == 16 else times
+    # 格式不一致时逐个解析
+    return pd.to_datetime(times).astype(str)
+
+def parse_rows_legacy(rows: List[str], columns: List[str]) -> pd.DataFrame:
+    """
+    逐行切分后按列转换的解析方式，无法按固定列类型解析时使用（例如整数列中出现缺失值）
+    :return: 列类型与 parse_rows 一致的DataFrame，无法转换的值为NaN
+    """
+    temp_df = pd.DataFrame([item.split(",") for item in rows])
+    temp_df.columns = columns
+    num_cols = [col for col in columns if col != "时间"]
+    temp_df[num_cols] = temp_df[num_cols].apply(pd.to_numeric, errors="coerce")
+    temp_df["时间"] = pd.to_datetime(temp_df["时间"]).astype(str)
+    return temp_df
+
+def parse_rows(rows: List[str], schema: dict) -> pd.DataFrame:
+    """
+    将 klines/trends 的逗号分隔行一次解析为带类型的列
+    :param rows: 接口返回的行字符串列表
+    :param schema: KLINE_DAILY、KLINE_MINUTE 或 TRENDS
+    :return: “时间”列为字符串，成交量为int64，其余为float64的DataFrame
+    """
+    columns = schema["columns"]
+    if not rows:
+        return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in _column_dtypes(columns).items()})
+    try:
+        temp_df = pd.read_csv(
+            io.StringIO("\n".join(rows)), header=None, names=columns, dtype=_column_dtypes(columns),
+            na_values=["-", ""], keep_default_na=False, float_precision="round_trip", engine="c",
+        )
+    except (ValueError, pd.errors.ParserError):
+        return parse_rows_legacy(rows, columns)
+    temp_df["时间"] = _normalize_times(temp_df["时间"], schema["time_length"])
+    return temp_df
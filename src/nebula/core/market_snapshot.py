@@ -0,0 +1,168 @@
+# -*- coding:utf-8 -*-
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+import pandas as pd
+import requests
+from ..utils.cache import cache_manager
+from ..utils.config import config
+from ..utils.database import db_manager
+from ..utils.http import http_transport
+from ..utils.logger import logger
+from ..utils.retry import deadline_scope, run_in_context
+from ..utils.singleflight import single_flight
+from ..utils.trading_calendar import ttl_policy
+
+SNAPSHOT_URL = "https://push2.eastmoney.com/api/qt/clist/get"
+# 沪深京A股：深市主板、创业板，沪市主板、科创板，北交所
+A_SHARE_FS = "m:0 t:6,m:0 t:80,m:1 t:2,m:1 t:23,m:0 t:81 s:2048"
+SNAPSHOT_FIELDS = {
+    "f12": "代码", "f14": "名称", "f2": "最新价", "f3": "涨跌幅", "f4": "涨跌额",
+    "f5": "成交量", "f6": "成交额", "f8": "换手率", "f20": "总市值", "f21": "流通市值",
+    "f9": "市盈率-动态", "f23": "市净率",
+}
+TEXT_COLUMNS = ("代码", "名称")
+SNAPSHOT_CACHE_KEY = "market_snapshot"
+
+def _build_snapshot_params(page: int, page_size: int) -> dict:
+    """构建全市场快照的分页请求参数，按股票代码排序，保证翻页期间行情变化时各页不重不漏"""
+    return {
+        "pn": str(page),
+        "pz": str(page_size),
+        "po": "0",
+        "np": "1",
+        "ut": "bd1d9ddb04089700cf9c27f6f7426281",
+        "fltt": "2",
+        "invt": "2",
+        "fid": "f12",
+        "fs": A_SHARE_FS,
+        "fields": ",".join(SNAPSHOT_FIELDS),
+    }
+
+def _parse_snapshot_page(data_json: dict) -> Tuple[int, List[dict]]:
+    """
+    解析一页 clist 数据
+    :return: (全市场股票总数, 本页的原始行)
+    """
+    data = data_json.get("data") or {}
+    diff = data.get("diff") or []
+    if isinstance(diff, dict):
+        diff = list(diff.values())
+    return int(data.get("total") or 0), diff
+
+def _snapshot_columns(rows: List[dict]) -> dict:
+    """
+    将各页原始行转换为按列组织的字典
+    :return: {"代码": [...], "名称": [...], "最新价": [...], ...}，停牌等缺失值为None
+    """
+    raw_df = pd.DataFrame(rows, columns=list(SNAPSHOT_FIELDS)).rename(columns=SNAPSHOT_FIELDS)
+    raw_df = raw_df.drop_duplicates(subset="代码").reset_index(drop=True)
+    for column in raw_df.columns:
+        if column in TEXT_COLUMNS:
+            raw_df[column] = raw_df[column].astype(str)
+        else:
+            raw_df[column] = pd.to_numeric(raw_df[column], errors="coerce")
+    return raw_df.astype(object).where(raw_df.notna(), None).to_dict(orient='list')
+
+def _fetch_snapshot_page(page: int, page_size: int, timeout: Optional[float]) -> Tuple[int, List[dict]]:
+    response = http_transport.get(SNAPSHOT_URL, params=_build_snapshot_params(page, page_size), timeout=timeout)
+    response.raise_for_status()
+    return _parse_snapshot_page(response.json())
+
+def _fetch_market_snapshot(page_size: int, workers: int, timeout: Optional[float]) -> dict:
+    """先请求第一页得到总数，其余各页并发请求，失败时抛出异常"""
+    total, rows = _fetch_snapshot_page(1, page_size, timeout)
+    if rows and len(rows) < min(page_size, total):
+        # 服务端限制了每页条数时，按第一页实际返回的条数分页，避免漏掉后面的股票
+        logger.warning(f"全市场快照每页条数被限制为 {len(rows)}（请求 {page_size}）")
+        page_size = len(rows)
+    pages = math.ceil(total / page_size) if total else 1
+    if pages > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, pages - 1)) as pool:
+            # 各页请求沿用调用方的截止时间
+            fetch_page = run_in_context(_fetch_snapshot_page)
+            for _, page_rows in pool.map(lambda page: fetch_page(page, page_size, timeout), range(2, pages + 1)):
+                rows.extend(page_rows)
+    logger.info(f"全市场快照: {total} 只股票，{pages} 页")
+    return _snapshot_columns(rows)
+
+def _load_market_snapshot(use_cache: bool, save_to_db: bool, page_size: int, workers: int,
+                          timeout: Optional[float]) -> dict:
+    """请求全市场快照并整体写入缓存和数据库"""
+    if use_cache:
+        # 等待其他进程加载完成后，缓存中可能已有数据
+        cached_data = cache_manager.get(SNAPSHOT_CACHE_KEY)
+        if cached_data:
+            return cached_data
+
+    result = _fetch_market_snapshot(page_size, workers, timeout)
+    if use_cache:
+        cache_manager.set(SNAPSHOT_CACHE_KEY, result, ttl_policy.ttl('snapshot'))
+        logger.info(f"全市场快照已缓存: {len(result['代码'])} 只股票")
+    if save_to_db:
+        saved_count = db_manager.save_stock_info_batch(
+            [{"symbol": code, "name": name} for code, name in zip(result["代码"], result["名称"])]
+        )
+        logger.info(f"全市场快照已保存到数据库: {saved_count} 只股票")
+    return result
+
+def _get_snapshot_columns(use_cache: bool, save_to_db: bool, page_size: Optional[int], workers: Optional[int],
+                          timeout: Optional[float]) -> dict:
+    """获取按列组织的全市场快照，失败时抛出异常"""
+    snapshot_config = config.get_snapshot_config()
+    page_size = page_size or snapshot_config['page_size']
+    workers = workers or snapshot_config['workers']
+    if use_cache:
+        cached_data = cache_manager.get(SNAPSHOT_CACHE_KEY)
+        if cached_data:
+            logger.info("从缓存获取全市场快照")
+            return cached_data
+        # 快照整体缓存，并发的刷新请求只访问一次上游接口
+        return single_flight.do(SNAPSHOT_CACHE_KEY,
+                                lambda: _load_market_snapshot(use_cache, save_to_db, page_size, workers, timeout))
+    return _load_market_snapshot(use_cache, save_to_db, page_size, workers, timeout)
+
+def get_market_snapshot_frame(use_cache: bool = True, save_to_db: bool = True, page_size: Optional[int] = None,
+                              workers: Optional[int] = None, timeout: Optional[float] = None,
+                              deadline: Optional[float] = None) -> pd.DataFrame:
+    """
+    东方财富-沪深京A股全市场快照，请求失败时抛出异常，参数同 get_market_snapshot
+    :return: 每只股票一行的DataFrame，代码、名称为字符串列，其余为float64列
+    """
+    with deadline_scope(deadline):
+        columns = _get_snapshot_columns(use_cache, save_to_db, page_size, workers, timeout)
+    temp_df = pd.DataFrame(columns, columns=list(SNAPSHOT_FIELDS.values()))
+    for column in temp_df.columns:
+        if column not in TEXT_COLUMNS:
+            temp_df[column] = pd.to_numeric(temp_df[column], errors="coerce").astype("float64")
+    return temp_df
+
+def get_market_snapshot(use_cache: bool = True, save_to_db: bool = True, page_size: Optional[int] = None,
+                        workers: Optional[int] = None, timeout: Optional[float] = None,
+                        deadline: Optional[float] = None) -> str:
+    """
+    东方财富-沪深京A股全市场快照
+    通过 clist 接口分页获取全部A股的最新价、涨跌幅、成交量、成交额、换手率、市值和市盈率，
+    第一页之后的各页并发请求，整个快照作为一个缓存条目
+    :param use_cache: 是否使用缓存
+    :param save_to_db: 是否将股票代码和名称保存到数据库
+    :param page_size: 每页条数，默认读取配置项 SNAPSHOT_PAGE_SIZE
+    :param workers: 并发翻页的线程数，默认读取配置项 SNAPSHOT_WORKERS
+    :param timeout: 请求超时时间
+    :param deadline: 整个调用（含所有分页请求）的最长耗时（秒），超过时放弃请求，默认不限
+    :return: 按列组织的紧凑JSON字符串，例如 {"代码": [...], "最新价": [...]}
+    """
+    try:
+        with deadline_scope(deadline):
+            result = _get_snapshot_columns(use_cache, save_to_db, page_size, workers, timeout)
+        return json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+    except requests.RequestException as e:
+        logger.error(f"请求全市场快照时出错: {str(e)}")
+        return json.dumps({"error": f"Request failed: {str(e)}"}, ensure_ascii=False)
+    except Exception as e:
+        logger.error(f"获取全市场快照时出错: {str(e)}")
+        return json.dumps({"error": f"An unexpected error occurred: {str(e)}"}, ensure_ascii=False)
+
+if __name__ == "__main__":
+    print(get_market_snapshot()[:500])
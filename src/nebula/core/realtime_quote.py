@@ -2,14 +2,21 @@
 import pandas as pd
 import requests
 import json
-from ..utils.errors import retry_on_failure, make_request, handle_api_response
+from typing import List, Optional
+from ..utils.errors import make_request, handle_api_response
+from ..utils.retry import deadline_scope
 from ..utils.config import config
 from ..utils.cache import cache_manager
 from ..utils.database import db_manager
 from ..utils.logger import logger
+from ..utils.singleflight import single_flight
+from ..utils.tick_store import tick_store
+from ..utils.trading_calendar import ttl_policy
 
 # 常量定义
 BASE_URL = "https://push2.eastmoney.com/api/qt/stock/get"
+ULIST_URL = "https://push2.eastmoney.com/api/qt/ulist.np/get"
+BATCH_SIZE = 200
 FIELDS = (
     "f120,f121,f122,f174,f175,f59,f163,f43,f57,f58,f169,f170,f46,f44,f51,"
     "f168,f47,f164,f116,f60,f45,f52,f50,f48,f167,f117,f71,f161,f49,f530,"
@@ -33,63 +40,289 @@ TICK_MAP = {
     "涨停": "f51", "跌停": "f52", "外盘": "f49", "内盘": "f161"
 }
 
-@retry_on_failure()
-def get_stock_realtime_quote(symbol: str = "600900", use_cache: bool = True, save_to_db: bool = True) -> str:
+# 需要乘以100转换为股的盘口挂单量字段
+VOLUME_FIELDS = {"f32", "f34", "f36", "f38", "f40", "f20", "f18", "f16", "f14", "f12"}
+
+# ulist.np 列表接口的字段编号与 stock/get 不同，这里按 TICK_MAP 的名称做映射；
+# 列表接口只提供一档盘口，其余档位、涨停/跌停在批量结果中为空，均价由金额和总手推算
+LIST_TICK_MAP = {
+    "买一价": "f31", "卖一价": "f32",
+    "最新": "f2", "涨幅": "f3", "涨跌": "f4", "总手": "f5", "金额": "f6",
+    "换手": "f8", "量比": "f10", "最高": "f15", "最低": "f16", "今开": "f17",
+    "昨收": "f18", "外盘": "f34", "内盘": "f35"
+}
+LIST_FIELDS = ",".join(["f12", "f13", "f14"] + list(LIST_TICK_MAP.values()))
+
+
+def _secid(symbol: str) -> str:
+    """根据股票代码生成东方财富secid"""
+    market_code = 1 if symbol.startswith("6") else 0
+    return f"{market_code}.{symbol}"
+
+
+def _build_tick_dict(data: dict) -> dict:
+    """将 stock/get 接口返回的 data 字段转换为五档报价字典"""
+    tick_dict = {}
+    for key, field in TICK_MAP.items():
+        value = data.get(field)
+        if field in VOLUME_FIELDS:
+            value = value * 100 if value is not None else None
+        tick_dict[key] = value
+    return tick_dict
+
+
+def _parse_quote_list(data_json: dict) -> pd.DataFrame:
+    """将 ulist.np 接口返回的数据转换为按 TICK_MAP 列排列的 DataFrame"""
+    diff = (data_json.get("data") or {}).get("diff") or []
+    if isinstance(diff, dict):
+        diff = list(diff.values())
+
+    raw_df = pd.DataFrame(diff)
+    temp_df = pd.DataFrame({
+        "代码": raw_df.get("f12", pd.Series(dtype=object)).astype(str),
+        "名称": raw_df.get("f14", pd.Series(dtype=object)),
+    })
+    for key in TICK_MAP:
+        field = LIST_TICK_MAP.get(key)
+        if field is not None and field in raw_df:
+            temp_df[key] = pd.to_numeric(raw_df[field], errors="coerce")
+        else:
+            temp_df[key] = float("nan")
+    temp_df["均价"] = temp_df["金额"] / (temp_df["总手"] * 100)
+    return temp_df
+
+def _build_quote_params(symbol: str) -> dict:
+    """构建单只股票行情请求参数"""
+    return {
+        "fltt": "2",
+        "invt": "2",
+        "fields": FIELDS,
+        "secid": _secid(symbol),
+    }
+
+def _build_list_params(symbols: List[str]) -> dict:
+    """构建批量行情请求参数"""
+    return {
+        "fltt": "2",
+        "invt": "2",
+        "fields": LIST_FIELDS,
+        "secids": ",".join(_secid(symbol) for symbol in symbols),
+    }
+
+def _chunk_symbols(symbols: List[str], batch_size: int) -> List[List[str]]:
+    """按批次大小切分股票列表"""
+    return [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
+
+def _merge_quote_frames(frames: List[pd.DataFrame], symbols: List[str]) -> dict:
+    """合并各批次结果，按请求顺序排列并转换为按列组织的字典"""
+    temp_df = pd.concat(frames, ignore_index=True).drop_duplicates(subset="代码")
+    order = {symbol: i for i, symbol in enumerate(symbols)}
+    temp_df = temp_df[temp_df["代码"].isin(order)]
+    temp_df = temp_df.sort_values("代码", key=lambda col: col.map(order)).reset_index(drop=True)
+    temp_df = temp_df.astype(object).where(temp_df.notna(), None)
+    return temp_df.to_dict(orient='list')
+
+def _record_ticks(columns: dict):
+    """开启逐笔快照记录时，将新请求到的行情追加到逐笔快照存储"""
+    if config.get_tick_store_config()['record']:
+        tick_store.append(columns)
+
+def _quote_cache_key(symbol: str) -> str:
+    """批量行情中单只股票的缓存键"""
+    return f"realtime_quotes_{symbol}"
+
+def _split_rows(result: dict) -> dict:
+    """将按列组织的行情拆分为 {股票代码: 行字典}"""
+    columns = list(result)
+    return {row[0]: dict(zip(columns, row)) for row in zip(*result.values())} if columns else {}
+
+def _join_rows(rows: dict, symbols: List[str], columns: List[str]) -> dict:
+    """按请求顺序将 {股票代码: 行字典} 合并为按列组织的字典，缺失的股票不出现在结果中"""
+    ordered = [rows[symbol] for symbol in symbols if symbol in rows]
+    return {column: [row.get(column) for row in ordered] for column in columns}
+
+def _get_realtime_quote_records(symbol: str, use_cache: bool, save_to_db: bool,
+                                stale_while_revalidate: bool) -> Optional[List[dict]]:
+    """获取单只股票行情记录，失败时抛出异常，无数据时返回None"""
+    cache_key = f"realtime_quote_{symbol}"
+    if use_cache and stale_while_revalidate:
+        return cache_manager.get_or_refresh(
+            cache_key,
+            lambda: single_flight.do(cache_key, lambda: _fetch_realtime_quote(symbol, save_to_db)),
+            ttl_policy.ttl('realtime')
+        )
+
+    # 尝试从缓存获取数据
+    if use_cache:
+        cached_data = cache_manager.get(cache_key)
+        if cached_data:
+            logger.info(f"从缓存获取实时行情数据: {symbol}")
+            return cached_data
+        # 缓存未命中时，同一股票的并发请求只访问一次上游接口
+        return single_flight.do(cache_key, lambda: _load_realtime_quote(symbol, use_cache, save_to_db))
+
+    return _load_realtime_quote(symbol, use_cache, save_to_db)
+
+def get_stock_realtime_quote_frame(symbol: str = "600900", use_cache: bool = True, save_to_db: bool = True,
+                                   stale_while_revalidate: bool = False,
+                                   deadline: Optional[float] = None) -> Optional[pd.DataFrame]:
+    """
+    东方财富-行情报价，请求失败时抛出异常
+    :param symbol: 股票代码
+    :param use_cache: 是否使用缓存
+    :param save_to_db: 是否保存到数据库
+    :param stale_while_revalidate: 缓存软过期后立即返回旧数据，并在后台刷新
+    :param deadline: 整个调用（含重试和退避）的最长耗时（秒），超过时放弃请求，默认不限
+    :return: 行情报价DataFrame（item、value两列），无数据时返回None
+    """
+    with deadline_scope(deadline):
+        result = _get_realtime_quote_records(symbol, use_cache, save_to_db, stale_while_revalidate)
+    if result is None:
+        return None
+    return pd.DataFrame(result, columns=["item", "value"])
+
+def get_stock_realtime_quote(symbol: str = "600900", use_cache: bool = True, save_to_db: bool = True,
+                             stale_while_revalidate: bool = False, deadline: Optional[float] = None) -> str:
     """
     东方财富-行情报价
     :param symbol: 股票代码
     :param use_cache: 是否使用缓存
     :param save_to_db: 是否保存到数据库
+    :param stale_while_revalidate: 缓存软过期后立即返回旧数据，并在后台刷新
+    :param deadline: 整个调用（含重试和退避）的最长耗时（秒），超过时放弃请求，默认不限
     :return: 行情报价的JSON字符串
     """
-    # 尝试从缓存获取数据
+    try:
+        with deadline_scope(deadline):
+            result = _get_realtime_quote_records(symbol, use_cache, save_to_db, stale_while_revalidate)
+    except Exception as e:
+        logger.error(f"获取实时行情数据时出错: {str(e)}")
+        return f'{{"error": "An unexpected error occurred: {str(e)}"}}'
+    if result is None:
+        return '{"error": "No data found"}'
+    return json.dumps(result, ensure_ascii=False, indent=2)
+
+def _load_realtime_quote(symbol: str, use_cache: bool, save_to_db: bool) -> Optional[List[dict]]:
+    """请求单只股票行情并写入缓存和数据库"""
+    cache_key = f"realtime_quote_{symbol}"
     if use_cache:
-        cache_key = f"realtime_quote_{symbol}"
+        # 等待其他进程加载完成后，缓存中可能已有数据
         cached_data = cache_manager.get(cache_key)
         if cached_data:
-            logger.info(f"从缓存获取实时行情数据: {symbol}")
-            return json.dumps(cached_data, ensure_ascii=False, indent=2)
-    
-    market_code = 1 if symbol.startswith("6") else 0
-    params = {
-        "fltt": "2",
-        "invt": "2",
-        "fields": FIELDS,
-        "secid": f"{market_code}.{symbol}",
-    }
+            return cached_data
 
-    try:
-        response = make_request(BASE_URL, params=params, timeout=config.get_api_config()['timeout'])
-        data_json = handle_api_response(response)
-
-        if "data" not in data_json:
-            return '{"error": "No data found"}'
-
-        tick_dict = {}
-        for key, field in TICK_MAP.items():
-            value = data_json["data"].get(field)
-            if field in ["f32", "f34", "f36", "f38", "f40", "f20", "f18", "f16", "f14", "f12"]:
-                value = value * 100 if value is not None else None
-            tick_dict[key] = value
-
-        temp_df = pd.DataFrame(list(tick_dict.items()), columns=["item", "value"])
-        result = temp_df.to_dict(orient='records')
-        
-        # 缓存数据
-        if use_cache:
-            cache_manager.set(cache_key, result, config.get_redis_config()['default_ttl'])
-            logger.info(f"实时行情数据已缓存: {symbol}")
-        
-        # 保存到数据库
-        if save_to_db:
-            db_manager.save_stock_info(symbol, result)
-            logger.info(f"实时行情数据已保存到数据库: {symbol}")
-        
-        return temp_df.to_json(orient='records', force_ascii=False, indent=2)
+    result = _fetch_realtime_quote(symbol, save_to_db)
+    # 缓存数据
+    if result is not None and use_cache:
+        cache_manager.set(cache_key, result, ttl_policy.ttl('realtime'))
+        logger.info(f"实时行情数据已缓存: {symbol}")
+    return result
+
+def _fetch_realtime_quote(symbol: str, save_to_db: bool) -> Optional[List[dict]]:
+    """
+    请求单只股票行情（不读写缓存），失败时抛出异常
+    :return: [{"item": 名称, "value": 值}, ...]，接口无数据时返回None
+    """
+    response = make_request(BASE_URL, params=_build_quote_params(symbol), timeout=config.get_api_config()['timeout'])
+    data_json = handle_api_response(response)
+    if "data" not in data_json:
+        return None
+
+    tick_dict = _build_tick_dict(data_json["data"])
+    _record_ticks({"代码": [symbol], **{key: [value] for key, value in tick_dict.items()}})
+    result = pd.DataFrame(list(tick_dict.items()), columns=["item", "value"]).to_dict(orient='records')
+
+    # 保存到数据库
+    if save_to_db:
+        db_manager.save_stock_info(symbol, result)
+        logger.info(f"实时行情数据已保存到数据库: {symbol}")
+    return result
+
+def _get_realtime_quote_columns(symbols: List[str], batch_size: int, use_cache: bool, save_to_db: bool) -> dict:
+    """获取批量行情，返回按列组织的字典，失败时抛出异常"""
+    cached_rows = {}
+    if use_cache:
+        cached = cache_manager.get_many([_quote_cache_key(symbol) for symbol in symbols])
+        cached_rows = {symbol: cached[_quote_cache_key(symbol)] for symbol in symbols
+                       if _quote_cache_key(symbol) in cached}
+        if len(cached_rows) == len(symbols):
+            logger.info(f"从缓存获取批量实时行情数据: {len(symbols)} 只股票")
+            columns = list(next(iter(cached_rows.values())))
+            return _join_rows(cached_rows, symbols, columns)
 
+    missing = [symbol for symbol in symbols if symbol not in cached_rows]
+    frames = []
+    for chunk in _chunk_symbols(missing, batch_size):
+        response = make_request(ULIST_URL, params=_build_list_params(chunk),
+                                timeout=config.get_api_config()['timeout'])
+        frames.append(_parse_quote_list(handle_api_response(response)))
+
+    fetched = _merge_quote_frames(frames, missing)
+    _record_ticks(fetched)
+    fetched_rows = _split_rows(fetched)
+
+    if use_cache:
+        cache_manager.set_many({_quote_cache_key(symbol): row for symbol, row in fetched_rows.items()},
+                               ttl_policy.ttl('realtime'))
+        logger.info(f"批量实时行情数据已缓存: {len(fetched_rows)} 只股票，缓存命中 {len(cached_rows)} 只")
+
+    if save_to_db:
+        saved_count = db_manager.save_stock_info_batch(
+            [{"symbol": code, "name": name} for code, name in zip(fetched["代码"], fetched["名称"])]
+        )
+        logger.info(f"批量实时行情数据已保存到数据库: {saved_count} 只股票")
+
+    return _join_rows({**cached_rows, **fetched_rows}, symbols, list(fetched))
+
+def get_stock_realtime_quotes_frame(symbols: List[str], batch_size: int = BATCH_SIZE,
+                                    use_cache: bool = True, save_to_db: bool = True,
+                                    deadline: Optional[float] = None) -> pd.DataFrame:
+    """
+    东方财富-批量行情报价，请求失败时抛出异常
+    :param symbols: 股票代码列表
+    :param batch_size: 每次请求包含的股票数量
+    :param use_cache: 是否使用缓存
+    :param save_to_db: 是否保存到数据库
+    :param deadline: 整个调用（含重试和退避）的最长耗时（秒），超过时放弃请求，默认不限
+    :return: 每只股票一行的DataFrame，代码、名称为字符串列，其余为float64列
+    """
+    # 去重并保持原有顺序
+    symbols = list(dict.fromkeys(symbols))
+    columns = ["代码", "名称"] + list(TICK_MAP)
+    if not symbols:
+        return pd.DataFrame(columns=columns)
+
+    with deadline_scope(deadline):
+        temp_df = pd.DataFrame(_get_realtime_quote_columns(symbols, batch_size, use_cache, save_to_db))
+    for key in TICK_MAP:
+        if key in temp_df:
+            temp_df[key] = pd.to_numeric(temp_df[key], errors="coerce").astype("float64")
+    return temp_df
+
+def get_stock_realtime_quotes(symbols: List[str], batch_size: int = BATCH_SIZE,
+                              use_cache: bool = True, save_to_db: bool = True,
+                              deadline: Optional[float] = None) -> str:
+    """
+    东方财富-批量行情报价
+    :param symbols: 股票代码列表
+    :param batch_size: 每次请求包含的股票数量
+    :param use_cache: 是否使用缓存，按股票逐只缓存，整个列表的读取和写入各只需一次批量操作
+    :param save_to_db: 是否保存到数据库
+    :param deadline: 整个调用（含重试和退避）的最长耗时（秒），超过时放弃请求，默认不限
+    :return: 按列组织的行情报价JSON字符串，例如 {"代码": [...], "最新": [...]}
+    """
+    # 去重并保持原有顺序
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return json.dumps({}, ensure_ascii=False)
+
+    try:
+        with deadline_scope(deadline):
+            result = _get_realtime_quote_columns(symbols, batch_size, use_cache, save_to_db)
+        return json.dumps(result, ensure_ascii=False)
     except Exception as e:
-        logger.error(f"获取实时行情数据时出错: {str(e)}")
-        return f'{{"error": "An unexpected error occurred: {str(e)}"}}'
+        logger.error(f"获取批量实时行情数据时出错: {str(e)}")
+        return json.dumps({"error": f"An unexpected error occurred: {str(e)}"}, ensure_ascii=False)
 
 if __name__ == "__main__":
     stock_realtime_quote = get_stock_realtime_quote(symbol="600900")
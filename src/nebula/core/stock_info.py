@@ -2,6 +2,9 @@
 import pandas as pd
 import requests
 import json
+from typing import Optional
+from ..utils.http import http_transport
+from ..utils.retry import deadline_scope
 
 BASE_URL = "https://push2.eastmoney.com/api/qt/stock/get"
 PARAMS = {
@@ -23,28 +26,49 @@ CODE_NAME_MAP = {
     "f189": "上市时间",
 }
 
-def get_stock_info(symbol: str = "600900", timeout: float = None) -> str:
+def _build_info_params(symbol: str) -> dict:
+    """构建股票信息请求参数"""
+    market_code = 1 if symbol.startswith("6") else 0
+    return {**PARAMS, "secid": f"{market_code}.{symbol}"}
+
+def _parse_stock_info(data: dict):
+    """
+    解析股票信息接口返回的数据
+    :return: 股票信息DataFrame，无数据时返回None
+    """
+    if 'data' not in data:
+        return None
+    stock_data = {CODE_NAME_MAP[k]: v for k, v in data['data'].items() if k in CODE_NAME_MAP}
+    return pd.DataFrame(list(stock_data.items()), columns=['item', 'value'])
+
+def get_stock_info_frame(symbol: str = "600900", timeout: float = None,
+                         deadline: Optional[float] = None) -> Optional[pd.DataFrame]:
+    """
+    东方财富-个股-股票信息，请求失败时抛出异常
+    :param symbol: 股票代码
+    :param timeout: 请求超时时间
+    :param deadline: 整个调用的最长耗时（秒），超过时放弃请求，默认不限
+    :return: 股票信息DataFrame（item、value两列），无数据时返回None
+    """
+    with deadline_scope(deadline):
+        response = http_transport.get(BASE_URL, params=_build_info_params(symbol), timeout=timeout)
+        response.raise_for_status()
+        return _parse_stock_info(response.json())
+
+def get_stock_info(symbol: str = "600900", timeout: float = None, deadline: Optional[float] = None) -> str:
     """
     东方财富-个股-股票信息
     :param symbol: 股票代码
     :param timeout: 请求超时时间
+    :param deadline: 整个调用的最长耗时（秒），超过时放弃请求，默认不限
     :return: 股票信息的JSON字符串
     """
     try:
-        market_code = 1 if symbol.startswith("6") else 0
-        params = {**PARAMS, "secid": f"{market_code}.{symbol}"}
+        df = get_stock_info_frame(symbol, timeout, deadline)
         
-        with requests.Session() as session:
-            response = session.get(BASE_URL, params=params, timeout=timeout)
-            response.raise_for_status()
-            data = response.json()
-        
-        if 'data' not in data:
+        if df is None:
             return json.dumps({"error": "No data found"}, ensure_ascii=False, indent=2)
         
-        stock_data = {CODE_NAME_MAP[k]: v for k, v in data['data'].items() if k in CODE_NAME_MAP}
-        df = pd.DataFrame(list(stock_data.items()), columns=['item', 'value'])
-        
         return df.to_json(orient='records', force_ascii=False, indent=2)
     
     except requests.RequestException as e:
@@ -54,4 +78,4 @@ def get_stock_info(symbol: str = "600900", timeout: float = None) -> str:
 
 if __name__ == "__main__":
     result = get_stock_info(symbol="600900")
-    print(result)
\ No newline at end of file
+    print(result)
@@ -0,0 +1,431 @@
+# -*- coding:utf-8 -*-
+import math
+from collections import deque
+from typing import Optional, Dict, Any
+import numpy as np
+import pandas as pd
+from .indicators import MA_PERIODS
+from .batch_indicators import interpret_indicators_batch
+from ..utils.cache import cache_manager
+from ..utils.database import db_manager
+from ..utils.logger import logger
+
+# 流式指标：每根K线O(1)更新，计算口径与 ta 库及 batch_indicators 一致。
+# 所有状态都可以通过 to_dict/from_dict 序列化为JSON，保存到缓存或数据库
+
+NAN = float('nan')
+
+def _nan_to_none(value: float) -> Optional[float]:
+    return None if value is None or math.isnan(value) else value
+
+def _none_to_nan(value: Optional[float]) -> float:
+    return NAN if value is None else value
+
+def _evicted(values: deque) -> list:
+    """窗口已满时下一次追加会移出的值（用列表区分“没有移出”和NaN）"""
+    return [_nan_to_none(values[0])] if len(values) == values.maxlen else []
+
+def _undo_append(values: deque, evicted: list):
+    """撤销一次追加，恢复被移出的值"""
+    values.pop()
+    if evicted:
+        values.appendleft(_none_to_nan(evicted[0]))
+
+class EMAState:
+    """指数移动平均，等价于 pandas ewm(adjust=False, min_periods=window)"""
+
+    def __init__(self, window: int, alpha: Optional[float] = None, min_periods: Optional[int] = None):
+        self.window = window
+        self.alpha = alpha if alpha is not None else 2.0 / (window + 1)
+        self.min_periods = min_periods if min_periods is not None else window
+        self.state = NAN
+        self.count = 0
+
+    def update(self, x: float) -> float:
+        if math.isnan(self.state):
+            self.state = x
+        else:
+            self.state = (1 - self.alpha) * self.state + self.alpha * x
+        self.count += 1
+        return self.value
+
+    @property
+    def value(self) -> float:
+        return self.state if self.count >= self.min_periods else NAN
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'window': self.window, 'alpha': self.alpha, 'min_periods': self.min_periods,
+                'state': _nan_to_none(self.state), 'count': self.count}
+
+    def checkpoint(self) -> Dict[str, Any]:
+        """撤销下一次 update 所需的状态"""
+        return {'state': _nan_to_none(self.state), 'count': self.count}
+
+    def restore(self, data: Dict[str, Any]):
+        """撤销 checkpoint 之后的一次 update"""
+        self.state = _none_to_nan(data['state'])
+        self.count = data['count']
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'EMAState':
+        obj = cls(data['window'], data['alpha'], data['min_periods'])
+        obj.state = _none_to_nan(data['state'])
+        obj.count = data['count']
+        return obj
+
+class SMAState:
+    """简单移动平均，窗口内存在NaN时结果为NaN"""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+        self.nan_count = 0
+
+    def update(self, x: float) -> float:
+        if len(self.values) == self.window:
+            old = self.values[0]
+            if math.isnan(old):
+                self.nan_count -= 1
+            else:
+                self.total -= old
+        self.values.append(x)
+        if math.isnan(x):
+            self.nan_count += 1
+        else:
+            self.total += x
+        return self.value
+
+    @property
+    def value(self) -> float:
+        if len(self.values) < self.window or self.nan_count:
+            return NAN
+        return self.total / self.window
+
+    def to_dict(self) -> Dict[str, Any]:
+        # 同时保存累计和，保证恢复后的结果与不中断地逐根更新完全一致
+        return {'window': self.window, 'values': [_nan_to_none(v) for v in self.values], 'total': self.total}
+
+    def checkpoint(self) -> Dict[str, Any]:
+        return {'evicted': _evicted(self.values), 'total': self.total, 'nan_count': self.nan_count}
+
+    def restore(self, data: Dict[str, Any]):
+        _undo_append(self.values, data['evicted'])
+        self.total = data['total']
+        self.nan_count = data['nan_count']
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SMAState':
+        obj = cls(data['window'])
+        obj.values.extend(_none_to_nan(value) for value in data['values'])
+        obj.total = data['total']
+        obj.nan_count = sum(1 for value in obj.values if math.isnan(value))
+        return obj
+
+class RSIState:
+    """相对强弱指数（Wilder平滑）"""
+
+    def __init__(self, window: int = 14):
+        self.window = window
+        self.prev_close = NAN
+        self.up = EMAState(window, alpha=1.0 / window, min_periods=window)
+        self.down = EMAState(window, alpha=1.0 / window, min_periods=window)
+
+    def update(self, close: float) -> float:
+        # 第一根K线的涨跌幅按0处理，与 ta 库一致
+        diff = close - self.prev_close if not math.isnan(self.prev_close) else 0.0
+        self.up.update(diff if diff > 0 else 0.0)
+        self.down.update(-diff if diff < 0 else 0.0)
+        self.prev_close = close
+        return self.value
+
+    @property
+    def value(self) -> float:
+        up, down = self.up.value, self.down.value
+        if math.isnan(down):
+            return NAN
+        if down == 0:
+            return 100.0
+        return 100 - 100 / (1 + up / down)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'window': self.window, 'prev_close': _nan_to_none(self.prev_close),
+                'up': self.up.to_dict(), 'down': self.down.to_dict()}
+
+    def checkpoint(self) -> Dict[str, Any]:
+        return {'prev_close': _nan_to_none(self.prev_close), 'up': self.up.checkpoint(),
+                'down': self.down.checkpoint()}
+
+    def restore(self, data: Dict[str, Any]):
+        self.prev_close = _none_to_nan(data['prev_close'])
+        self.up.restore(data['up'])
+        self.down.restore(data['down'])
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RSIState':
+        obj = cls(data['window'])
+        obj.prev_close = _none_to_nan(data['prev_close'])
+        obj.up = EMAState.from_dict(data['up'])
+        obj.down = EMAState.from_dict(data['down'])
+        return obj
+
+class MACDState:
+    """MACD，信号线从MACD线有效后开始计算"""
+
+    def __init__(self, window_fast: int = 12, window_slow: int = 26, window_sign: int = 9):
+        self.fast = EMAState(window_fast)
+        self.slow = EMAState(window_slow)
+        self.signal = EMAState(window_sign)
+
+    def update(self, close: float) -> tuple:
+        self.fast.update(close)
+        self.slow.update(close)
+        macd_line = self.fast.value - self.slow.value
+        if not math.isnan(macd_line):
+            self.signal.update(macd_line)
+        return self.value
+
+    @property
+    def value(self) -> tuple:
+        macd_line = self.fast.value - self.slow.value
+        signal = self.signal.value
+        return macd_line, signal, macd_line - signal
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'fast': self.fast.to_dict(), 'slow': self.slow.to_dict(), 'signal': self.signal.to_dict()}
+
+    def checkpoint(self) -> Dict[str, Any]:
+        return {'fast': self.fast.checkpoint(), 'slow': self.slow.checkpoint(), 'signal': self.signal.checkpoint()}
+
+    def restore(self, data: Dict[str, Any]):
+        self.fast.restore(data['fast'])
+        self.slow.restore(data['slow'])
+        self.signal.restore(data['signal'])
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'MACDState':
+        obj = cls()
+        obj.fast = EMAState.from_dict(data['fast'])
+        obj.slow = EMAState.from_dict(data['slow'])
+        obj.signal = EMAState.from_dict(data['signal'])
+        return obj
+
+class KDJState:
+    """随机指标KDJ"""
+
+    def __init__(self, window: int = 14, smooth_window: int = 3):
+        self.window = window
+        self.highs = deque(maxlen=window)
+        self.lows = deque(maxlen=window)
+        self.k = NAN
+        self.d = SMAState(smooth_window)
+
+    def update(self, high: float, low: float, close: float) -> tuple:
+        self.highs.append(high)
+        self.lows.append(low)
+        if len(self.highs) < self.window:
+            self.k = NAN
+        else:
+            highest, lowest = max(self.highs), min(self.lows)
+            self.k = 100 * (close - lowest) / (highest - lowest) if highest != lowest else NAN
+        self.d.update(self.k)
+        return self.value
+
+    @property
+    def value(self) -> tuple:
+        d = self.d.value
+        return self.k, d, 3 * self.k - 2 * d
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'window': self.window, 'highs': list(self.highs), 'lows': list(self.lows),
+                'k': _nan_to_none(self.k), 'd': self.d.to_dict()}
+
+    def checkpoint(self) -> Dict[str, Any]:
+        return {'high': _evicted(self.highs), 'low': _evicted(self.lows), 'k': _nan_to_none(self.k),
+                'd': self.d.checkpoint()}
+
+    def restore(self, data: Dict[str, Any]):
+        _undo_append(self.highs, data['high'])
+        _undo_append(self.lows, data['low'])
+        self.k = _none_to_nan(data['k'])
+        self.d.restore(data['d'])
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'KDJState':
+        obj = cls(data['window'], data['d']['window'])
+        obj.highs.extend(data['highs'])
+        obj.lows.extend(data['lows'])
+        obj.k = _none_to_nan(data['k'])
+        obj.d = SMAState.from_dict(data['d'])
+        return obj
+
+class IndicatorState:
+    """
+    单只股票全部技术指标的流式状态，指标集合与 calculate_indicators 一致
+
+    同一时间的K线重复更新时（盘中最后一根K线不断变化），先回退到该K线之前的状态再重新计算。
+    回退只需各指标在上一次更新前的几个标量和被移出窗口的值，记录开销与窗口长度无关
+    """
+
+    def __init__(self):
+        self.ema = {period: EMAState(period) for period in MA_PERIODS}
+        self.sma = {period: SMAState(period) for period in MA_PERIODS}
+        self.kdj = KDJState()
+        self.rsi = RSIState()
+        self.macd = MACDState()
+        self.close = NAN
+        self.last_time = None
+        # 撤销最后一次 update 所需的状态
+        self._undo = None
+
+    def _state_dict(self) -> Dict[str, Any]:
+        return {
+            'ema': {str(period): state.to_dict() for period, state in self.ema.items()},
+            'sma': {str(period): state.to_dict() for period, state in self.sma.items()},
+            'kdj': self.kdj.to_dict(),
+            'rsi': self.rsi.to_dict(),
+            'macd': self.macd.to_dict(),
+            'close': _nan_to_none(self.close),
+            'last_time': self.last_time,
+        }
+
+    def _load_state(self, data: Dict[str, Any]):
+        self.ema = {int(period): EMAState.from_dict(state) for period, state in data['ema'].items()}
+        self.sma = {int(period): SMAState.from_dict(state) for period, state in data['sma'].items()}
+        self.kdj = KDJState.from_dict(data['kdj'])
+        self.rsi = RSIState.from_dict(data['rsi'])
+        self.macd = MACDState.from_dict(data['macd'])
+        self.close = _none_to_nan(data['close'])
+        self.last_time = data['last_time']
+
+    def _checkpoint(self) -> Dict[str, Any]:
+        return {
+            'ema': {str(period): state.checkpoint() for period, state in self.ema.items()},
+            'sma': {str(period): state.checkpoint() for period, state in self.sma.items()},
+            'kdj': self.kdj.checkpoint(),
+            'rsi': self.rsi.checkpoint(),
+            'macd': self.macd.checkpoint(),
+            'close': _nan_to_none(self.close),
+            'last_time': self.last_time,
+        }
+
+    def _restore(self, data: Dict[str, Any]):
+        for period, state in self.ema.items():
+            state.restore(data['ema'][str(period)])
+        for period, state in self.sma.items():
+            state.restore(data['sma'][str(period)])
+        self.kdj.restore(data['kdj'])
+        self.rsi.restore(data['rsi'])
+        self.macd.restore(data['macd'])
+        self.close = _none_to_nan(data['close'])
+        self.last_time = data['last_time']
+
+    def update(self, high: float, low: float, close: float, time: Optional[str] = None) -> Dict[str, float]:
+        """
+        用一根K线更新所有指标
+        :param time: K线时间，与上一次更新相同时视为替换最后一根K线
+        :return: 最新指标值
+        """
+        if time is not None and time == self.last_time and self._undo is not None:
+            # 回退后的状态与记录时相同，沿用原记录
+            self._restore(self._undo)
+        else:
+            self._undo = self._checkpoint()
+
+        high, low, close = float(high), float(low), float(close)
+        for state in self.ema.values():
+            state.update(close)
+        for state in self.sma.values():
+            state.update(close)
+        self.kdj.update(high, low, close)
+        self.rsi.update(close)
+        self.macd.update(close)
+        self.close = close
+        self.last_time = time
+        return self.snapshot()
+
+    def seed(self, history: pd.DataFrame) -> Dict[str, float]:
+        """
+        用历史行情初始化状态
+        :param history: 历史行情DataFrame，列名与 get_stock_history_quote 返回一致
+        """
+        history = history.sort_values('时间')
+        for time, high, low, close in zip(history['时间'], history['最高'], history['最低'], history['收盘']):
+            self.update(high, low, close, str(time))
+        return self.snapshot()
+
+    def snapshot(self) -> Dict[str, float]:
+        """最新指标值，键名与 calculate_indicators 生成的列名一致"""
+        result = {'close': self.close}
+        for period in MA_PERIODS:
+            result[f'EMA{period}'] = self.ema[period].value
+            result[f'SMA{period}'] = self.sma[period].value
+        result['K'], result['D'], result['J'] = self.kdj.value
+        result['RSI'] = self.rsi.value
+        result['MACD'], result['MACD_signal'], result['MACD_histogram'] = self.macd.value
+        return result
+
+    def advice(self, symbol: str = "") -> list:
+        """按最新指标值生成与 interpret_indicators 相同格式的解读（不含支撑位和阻力位）"""
+        snapshot = self.snapshot()
+        close = np.array([[snapshot.pop('close')]])
+        indicators = {name: np.array([[value]]) for name, value in snapshot.items()}
+        return interpret_indicators_batch([symbol], close, indicators)[symbol]
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = self._state_dict()
+        data['undo'] = self._undo
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'IndicatorState':
+        obj = cls()
+        obj._load_state(data)
+        obj._undo = data.get('undo')
+        if obj._undo is None and data.get('previous'):
+            # 兼容旧版本保存的完整上一状态：其 checkpoint 即为撤销记录
+            obj._undo = cls.from_dict(data['previous'])._checkpoint()
+        return obj
+
+def _state_cache_key(symbol: str, period: str) -> str:
+    return f"indicator_state_{symbol}_{period}"
+
+def load_indicator_state(symbol: str, period: str = 'daily') -> Optional[IndicatorState]:
+    """
+    加载指标状态，优先从缓存读取，其次从数据库读取
+    :return: 指标状态，不存在时返回None
+    """
+    data = cache_manager.get(_state_cache_key(symbol, period))
+    if data is None:
+        data = db_manager.get_indicator_state(symbol, period)
+    if data is None:
+        return None
+    try:
+        return IndicatorState.from_dict(data)
+    except (KeyError, TypeError, ValueError) as e:
+        logger.warning(f"指标状态格式无效，忽略: {symbol}, period={period}, 错误: {e}")
+        return None
+
+def load_indicator_frame(period: str = 'daily') -> pd.DataFrame:
+    """
+    从数据库读取所有股票的指标状态，返回最新指标值
+    :return: 每只股票一行的DataFrame，“代码”列之外的列名与 IndicatorState.snapshot 一致（不含close）
+    """
+    rows = []
+    for symbol, data in db_manager.get_indicator_states(period).items():
+        try:
+            snapshot = IndicatorState.from_dict(data).snapshot()
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"指标状态格式无效，忽略: {symbol}, period={period}, 错误: {e}")
+            continue
+        snapshot.pop('close')
+        rows.append({'代码': symbol, **snapshot})
+    columns = ['代码'] + [name for name in IndicatorState().snapshot() if name != 'close']
+    return pd.DataFrame(rows, columns=columns)
+
+def save_indicator_state(symbol: str, state: IndicatorState, period: str = 'daily',
+                         ttl: Optional[int] = None) -> bool:
+    """保存指标状态到缓存和数据库"""
+    data = state.to_dict()
+    cache_manager.set(_state_cache_key(symbol, period), data, ttl)
+    return db_manager.save_indicator_state(symbol, period, data)
@@ -0,0 +1,267 @@
+# -*- coding:utf-8 -*-
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import pandas as pd
+from .realtime_quote import get_stock_realtime_quotes_frame, BATCH_SIZE
+from ..utils.config import config
+from ..utils.logger import logger
+
+# 一次推送的内容：{股票代码: {字段名: 新值}}，只包含发生变化的字段
+QuoteChanges = Dict[str, Dict[str, Any]]
+
+class Subscription:
+    """
+    一个自选股订阅，可以同步迭代、异步迭代，或在创建时指定回调函数
+
+    消费者来不及处理时，多次推送按股票和字段合并为一次，每个字段只保留最新值，不会无限积压
+    """
+
+    def __init__(self, manager: 'SubscriptionManager', symbols: Iterable[str],
+                 callback: Optional[Callable[[QuoteChanges], None]] = None):
+        self.manager = manager
+        self.symbols = list(dict.fromkeys(symbols))
+        self.callback = callback
+        self._cond = threading.Condition()
+        self._pending: QuoteChanges = {}
+        self._closed = False
+        self._loop = None
+        self._async_event = None
+
+    def _deliver(self, changes: QuoteChanges):
+        """由调度线程调用，推送本订阅关注的变化"""
+        if self.callback is not None:
+            try:
+                self.callback(changes)
+            except Exception as e:
+                logger.error(f"订阅回调出错: {str(e)}")
+            return
+        with self._cond:
+            if self._closed:
+                return
+            for symbol, fields in changes.items():
+                self._pending.setdefault(symbol, {}).update(fields)
+            self._cond.notify_all()
+        self._wake_async()
+
+    def _wake_async(self):
+        loop, event = self._loop, self._async_event
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
+
+    def _take(self) -> QuoteChanges:
+        changes, self._pending = self._pending, {}
+        return changes
+
+    def get(self, timeout: Optional[float] = None) -> Optional[QuoteChanges]:
+        """
+        取出尚未消费的变化，没有时阻塞等待
+        :param timeout: 最长等待时间（秒），None表示一直等待
+        :return: {股票代码: {字段名: 新值}}，超时或订阅已关闭时返回None
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or self._closed, timeout)
+            return self._take() or None
+
+    def __iter__(self) -> 'Subscription':
+        return self
+
+    def __next__(self) -> QuoteChanges:
+        changes = self.get()
+        if changes is None:
+            raise StopIteration
+        return changes
+
+    def __aiter__(self) -> 'Subscription':
+        self._async_event = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        return self
+
+    async def __anext__(self) -> QuoteChanges:
+        while True:
+            with self._cond:
+                if self._pending:
+                    return self._take()
+                if self._closed:
+                    raise StopAsyncIteration
+                # 在锁内清除事件，之后到达的推送一定会再次设置事件
+                self._async_event.clear()
+            await self._async_event.wait()
+
+    def close(self):
+        """取消订阅，正在等待的迭代结束"""
+        self.manager.unsubscribe(self)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._wake_async()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __enter__(self) -> 'Subscription':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class SubscriptionManager:
+    """
+    自选股行情订阅管理
+
+    所有订阅的股票合并为一个列表，由一个调度线程按固定间隔通过批量行情接口轮询一次，
+    多个订阅共享同一只股票时不会重复请求。每次轮询与上一次的结果逐字段比较，
+    只把发生变化的字段推送给关注该股票的订阅；新订阅会先收到已有的完整行情
+    """
+
+    def __init__(self, interval: Optional[float] = None, batch_size: int = BATCH_SIZE,
+                 fetcher: Optional[Callable[[List[str]], pd.DataFrame]] = None, autostart: bool = True):
+        """
+        初始化订阅管理器
+        :param interval: 轮询间隔（秒），默认读取配置项 SUBSCRIPTION_INTERVAL
+        :param batch_size: 每次批量请求包含的股票数量
+        :param fetcher: 获取行情的函数，参数为股票代码列表，返回含“代码”列的DataFrame，
+                        默认不经过缓存请求批量行情接口，单次轮询的截止时间为一个轮询间隔
+        :param autostart: 有订阅时是否自动启动调度线程，为False时需自行调用 poll_once
+        """
+        self.interval = interval or config.get_subscription_config()['interval']
+        self.batch_size = batch_size
+        self.fetcher = fetcher or self._fetch
+        self.autostart = autostart
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._subscriptions: List[Subscription] = []
+        # 股票代码 -> 订阅数，保持订阅顺序
+        self._refs: Dict[str, int] = {}
+        self._last: Dict[str, Dict[str, Any]] = {}
+        self._stats = {'polls': 0, 'errors': 0, 'updates': 0, 'changed_fields': 0}
+
+    def _fetch(self, symbols: List[str]) -> pd.DataFrame:
+        return get_stock_realtime_quotes_frame(symbols, self.batch_size, use_cache=False, save_to_db=False,
+                                               deadline=self.interval)
+
+    def subscribe(self, symbols: Iterable[str],
+                  callback: Optional[Callable[[QuoteChanges], None]] = None) -> Subscription:
+        """
+        订阅一组股票
+        :param symbols: 股票代码列表
+        :param callback: 回调函数，在调度线程中以 {股票代码: {字段名: 新值}} 调用；不指定时通过迭代订阅对象获取变化
+        :return: 订阅对象
+        """
+        subscription = Subscription(self, symbols, callback)
+        with self._lock:
+            self._subscriptions.append(subscription)
+            for symbol in subscription.symbols:
+                self._refs[symbol] = self._refs.get(symbol, 0) + 1
+            initial = {symbol: dict(self._last[symbol]) for symbol in subscription.symbols if symbol in self._last}
+            if self.autostart and self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="nebula-subscriptions", daemon=True)
+                self._thread.start()
+        if initial:
+            subscription._deliver(initial)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """取消订阅，没有订阅关注的股票不再轮询"""
+        with self._lock:
+            if subscription not in self._subscriptions:
+                return
+            self._subscriptions.remove(subscription)
+            for symbol in subscription.symbols:
+                self._refs[symbol] -= 1
+                if self._refs[symbol] == 0:
+                    del self._refs[symbol]
+                    self._last.pop(symbol, None)
+        self._wake.set()
+
+    def close(self):
+        """关闭所有订阅"""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.close()
+
+    @staticmethod
+    def _rows(frame: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+        """DataFrame转为 {股票代码: {字段名: 值}}，缺失值为None"""
+        frame = frame.astype(object).where(frame.notna(), None)
+        return frame.set_index("代码").to_dict(orient='index')
+
+    def poll_once(self) -> QuoteChanges:
+        """
+        轮询一次并推送变化
+        :return: 本次所有发生变化的字段，请求失败时为空字典
+        """
+        with self._lock:
+            symbols = list(self._refs)
+        if not symbols:
+            return {}
+        try:
+            rows = self._rows(self.fetcher(symbols))
+        except Exception as e:
+            with self._lock:
+                self._stats['errors'] += 1
+            logger.warning(f"轮询订阅行情失败: {str(e)}")
+            return {}
+
+        changes = {}
+        with self._lock:
+            self._stats['polls'] += 1
+            for symbol, row in rows.items():
+                # 轮询期间已取消订阅的股票不再记录
+                if symbol not in self._refs:
+                    continue
+                previous = self._last.get(symbol)
+                changed = row if previous is None else \
+                    {field: value for field, value in row.items() if previous.get(field) != value}
+                if changed:
+                    changes[symbol] = changed
+                    self._last[symbol] = row
+            self._stats['changed_fields'] += sum(len(fields) for fields in changes.values())
+            subscriptions = list(self._subscriptions)
+
+        for subscription in subscriptions:
+            part = {symbol: changes[symbol] for symbol in subscription.symbols if symbol in changes}
+            if part:
+                subscription._deliver(part)
+                with self._lock:
+                    self._stats['updates'] += 1
+        return changes
+
+    def _run(self):
+        """调度线程：按间隔轮询，没有订阅时退出"""
+        while True:
+            with self._lock:
+                if not self._subscriptions:
+                    self._thread = None
+                    return
+            started = time.monotonic()
+            self.poll_once()
+            self._wake.wait(max(0.0, self.interval - (time.monotonic() - started)))
+            self._wake.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        订阅统计
+        :return: subscriptions、symbols 为当前订阅数和轮询的股票数，polls、errors 为轮询和失败次数，
+                 updates 为推送次数，changed_fields 为推送的字段总数
+        """
+        with self._lock:
+            return {'subscriptions': len(self._subscriptions), 'symbols': len(self._refs), **self._stats}
+
+# 全局订阅管理器实例
+subscription_manager = SubscriptionManager()
+
+def subscribe(symbols: Iterable[str], callback: Optional[Callable[[QuoteChanges], None]] = None) -> Subscription:
+    """
+    通过全局订阅管理器订阅一组股票的行情变化，参数同 SubscriptionManager.subscribe
+    :return: 订阅对象，可迭代（for changes in sub）或异步迭代（async for changes in sub），用完调用 close
+    """
+    return subscription_manager.subscribe(symbols, callback)
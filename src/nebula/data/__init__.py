@@ -0,0 +1,3 @@
+from .api import (history, realtime_quote, realtime_quotes, board_quote, hot_rank, stock_info, indicators,
+                  market_snapshot)
+from .convert import OUTPUT_FORMATS, convert, to_structured_array
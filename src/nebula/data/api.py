@@ -0,0 +1,88 @@
+# -*- coding:utf-8 -*-
+"""
+类型化数据接口：各函数直接返回带数值类型的数据，请求失败时抛出异常，
+不再经过缩进JSON字符串的序列化和解析
+
+deadline 参数为整个调用的最长耗时（秒），同 core 中的各函数
+
+output 参数可选 'frame'（DataFrame，默认）、'array'（NumPy结构化数组）或 'json'（紧凑JSON字符串）
+"""
+from typing import List, Optional
+import pandas as pd
+from ..core.board_quote import get_stock_board_quote_frame
+from ..core.history_quote import get_stock_history_frame
+from ..core.hot_rank import get_stock_hot_rank_frame
+from ..core.indicators import get_stock_indicators_frame
+from ..core.market_snapshot import get_market_snapshot_frame
+from ..core.realtime_quote import get_stock_realtime_quote_frame, get_stock_realtime_quotes_frame, BATCH_SIZE
+from ..core.stock_info import get_stock_info_frame
+from .convert import convert
+
+def history(symbol: str = "600900", period: str = "daily", start_date: Optional[str] = None,
+            end_date: Optional[str] = None, adjust: str = "", timeout: Optional[float] = None,
+            use_cache: bool = True, save_to_db: bool = True, sync: bool = False,
+            storage: Optional[str] = None, deadline: Optional[float] = None, output: str = 'frame'):
+    """
+    历史行情，“时间”列为datetime64，“成交量”列为int64，其余列为float64
+    :param output: 输出格式，其余参数同 get_stock_history_quote
+    """
+    temp_df = get_stock_history_frame(symbol, period, start_date, end_date, adjust, timeout,
+                                      use_cache, save_to_db, sync, storage, deadline)
+    if not temp_df.empty:
+        temp_df = temp_df.assign(时间=pd.to_datetime(temp_df["时间"]))
+    return convert(temp_df, output)
+
+def realtime_quote(symbol: str = "600900", use_cache: bool = True, save_to_db: bool = True,
+                   stale_while_revalidate: bool = False, deadline: Optional[float] = None,
+                   output: str = 'frame'):
+    """
+    单只股票五档报价，item、value两列，无数据时为空表
+    :param output: 输出格式，其余参数同 get_stock_realtime_quote
+    """
+    temp_df = get_stock_realtime_quote_frame(symbol, use_cache, save_to_db, stale_while_revalidate, deadline)
+    if temp_df is None:
+        temp_df = pd.DataFrame(columns=["item", "value"])
+    return convert(temp_df, output)
+
+def realtime_quotes(symbols: List[str], batch_size: int = BATCH_SIZE, use_cache: bool = True,
+                    save_to_db: bool = True, deadline: Optional[float] = None, output: str = 'frame'):
+    """
+    批量行情，每只股票一行，行情字段为float64
+    :param output: 输出格式，其余参数同 get_stock_realtime_quotes
+    """
+    return convert(get_stock_realtime_quotes_frame(symbols, batch_size, use_cache, save_to_db, deadline), output)
+
+def board_quote(deadline: Optional[float] = None, output: str = 'frame'):
+    """概念板块行情，无数据时为空表"""
+    temp_df = get_stock_board_quote_frame(deadline)
+    return convert(temp_df if temp_df is not None else pd.DataFrame(), output)
+
+def hot_rank(deadline: Optional[float] = None, output: str = 'frame'):
+    """个股人气榜"""
+    return convert(get_stock_hot_rank_frame(deadline), output)
+
+def stock_info(symbol: str = "600900", timeout: Optional[float] = None, deadline: Optional[float] = None,
+               output: str = 'frame'):
+    """股票基本信息，item、value两列，无数据时为空表"""
+    temp_df = get_stock_info_frame(symbol, timeout, deadline)
+    if temp_df is None:
+        temp_df = pd.DataFrame(columns=["item", "value"])
+    return convert(temp_df, output)
+
+def market_snapshot(use_cache: bool = True, save_to_db: bool = True, page_size: Optional[int] = None,
+                    workers: Optional[int] = None, timeout: Optional[float] = None, deadline: Optional[float] = None,
+                    output: str = 'frame'):
+    """
+    沪深京A股全市场快照，每只股票一行，行情字段为float64
+    :param output: 输出格式，其余参数同 get_market_snapshot
+    """
+    return convert(get_market_snapshot_frame(use_cache, save_to_db, page_size, workers, timeout, deadline), output)
+
+def indicators(symbol: str = "600900", period: str = 'daily', use_cache: bool = True, save_to_db: bool = True,
+               stale_while_revalidate: bool = False, deadline: Optional[float] = None, output: str = 'frame'):
+    """
+    技术指标解读，指标名称、值、操作三列
+    :param output: 输出格式，其余参数同 get_stock_indicators
+    """
+    return convert(get_stock_indicators_frame(symbol, period, use_cache, save_to_db, stale_while_revalidate, deadline),
+                   output)
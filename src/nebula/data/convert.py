@@ -0,0 +1,57 @@
+# -*- coding:utf-8 -*-
+import numpy as np
+import pandas as pd
+
+# 类型化接口支持的输出格式
+OUTPUT_FORMATS = ('frame', 'array', 'json')
+
+def to_structured_array(df: pd.DataFrame) -> np.ndarray:
+    """
+    将DataFrame转换为NumPy结构化数组
+
+    数值列和时间列保留原有类型，其余列转换为定长Unicode字符串（宽度取该列最长值），缺失值为空字符串
+
+    Args:
+        df: 待转换的DataFrame
+
+    Returns:
+        np.ndarray: 字段名与列名一致的结构化数组
+    """
+    fields = []
+    columns = []
+    for name in df.columns:
+        column = df[name]
+        if pd.api.types.is_bool_dtype(column) or pd.api.types.is_numeric_dtype(column):
+            values = column.to_numpy()
+        elif pd.api.types.is_datetime64_any_dtype(column):
+            values = column.to_numpy(dtype='datetime64[ns]')
+        else:
+            text = column.astype(object).where(column.notna(), '').astype(str)
+            width = max(1, int(text.str.len().max())) if len(text) else 1
+            values = text.to_numpy(dtype=f'U{width}')
+        fields.append((str(name), values.dtype))
+        columns.append(values)
+
+    array = np.empty(len(df), dtype=fields)
+    for (name, _), values in zip(fields, columns):
+        array[name] = values
+    return array
+
+def convert(df: pd.DataFrame, output: str = 'frame'):
+    """
+    按输出格式转换DataFrame
+
+    Args:
+        df: 待转换的DataFrame
+        output: 'frame' 返回DataFrame，'array' 返回结构化数组，'json' 返回不缩进的紧凑JSON字符串
+
+    Returns:
+        转换后的数据
+    """
+    if output == 'frame':
+        return df
+    if output == 'array':
+        return to_structured_array(df)
+    if output == 'json':
+        return df.to_json(orient='records', force_ascii=False, date_format='iso', date_unit='s')
+    raise ValueError(f"不支持的输出格式: {output}，可选 {', '.join(OUTPUT_FORMATS)}")
@@ -0,0 +1,223 @@
+# -*- coding:utf-8 -*-
+"""
+选股器：对全市场快照和已保存的指标列做向量化筛选和排序
+
+条件可以写成字符串或元组，右侧为数值时按数值比较，为列名时逐行比较两列：
+    "涨跌幅 > 5"、"换手率 between 1 and 10"、"最新价 > EMA20"
+    ("涨跌幅", ">", 5)、("换手率", "between", (1, 10))、("代码", "in", ["600900", "000001"])
+
+数值列与常数的区间条件使用按列预排序的索引，通过二分查找定位命中的行，重复筛选时不再扫描整列
+"""
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+from .core.market_snapshot import get_market_snapshot_frame
+from .core.streaming_indicators import load_indicator_frame
+
+Condition = Union[str, Tuple[str, str, Any]]
+
+COMPARISON_OPERATORS = ('>=', '<=', '==', '!=', '>', '<')
+CONDITION_PATTERN = re.compile(r'^\s*(\S+)\s*(>=|<=|==|!=|>|<)\s*(\S+)\s*$')
+BETWEEN_PATTERN = re.compile(r'^\s*(\S+)\s+between\s+(\S+)\s+and\s+(\S+)\s*$', re.IGNORECASE)
+
+def _parse_operand(text: str) -> Union[float, str]:
+    """数字解析为数值，其他视为列名"""
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+def parse_condition(condition: Condition) -> Tuple[str, str, Any]:
+    """
+    将条件统一为 (列名, 运算符, 值) 元组
+
+    Args:
+        condition: 条件字符串或元组
+
+    Returns:
+        (列名, 运算符, 值)，between 的值为 (下限, 上限)
+    """
+    if not isinstance(condition, str):
+        column, operator, value = condition
+        return column, operator.lower(), value
+    match = BETWEEN_PATTERN.match(condition)
+    if match:
+        return match.group(1), 'between', (_parse_operand(match.group(2)), _parse_operand(match.group(3)))
+    match = CONDITION_PATTERN.match(condition)
+    if match:
+        return match.group(1), match.group(2), _parse_operand(match.group(3))
+    raise ValueError(f"无法解析筛选条件: {condition}")
+
+class Screener:
+    """基于DataFrame列的向量化选股器"""
+
+    def __init__(self, frame: pd.DataFrame):
+        """
+        初始化选股器
+
+        Args:
+            frame: 每只股票一行的数据，如全市场快照与指标列合并后的结果
+        """
+        self.frame = frame.reset_index(drop=True)
+        self._values: Dict[str, np.ndarray] = {}
+        self._indexes: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def from_snapshot(cls, period: str = 'daily', with_indicators: bool = True,
+                      use_cache: bool = True) -> 'Screener':
+        """
+        使用全市场快照创建选股器
+
+        Args:
+            period: 指标状态的周期
+            with_indicators: 是否合并数据库中保存的指标列（EMA20、RSI、MACD等），没有指标状态的股票为NaN
+            use_cache: 获取快照时是否使用缓存
+
+        Returns:
+            Screener: 选股器
+        """
+        frame = get_market_snapshot_frame(use_cache=use_cache, save_to_db=False)
+        if with_indicators:
+            frame = frame.merge(load_indicator_frame(period), on='代码', how='left')
+        return cls(frame)
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def _numeric(self, column: str) -> np.ndarray:
+        """数值列的float64数组"""
+        values = self._values.get(column)
+        if values is None:
+            if column not in self.frame:
+                raise KeyError(f"未知的列: {column}")
+            values = pd.to_numeric(self.frame[column], errors='coerce').to_numpy(dtype='float64')
+            self._values[column] = values
+        return values
+
+    def index(self, column: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        列的预排序索引，首次使用时建立
+
+        Returns:
+            (排序后的行号, 排序后的非NaN值)
+        """
+        cached = self._indexes.get(column)
+        if cached is None:
+            values = self._numeric(column)
+            order = np.argsort(values, kind='stable')
+            valid = int(np.count_nonzero(~np.isnan(values)))
+            # argsort 将NaN排在最后，只保留有效值参与二分查找
+            cached = (order[:valid], values[order[:valid]])
+            self._indexes[column] = cached
+        return cached
+
+    def _range_mask(self, column: str, low: Optional[float], high: Optional[float],
+                    low_inclusive: bool = True, high_inclusive: bool = True) -> np.ndarray:
+        """通过预排序索引的二分查找计算区间条件"""
+        order, sorted_values = self.index(column)
+        start = 0 if low is None else np.searchsorted(sorted_values, low, side='left' if low_inclusive else 'right')
+        end = len(sorted_values) if high is None else np.searchsorted(sorted_values, high,
+                                                                      side='right' if high_inclusive else 'left')
+        mask = np.zeros(len(self.frame), dtype=bool)
+        mask[order[start:end]] = True
+        return mask
+
+    def mask(self, condition: Condition) -> np.ndarray:
+        """
+        计算单个条件的布尔掩码，NaN不满足任何比较条件
+
+        Args:
+            condition: 条件字符串或元组
+
+        Returns:
+            np.ndarray: 与行数相同的布尔数组
+        """
+        column, operator, value = parse_condition(condition)
+        if operator == 'between':
+            low, high = value
+            return self._range_mask(column, float(low), float(high))
+        if operator == 'in':
+            return self.frame[column].isin(list(value)).to_numpy()
+        if operator not in COMPARISON_OPERATORS:
+            raise ValueError(f"不支持的运算符: {operator}")
+
+        if isinstance(value, str) and value in self.frame:
+            # 两列逐行比较
+            left, right = self._numeric(column), self._numeric(value)
+            with np.errstate(invalid='ignore'):
+                return {'>': np.greater, '>=': np.greater_equal, '<': np.less, '<=': np.less_equal,
+                        '==': np.equal, '!=': lambda a, b: ~np.equal(a, b) & ~np.isnan(a) & ~np.isnan(b)
+                        }[operator](left, right)
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            # 文本列的相等比较，如 名称 == 长江电力
+            if operator == '==':
+                return (self.frame[column] == value).to_numpy()
+            if operator == '!=':
+                return (self.frame[column] != value).to_numpy()
+            raise ValueError(f"条件右侧不是数值或列名: {value}")
+
+        value = float(value)
+        if operator == '>':
+            return self._range_mask(column, value, None, low_inclusive=False)
+        if operator == '>=':
+            return self._range_mask(column, value, None)
+        if operator == '<':
+            return self._range_mask(column, None, value, high_inclusive=False)
+        if operator == '<=':
+            return self._range_mask(column, None, value)
+        if operator == '==':
+            return self._range_mask(column, value, value)
+        values = self._numeric(column)
+        return ~np.isnan(values) & (values != value)
+
+    def screen(self, conditions: Iterable[Condition] = (), rank_by: Optional[str] = None,
+               top: Optional[int] = None, ascending: bool = False,
+               columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        按条件筛选并排序
+
+        Args:
+            conditions: 条件列表，全部满足才入选
+            rank_by: 排序列，该列为NaN的股票不参与排序
+            top: 只返回排名前N的股票
+            ascending: 是否升序排序，默认降序（如成交额最大的N只）
+            columns: 返回的列，默认全部
+
+        Returns:
+            pd.DataFrame: 入选的股票
+        """
+        mask = np.ones(len(self.frame), dtype=bool)
+        for condition in conditions:
+            mask &= self.mask(condition)
+        rows = np.flatnonzero(mask)
+
+        if rank_by is not None:
+            keys = self._numeric(rank_by)[rows]
+            rows = rows[~np.isnan(keys)]
+            keys = keys[~np.isnan(keys)]
+            if not ascending:
+                keys = -keys
+            if top is not None and top < len(rows):
+                # 先用 argpartition 选出前N，再只对这N个排序
+                part = np.argpartition(keys, top - 1)[:top]
+                rows, keys = rows[part], keys[part]
+            rows = rows[np.argsort(keys, kind='stable')]
+        elif top is not None:
+            rows = rows[:top]
+
+        result = self.frame.iloc[rows]
+        if columns is not None:
+            result = result[list(columns)]
+        return result.reset_index(drop=True)
+
+def screen(conditions: Iterable[Condition] = (), rank_by: Optional[str] = None, top: Optional[int] = None,
+           ascending: bool = False, columns: Optional[List[str]] = None, period: str = 'daily',
+           with_indicators: bool = True) -> pd.DataFrame:
+    """
+    对全市场快照执行一次筛选，参数同 Screener.screen 和 Screener.from_snapshot
+
+    需要反复筛选时应创建 Screener 实例并复用，以便重用已建立的排序索引
+    """
+    screener = Screener.from_snapshot(period=period, with_indicators=with_indicators)
+    return screener.screen(conditions, rank_by=rank_by, top=top, ascending=ascending, columns=columns)
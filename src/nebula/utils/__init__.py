@@ -1,4 +1,12 @@
 from .cache import CacheManager, cache_manager
 from .database import DatabaseManager, db_manager
+from .column_store import ColumnStore, column_store
 from .config import Config, config
+from .http import HttpTransport, http_transport
+from .rate_limit import HostLimiter, RateLimiter, RateLimitTimeout, rate_limiter
+from .host_pool import HostPool, push2_pool, push2his_pool
+from .retry import RetryPolicy, RetryBudget, DeadlineExceeded, deadline_scope, retry_budget
+from .tick_store import TickStore, tick_store
+from .singleflight import SingleFlight, single_flight
+from .trading_calendar import TradingCalendar, TTLPolicy, trading_calendar, ttl_policy
 from .errors import retry_on_failure, StockAnalyzerError, NetworkError, DataParseError, APIError
\ No newline at end of file
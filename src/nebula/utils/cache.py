@@ -1,13 +1,159 @@
 # -*- coding:utf-8 -*-
 import json
+import time
+import uuid
+import threading
 import redis
-from typing import Optional, Any
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from typing import Optional, Any, Dict, List, Callable
 from datetime import timedelta
 from .config import config
 from .logger import logger
 
+# 软过期缓存条目的标记字段：{"__swr__": 软过期时间戳, "value": 缓存值}
+SWR_MARKER = '__swr__'
+
+# 仅当锁仍由自己持有时才删除，避免误删其他进程在锁过期后重新获取的锁
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+def _unwrap(value: Any) -> Any:
+    """去掉软过期条目的包装，返回实际缓存值；已过软过期时间的条目视为不存在，返回None"""
+    if isinstance(value, dict) and SWR_MARKER in value:
+        if time.time() >= value[SWR_MARKER]:
+            return None
+        return value.get('value')
+    return value
+
+class LocalCache:
+    """
+    进程内LRU缓存
+
+    保存序列化后的字符串，按条目数和总大小（序列化后按UTF-8编码的字节数）双重限制，
+    超出时淘汰最久未使用的条目；过期条目在读取或淘汰时清理
+    """
+    
+    def __init__(self, max_items: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        """
+        初始化本地缓存
+        
+        Args:
+            max_items: 最大条目数
+            max_bytes: 最大总大小（字节）
+        """
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self.size -= size
+    
+    def get(self, key: str) -> Optional[str]:
+        """获取序列化后的缓存值，不存在或过期时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.time() > entry[1]:
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def set(self, key: str, serialized_value: str, ttl: float) -> bool:
+        """设置缓存值，单个值超过总大小限制时不缓存"""
+        # 缓存值含中文（ensure_ascii=False），按编码后的字节数计算大小
+        size = len(serialized_value.encode('utf-8'))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes or ttl <= 0:
+                return False
+            self._entries[key] = (serialized_value, time.time() + ttl, size)
+            self.size += size
+            while len(self._entries) > self.max_items or self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            return True
+    
+    def delete(self, key: str) -> bool:
+        """删除缓存值"""
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            return True
+    
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        """批量获取序列化后的缓存值，只返回存在且未过期的键"""
+        result = {}
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None or now > entry[1]:
+                    if entry is not None:
+                        self._remove(key)
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                result[key] = entry[0]
+        return result
+    
+    def set_many(self, mapping: Dict[str, str], ttl: float) -> int:
+        """批量设置缓存值，返回成功缓存的数量"""
+        return sum(self.set(key, serialized_value, ttl) for key, serialized_value in mapping.items())
+    
+    def delete_many(self, keys: List[str]) -> int:
+        """批量删除缓存值，返回删除的数量"""
+        with self._lock:
+            present = [key for key in keys if key in self._entries]
+            for key in present:
+                self._remove(key)
+            return len(present)
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def stats(self) -> Dict[str, int]:
+        """命中统计和容量使用情况"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'items': len(self._entries),
+            'bytes': self.size,
+        }
+
 class CacheManager:
-    """缓存管理器，使用Redis作为缓存后端，支持Upstash Redis"""
+    """
+    缓存管理器，使用Redis作为缓存后端，支持Upstash Redis
+
+    进程内LRU缓存（L1）位于Redis（L2）之前。连接Redis时，L1条目的过期时间不超过
+    CACHE_L1_TTL，并且写入和删除会通过Redis发布订阅通知其他进程清除对应的L1条目；
+    无法连接Redis时L1作为唯一的缓存层，使用完整的过期时间
+    """
     
     def __init__(self, host: Optional[str] = None, port: Optional[int] = None, db: Optional[int] = None, 
                  password: Optional[str] = None, default_ttl: Optional[int] = None, url: Optional[str] = None):
@@ -24,6 +170,7 @@ class CacheManager:
         """
         # 使用配置文件中的默认值或传入的参数
         redis_config = config.get_redis_config()
+        cache_config = config.get_cache_config()
         self.url = url or redis_config['url']
         self.host = host or redis_config['host']
         self.port = port or redis_config['port']
@@ -31,6 +178,22 @@ class CacheManager:
         self.password = password or redis_config['password']
         self.default_ttl = default_ttl or redis_config['default_ttl']
         
+        self.l1 = LocalCache(cache_config['l1_max_items'], cache_config['l1_max_bytes'])
+        self.l1_ttl = cache_config['l1_ttl']
+        self.invalidation_channel = cache_config['invalidation_channel']
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.stale_ttl = cache_config['stale_ttl']
+        self.refresh_workers = cache_config['refresh_workers']
+        self._refresh_executor = None
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.swr_stats = {'fresh': 0, 'stale': 0, 'misses': 0, 'refreshes': 0, 'refresh_errors': 0}
+        # 用于识别本进程发出的失效通知
+        self._origin = uuid.uuid4().hex
+        self._subscriber = None
+        
         try:
             # 优先使用URL连接（支持Upstash Redis）
             if self.url and self.url != 'redis://localhost:6379/0':
@@ -46,14 +209,34 @@ class CacheManager:
             # 测试连接
             self.redis_client.ping()
             logger.info("成功连接到Redis服务器")
+            self._start_invalidation_listener()
         except Exception as e:
-            logger.warning(f"无法连接到Redis服务器: {e}，将使用内存字典作为后备缓存")
+            logger.warning(f"无法连接到Redis服务器: {e}，将使用进程内缓存作为后备缓存")
             self.redis_client = None
-            self._local_cache = {}
     
-    def _get_local_cache_key(self, key: str) -> str:
-        """生成本地缓存的键"""
-        return f"local_cache:{key}"
+    def _handle_invalidation(self, message: Dict[str, Any]):
+        """收到其他进程的失效通知时清除本地对应的L1条目"""
+        try:
+            payload = json.loads(message['data'])
+            if payload.get('origin') != self._origin:
+                for key in payload.get('keys', []):
+                    self.l1.delete(key)
+        except Exception as e:
+            logger.warning(f"处理缓存失效通知时出错: {e}")
+    
+    def _start_invalidation_listener(self):
+        """在后台线程中订阅失效通知频道"""
+        try:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.invalidation_channel: self._handle_invalidation})
+            self._subscriber = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+        except Exception as e:
+            # 订阅失败时仍可依赖较短的L1过期时间
+            logger.warning(f"订阅缓存失效通知失败: {e}")
+            self._subscriber = None
+    
+    def _invalidation_message(self, *keys: str) -> str:
+        return json.dumps({'origin': self._origin, 'keys': list(keys)})
     
     def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
         """
@@ -73,26 +256,40 @@ class CacheManager:
             expire_time = ttl if ttl is not None else self.default_ttl
             
             if self.redis_client:
-                # 使用Redis缓存
-                result = self.redis_client.setex(key, expire_time, serialized_value)
+                # 写入Redis并在同一次往返中通知其他进程
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.setex(key, expire_time, serialized_value)
+                pipe.publish(self.invalidation_channel, self._invalidation_message(key))
+                result = pipe.execute()[0]
+                self.l1.set(key, serialized_value, min(expire_time, self.l1_ttl))
                 logger.debug(f"缓存设置成功: {key}")
                 return result
             else:
                 # 使用本地缓存
-                import time
-                self._local_cache[self._get_local_cache_key(key)] = {
-                    'value': serialized_value,
-                    'expire_at': time.time() + expire_time
-                }
+                self.l1.set(key, serialized_value, expire_time)
                 logger.debug(f"本地缓存设置成功: {key}")
                 return True
         except Exception as e:
             logger.error(f"设置缓存时出错: {e}")
             return False
     
+    def _l1_ttl(self, pttl: Optional[int]) -> float:
+        """
+        从Redis读到的条目写入L1时的过期时间
+
+        Args:
+            pttl: Redis PTTL 的返回值（毫秒），-1表示没有过期时间，-2表示键已不存在
+
+        Returns:
+            不超过 l1_ttl 和Redis剩余过期时间的秒数
+        """
+        if pttl is None or pttl == -1:
+            return self.l1_ttl
+        return min(self.l1_ttl, max(pttl, 0) / 1000)
+    
     def get(self, key: str) -> Optional[Any]:
         """
-        获取缓存值
+        获取缓存值，软过期条目在软过期时间内返回其中的值，之后视为不存在（旧值只由 get_or_refresh 返回）
         
         Args:
             key: 缓存键
@@ -100,32 +297,33 @@ class CacheManager:
         Returns:
             缓存值或None（如果不存在或过期）
         """
+        return _unwrap(self._get_raw(key))
+    
+    def _get_raw(self, key: str) -> Optional[Any]:
+        """获取反序列化后的缓存条目（不去掉软过期包装）"""
         try:
-            if self.redis_client:
-                # 使用Redis缓存
-                serialized_value = self.redis_client.get(key)
-                if serialized_value is None:
-                    logger.debug(f"缓存键不存在: {key}")
-                    return None
-                logger.debug(f"从Redis获取缓存成功: {key}")
-                return json.loads(serialized_value)
-            else:
-                # 使用本地缓存
-                import time
-                cache_key = self._get_local_cache_key(key)
-                if cache_key not in self._local_cache:
-                    logger.debug(f"本地缓存键不存在: {key}")
-                    return None
-                
-                cache_entry = self._local_cache[cache_key]
-                if time.time() > cache_entry['expire_at']:
-                    # 缓存过期，删除
-                    del self._local_cache[cache_key]
-                    logger.debug(f"本地缓存已过期并删除: {key}")
-                    return None
-                
+            serialized_value = self.l1.get(key)
+            if serialized_value is not None:
                 logger.debug(f"从本地缓存获取成功: {key}")
-                return json.loads(cache_entry['value'])
+                return json.loads(serialized_value)
+            
+            if not self.redis_client:
+                logger.debug(f"本地缓存键不存在: {key}")
+                return None
+            
+            # 同一次往返中读取剩余过期时间，L1条目不晚于Redis中的条目过期
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.pttl(key)
+            serialized_value, pttl = pipe.execute()
+            if serialized_value is None:
+                self.l2_misses += 1
+                logger.debug(f"缓存键不存在: {key}")
+                return None
+            self.l2_hits += 1
+            self.l1.set(key, serialized_value, self._l1_ttl(pttl))
+            logger.debug(f"从Redis获取缓存成功: {key}")
+            return json.loads(serialized_value)
         except Exception as e:
             logger.error(f"获取缓存时出错: {e}")
             return None
@@ -141,27 +339,24 @@ class CacheManager:
             bool: 是否删除成功
         """
         try:
+            deleted = self.l1.delete(key)
             if self.redis_client:
                 # 使用Redis缓存
-                result = self.redis_client.delete(key)
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.delete(key)
+                pipe.publish(self.invalidation_channel, self._invalidation_message(key))
+                result = pipe.execute()[0]
                 logger.debug(f"从Redis删除缓存: {key}, 结果: {result > 0}")
                 return result > 0
-            else:
-                # 使用本地缓存
-                cache_key = self._get_local_cache_key(key)
-                if cache_key in self._local_cache:
-                    del self._local_cache[cache_key]
-                    logger.debug(f"从本地缓存删除成功: {key}")
-                    return True
-                logger.debug(f"本地缓存键不存在: {key}")
-                return False
+            logger.debug(f"从本地缓存删除: {key}, 结果: {deleted}")
+            return deleted
         except Exception as e:
             logger.error(f"删除缓存时出错: {e}")
             return False
     
     def exists(self, key: str) -> bool:
         """
-        检查缓存键是否存在且未过期
+        检查缓存键是否存在且未过期，已过软过期时间的条目与 get 一致视为不存在
         
         Args:
             key: 缓存键
@@ -169,31 +364,223 @@ class CacheManager:
         Returns:
             bool: 是否存在
         """
+        # 软过期时间保存在条目内，需要读取条目才能判断
+        exists = self.get(key) is not None
+        logger.debug(f"缓存键存在检查: {key}, 结果: {exists}")
+        return exists
+    
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        批量获取缓存值，L1未命中的键通过一次MGET从Redis读取
+        
+        Args:
+            keys: 缓存键列表
+            
+        Returns:
+            {缓存键: 缓存值}，不包含不存在、过期或已过软过期时间的键
+        """
         try:
+            keys = list(dict.fromkeys(keys))
+            serialized = self.l1.get_many(keys)
+            missing = [key for key in keys if key not in serialized]
+            if missing and self.redis_client:
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.mget(missing)
+                for key in missing:
+                    pipe.pttl(key)
+                values, *pttls = pipe.execute()
+                fetched = {}
+                for key, value, pttl in zip(missing, values, pttls):
+                    if value is not None:
+                        fetched[key] = value
+                        self.l1.set(key, value, self._l1_ttl(pttl))
+                self.l2_hits += len(fetched)
+                self.l2_misses += len(missing) - len(fetched)
+                serialized.update(fetched)
+            logger.debug(f"批量获取缓存: 请求 {len(keys)} 个键, 命中 {len(serialized)} 个")
+            values = {key: _unwrap(json.loads(serialized[key])) for key in keys if key in serialized}
+            # 已过软过期时间的条目视为未命中
+            return {key: value for key, value in values.items() if value is not None}
+        except Exception as e:
+            logger.error(f"批量获取缓存时出错: {e}")
+            return {}
+    
+    def set_many(self, mapping: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """
+        批量设置缓存值，Redis上的所有SETEX和失效通知在一次管道往返中完成
+        
+        Args:
+            mapping: {缓存键: 缓存值}
+            ttl: 过期时间（秒），默认使用default_ttl
+            
+        Returns:
+            bool: 是否全部设置成功
+        """
+        if not mapping:
+            return True
+        try:
+            serialized = {key: json.dumps(value, ensure_ascii=False) for key, value in mapping.items()}
+            expire_time = ttl if ttl is not None else self.default_ttl
+            
             if self.redis_client:
-                # 使用Redis缓存
-                exists = self.redis_client.exists(key) > 0
-                logger.debug(f"Redis缓存键存在检查: {key}, 结果: {exists}")
-                return exists
-            else:
-                # 使用本地缓存
-                import time
-                cache_key = self._get_local_cache_key(key)
-                if cache_key not in self._local_cache:
-                    logger.debug(f"本地缓存键不存在: {key}")
-                    return False
-                
-                if time.time() > self._local_cache[cache_key]['expire_at']:
-                    # 缓存过期，删除
-                    del self._local_cache[cache_key]
-                    logger.debug(f"本地缓存已过期并删除: {key}")
-                    return False
-                
-                logger.debug(f"本地缓存键存在: {key}")
-                return True
+                pipe = self.redis_client.pipeline(transaction=False)
+                for key, serialized_value in serialized.items():
+                    pipe.setex(key, expire_time, serialized_value)
+                pipe.publish(self.invalidation_channel, self._invalidation_message(*serialized))
+                results = pipe.execute()[:-1]
+                self.l1.set_many(serialized, min(expire_time, self.l1_ttl))
+                logger.debug(f"批量设置缓存成功: {len(serialized)} 个键")
+                return all(results)
+            self.l1.set_many(serialized, expire_time)
+            logger.debug(f"批量设置本地缓存成功: {len(serialized)} 个键")
+            return True
         except Exception as e:
-            logger.error(f"检查缓存存在时出错: {e}")
+            logger.error(f"批量设置缓存时出错: {e}")
             return False
+    
+    def delete_many(self, keys: List[str]) -> int:
+        """
+        批量删除缓存值
+        
+        Args:
+            keys: 缓存键列表
+            
+        Returns:
+            int: 删除的键数量
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return 0
+        try:
+            deleted = self.l1.delete_many(keys)
+            if self.redis_client:
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.delete(*keys)
+                pipe.publish(self.invalidation_channel, self._invalidation_message(*keys))
+                deleted = pipe.execute()[0]
+            logger.debug(f"批量删除缓存: {len(keys)} 个键, 删除 {deleted} 个")
+            return deleted
+        except Exception as e:
+            logger.error(f"批量删除缓存时出错: {e}")
+            return 0
+    
+    def set_with_stale(self, key: str, value: Any, ttl: Optional[int] = None,
+                       stale_ttl: Optional[int] = None) -> bool:
+        """
+        设置带软过期时间的缓存值
+        
+        Args:
+            key: 缓存键
+            value: 缓存值（可序列化对象）
+            ttl: 软过期时间（秒），超过后读取会触发后台刷新
+            stale_ttl: 软过期后仍可返回旧值的时间（秒），两者之和为实际过期时间
+            
+        Returns:
+            bool: 是否设置成功
+        """
+        ttl = ttl if ttl is not None else self.default_ttl
+        stale_ttl = stale_ttl if stale_ttl is not None else self.stale_ttl
+        envelope = {SWR_MARKER: time.time() + ttl, 'value': value}
+        return self.set(key, envelope, ttl + stale_ttl)
+    
+    def get_or_refresh(self, key: str, loader: Callable[[], Any], ttl: Optional[int] = None,
+                       stale_ttl: Optional[int] = None) -> Any:
+        """
+        按 stale-while-revalidate 策略读取缓存
+        
+        未过软过期时间时直接返回；处于软过期和实际过期之间时立即返回旧值，并在后台线程池中
+        调用loader刷新；不存在时同步调用loader并写入缓存。loader返回None时不缓存
+        
+        Args:
+            key: 缓存键
+            loader: 加载函数，返回要缓存的值，失败时抛出异常
+            ttl: 软过期时间（秒）
+            stale_ttl: 软过期后仍可返回旧值的时间（秒）
+            
+        Returns:
+            缓存值或loader的返回值
+        """
+        entry = self._get_raw(key)
+        if isinstance(entry, dict) and SWR_MARKER in entry:
+            if time.time() < entry[SWR_MARKER]:
+                self._count_swr('fresh')
+            else:
+                self._count_swr('stale')
+                self._schedule_refresh(key, loader, ttl, stale_ttl)
+            return entry['value']
+        if entry is not None:
+            # 普通条目视为新鲜数据
+            self._count_swr('fresh')
+            return entry
+        
+        self._count_swr('misses')
+        value = loader()
+        if value is not None:
+            self.set_with_stale(key, value, ttl, stale_ttl)
+        return value
+    
+    def _count_swr(self, name: str):
+        """累加软过期统计计数，请求线程和后台刷新线程都会调用"""
+        with self._stats_lock:
+            self.swr_stats[name] += 1
+    
+    def _schedule_refresh(self, key: str, loader: Callable[[], Any], ttl: Optional[int],
+                          stale_ttl: Optional[int]):
+        """提交后台刷新任务，同一键同时只有一个刷新任务"""
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            # 跨进程：同一键在软过期时间窗口内只由一个进程刷新
+            token = uuid.uuid4().hex
+            if self.redis_client:
+                try:
+                    lock_ttl = ttl if ttl is not None else self.default_ttl
+                    if not self.redis_client.set(f"swr_refresh:{key}", token, nx=True, ex=max(1, int(lock_ttl))):
+                        return
+                except Exception as e:
+                    logger.warning(f"获取缓存刷新锁失败: {key}, 错误: {e}")
+            self._refreshing.add(key)
+            if self._refresh_executor is None:
+                self._refresh_executor = ThreadPoolExecutor(max_workers=self.refresh_workers,
+                                                            thread_name_prefix='cache-refresh')
+        self._refresh_executor.submit(self._refresh, key, loader, ttl, stale_ttl, token)
+    
+    def _refresh(self, key: str, loader: Callable[[], Any], ttl: Optional[int], stale_ttl: Optional[int],
+                 token: Optional[str] = None):
+        """后台刷新缓存条目，失败时保留旧值直到实际过期"""
+        try:
+            value = loader()
+            if value is not None:
+                self.set_with_stale(key, value, ttl, stale_ttl)
+            self._count_swr('refreshes')
+            logger.debug(f"后台刷新缓存成功: {key}")
+        except Exception as e:
+            self._count_swr('refresh_errors')
+            logger.warning(f"后台刷新缓存失败: {key}, 错误: {e}")
+        finally:
+            with self._refresh_lock:
+                self._refreshing.discard(key)
+            if self.redis_client and token:
+                try:
+                    # 刷新耗时超过锁有效期时锁可能已被其他进程重新获取，只释放自己持有的锁
+                    self.redis_client.eval(RELEASE_SCRIPT, 1, f"swr_refresh:{key}", token)
+                except Exception:
+                    pass
+    
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        各缓存层的命中统计
+        
+        Returns:
+            {'l1': {...}, 'l2': {'hits', 'misses'}, 'swr': {'fresh', 'stale', 'misses', 'refreshes', 'refresh_errors'}}
+        """
+        with self._stats_lock:
+            swr = dict(self.swr_stats)
+        return {
+            'l1': self.l1.stats(),
+            'l2': {'hits': self.l2_hits, 'misses': self.l2_misses},
+            'swr': swr,
+        }
 
 # 全局缓存管理器实例
-cache_manager = CacheManager()
\ No newline at end of file
+cache_manager = CacheManager()
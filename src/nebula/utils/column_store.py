@@ -0,0 +1,237 @@
+# -*- coding:utf-8 -*-
+import os
+import numpy as np
+import pandas as pd
+from typing import Optional, Dict, Any, Union
+from .config import config
+from .database import MINUTE_PERIODS
+from .logger import logger
+
+# 每个字段保存为一个连续的定长数组文件：(字段名, 数据类型, 行情数据列名)
+COLUMNS = [
+    ('timestamp', np.dtype('<i8'), '时间'),
+    ('open', np.dtype('<f8'), '开盘'),
+    ('high', np.dtype('<f8'), '最高'),
+    ('low', np.dtype('<f8'), '最低'),
+    ('close', np.dtype('<f8'), '收盘'),
+    ('volume', np.dtype('<i8'), '成交量'),
+    ('amount', np.dtype('<f8'), '成交额'),
+]
+
+def _to_timestamp(value: str) -> int:
+    """将日期或时间字符串转换为秒级时间戳（按北京时间的本地时间存储，不做时区换算）"""
+    return int(pd.Timestamp(value).value // 10**9)
+
+class ColumnStore:
+    """
+    列式内存映射行情存储
+
+    每个 (股票代码, 周期, 复权方式) 对应一个目录，目录下每个字段一个二进制文件，
+    按时间戳升序存放。时间戳列即为排序索引，区间查询通过二分查找定位后直接返回
+    内存映射数组的切片，不发生数据拷贝。写入假定同一序列只有一个写入者
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        """
+        初始化列式存储
+
+        Args:
+            root: 存储根目录
+        """
+        database_config = config.get_database_config()
+        self.root = root or database_config['column_store_path']
+
+    def _series_dir(self, symbol: str, period: str, adjust: str) -> str:
+        """获取序列所在目录"""
+        return os.path.join(self.root, symbol, f"{period}_{adjust or 'none'}")
+
+    def _column_path(self, series_dir: str, name: str) -> str:
+        return os.path.join(series_dir, f"{name}.bin")
+
+    def _length(self, series_dir: str) -> int:
+        """序列的记录数，以最短的字段文件为准（防止写入中断导致的长度不一致）"""
+        lengths = []
+        for name, dtype, _ in COLUMNS:
+            path = self._column_path(series_dir, name)
+            if not os.path.exists(path):
+                return 0
+            lengths.append(os.path.getsize(path) // dtype.itemsize)
+        return min(lengths)
+
+    def _open(self, series_dir: str) -> Dict[str, np.ndarray]:
+        """以只读方式内存映射序列的所有字段"""
+        length = self._length(series_dir)
+        if length == 0:
+            return {name: np.empty(0, dtype=dtype) for name, dtype, _ in COLUMNS}
+        return {
+            name: np.memmap(self._column_path(series_dir, name), dtype=dtype, mode='r', shape=(length,))
+            for name, dtype, _ in COLUMNS
+        }
+
+    def _format_time(self, timestamps: np.ndarray, period: str) -> pd.Series:
+        """将时间戳格式化为与数据库一致的时间字符串"""
+        fmt = '%Y-%m-%d %H:%M:%S' if period in MINUTE_PERIODS else '%Y-%m-%d'
+        return pd.Series(pd.to_datetime(np.asarray(timestamps), unit='s').strftime(fmt))
+
+    def read_range(self, symbol: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                   period: str = 'daily', adjust: str = '') -> Dict[str, np.ndarray]:
+        """
+        读取区间内的行情数据
+
+        Args:
+            symbol: 股票代码
+            start_date: 开始日期或时间
+            end_date: 结束日期或时间
+            period: 时间周期
+            adjust: 复权方式
+
+        Returns:
+            {字段名: 数组}，数组为内存映射文件的只读切片
+        """
+        arrays = self._open(self._series_dir(symbol, period, adjust))
+        timestamps = arrays['timestamp']
+        begin = np.searchsorted(timestamps, _to_timestamp(start_date), side='left') if start_date else 0
+        if end_date:
+            # 只给出日期时包含当天的全部数据
+            end = pd.Timestamp(end_date)
+            if len(end_date.strip()) <= 10:
+                end = end + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+            stop = np.searchsorted(timestamps, int(end.value // 10**9), side='right')
+        else:
+            stop = len(timestamps)
+        return {name: array[begin:stop] for name, array in arrays.items()}
+
+    def get_history_data(self, symbol: str, start_date: str = None, end_date: str = None,
+                         period: str = 'daily', adjust: str = '') -> Optional[pd.DataFrame]:
+        """
+        获取历史行情数据，返回格式与 DatabaseManager.get_history_data 一致
+
+        Returns:
+            历史行情数据DataFrame或None
+        """
+        arrays = self.read_range(symbol, start_date, end_date, period, adjust)
+        if len(arrays['timestamp']) == 0:
+            return None
+        df = pd.DataFrame({label: np.asarray(arrays[name]) for name, _, label in COLUMNS[1:]})
+        df.insert(0, '时间', self._format_time(arrays['timestamp'], period))
+        return df[['时间', '开盘', '最高', '最低', '收盘', '成交量', '成交额']]
+
+    def get_latest_timestamp(self, symbol: str, period: str = 'daily', adjust: str = '') -> Optional[str]:
+        """获取已保存行情数据的最新时间"""
+        timestamps = self._open(self._series_dir(symbol, period, adjust))['timestamp']
+        if len(timestamps) == 0:
+            return None
+        return self._format_time(timestamps[-1:], period).iloc[0]
+
+    def get_earliest_timestamp(self, symbol: str, period: str = 'daily', adjust: str = '') -> Optional[str]:
+        """获取已保存行情数据的最早时间"""
+        timestamps = self._open(self._series_dir(symbol, period, adjust))['timestamp']
+        if len(timestamps) == 0:
+            return None
+        return self._format_time(timestamps[:1], period).iloc[0]
+
+    def save_history_frame(self, symbol: str, data: Union[pd.DataFrame, Dict[str, Any]],
+                           period: str = 'daily', adjust: str = '', raise_errors: bool = False, **kwargs) -> int:
+        """
+        保存历史行情数据
+
+        新数据全部晚于已有数据时直接追加到文件末尾，否则合并后整体重写（相同时间以新数据为准）
+
+        Args:
+            symbol: 股票代码
+            data: 历史行情DataFrame，或 {列名: 数组} 形式的列数据
+            period: 时间周期
+            adjust: 复权方式
+            raise_errors: 写入失败时是否抛出异常，默认记录错误并返回0
+
+        Returns:
+            int: 成功保存的记录数
+        """
+        try:
+            frame = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+            if frame.empty:
+                return 0
+            new = {'timestamp': pd.to_datetime(frame['时间'], errors='coerce')}
+            for name, _, label in COLUMNS[1:]:
+                new[name] = pd.to_numeric(frame[label], errors='coerce')
+            new = pd.DataFrame(new).dropna()
+            new['timestamp'] = new['timestamp'].astype('datetime64[s]').astype('int64')
+            new = new.drop_duplicates('timestamp', keep='last').sort_values('timestamp')
+            if new.empty:
+                return 0
+
+            series_dir = self._series_dir(symbol, period, adjust)
+            os.makedirs(series_dir, exist_ok=True)
+            existing = self._open(series_dir)
+            length = len(existing['timestamp'])
+
+            if length == 0 or new['timestamp'].iloc[0] > existing['timestamp'][-1]:
+                # 追加写入：先按已有长度截断，丢弃可能存在的不完整尾部
+                for name, dtype, _ in COLUMNS:
+                    with open(self._column_path(series_dir, name), 'ab') as f:
+                        f.truncate(length * dtype.itemsize)
+                        f.write(new[name].to_numpy(dtype=dtype).tobytes())
+            else:
+                old_ts = np.asarray(existing['timestamp'])
+                keep = ~np.isin(old_ts, new['timestamp'].to_numpy())
+                merged = {}
+                for name, dtype, _ in COLUMNS:
+                    merged[name] = np.concatenate([np.asarray(existing[name])[keep],
+                                                   new[name].to_numpy(dtype=dtype)])
+                order = np.argsort(merged['timestamp'], kind='stable')
+                del existing
+                for name, dtype, _ in COLUMNS:
+                    path = self._column_path(series_dir, name)
+                    merged[name][order].astype(dtype).tofile(path + '.tmp')
+                    os.replace(path + '.tmp', path)
+            return len(new)
+        except Exception as e:
+            if raise_errors:
+                raise
+            logger.error(f"保存列式行情数据时出错: {e}")
+            return 0
+
+    def get_sync_head(self, symbol: str, period: str = 'daily', adjust: str = '') -> Optional[str]:
+        """获取增量同步已请求过的最早日期（'YYYY-MM-DD'），未记录时返回None"""
+        path = os.path.join(self._series_dir(symbol, period, adjust), 'sync_head')
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return f.read().strip() or None
+
+    def save_sync_head(self, symbol: str, head: str, period: str = 'daily', adjust: str = '') -> bool:
+        """记录增量同步已请求过的最早日期，只在早于已有记录时更新"""
+        try:
+            current = self.get_sync_head(symbol, period, adjust)
+            if current is not None and current <= head:
+                return True
+            series_dir = self._series_dir(symbol, period, adjust)
+            os.makedirs(series_dir, exist_ok=True)
+            with open(os.path.join(series_dir, 'sync_head'), 'w', encoding='utf-8') as f:
+                f.write(head)
+            return True
+        except Exception as e:
+            logger.error(f"保存同步起点时出错: {e}")
+            return False
+
+    def delete_history_data(self, symbol: str, start_date: str, period: str = 'daily', adjust: str = '') -> int:
+        """
+        删除指定时间（含）之后的行情数据
+
+        Returns:
+            int: 删除的记录数
+        """
+        series_dir = self._series_dir(symbol, period, adjust)
+        timestamps = self._open(series_dir)['timestamp']
+        length = len(timestamps)
+        begin = int(np.searchsorted(timestamps, _to_timestamp(start_date), side='left'))
+        del timestamps
+        if begin >= length:
+            return 0
+        for name, dtype, _ in COLUMNS:
+            with open(self._column_path(series_dir, name), 'r+b') as f:
+                f.truncate(begin * dtype.itemsize)
+        return length - begin
+
+# 全局列式存储实例
+column_store = ColumnStore()
@@ -15,13 +15,91 @@ class Config:
     REDIS_PASSWORD = os.getenv('REDIS_PASSWORD', None)
     REDIS_DEFAULT_TTL = int(os.getenv('REDIS_DEFAULT_TTL', 300))
     
+    # 进程内缓存（L1）配置
+    CACHE_L1_MAX_ITEMS = int(os.getenv('CACHE_L1_MAX_ITEMS', 1024))
+    CACHE_L1_MAX_BYTES = int(os.getenv('CACHE_L1_MAX_BYTES', 64 * 1024 * 1024))
+    CACHE_L1_TTL = float(os.getenv('CACHE_L1_TTL', 5))
+    CACHE_INVALIDATION_CHANNEL = os.getenv('CACHE_INVALIDATION_CHANNEL', 'nebula:cache:invalidate')
+    
+    # stale-while-revalidate配置：软过期后仍可返回旧值的时间（秒）和后台刷新线程数
+    CACHE_STALE_TTL = int(os.getenv('CACHE_STALE_TTL', 60))
+    CACHE_REFRESH_WORKERS = int(os.getenv('CACHE_REFRESH_WORKERS', 4))
+    
+    # 按接口覆盖缓存过期策略（JSON），例如 {"realtime": {"trading": 5, "idle_max": 3600}}
+    CACHE_TTL_OVERRIDES = os.getenv('CACHE_TTL_OVERRIDES', '')
+    
+    # 交易日历配置：休市的节假日，逗号分隔的 YYYY-MM-DD
+    TRADING_HOLIDAYS = os.getenv('TRADING_HOLIDAYS', '')
+    
+    # 请求合并配置
+    SINGLEFLIGHT_LOCK_TTL = float(os.getenv('SINGLEFLIGHT_LOCK_TTL', 10))
+    SINGLEFLIGHT_WAIT_TIMEOUT = float(os.getenv('SINGLEFLIGHT_WAIT_TIMEOUT', 10))
+    
     # 数据库配置
     DATABASE_PATH = os.getenv('DATABASE_PATH', 'stock_data.db')
     
+    # 历史行情存储配置：'sqlite' 或 'columnar'（列式内存映射存储）
+    HISTORY_STORAGE = os.getenv('HISTORY_STORAGE', 'sqlite')
+    COLUMN_STORE_PATH = os.getenv('COLUMN_STORE_PATH', 'column_store')
+    
+    # 逐笔快照记录配置：是否记录每次获取到的实时行情、存储目录和稀疏时间索引的间隔（秒）
+    TICK_RECORD_ENABLED = os.getenv('TICK_RECORD_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    TICK_STORE_PATH = os.getenv('TICK_STORE_PATH', 'tick_store')
+    TICK_INDEX_INTERVAL = float(os.getenv('TICK_INDEX_INTERVAL', 60))
+    
     # API配置
     REQUEST_TIMEOUT = int(os.getenv('REQUEST_TIMEOUT', 30))
     REQUEST_RETRIES = int(os.getenv('REQUEST_RETRIES', 3))
     
+    # 重试配置：退避时间的初始值和上限（秒，实际退避时间在0到该值之间随机），
+    # 以及进程级重试预算（重试数占请求数的比例上限和每秒保底的重试数）
+    RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', 0.5))
+    RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', 8))
+    RETRY_BUDGET_RATIO = float(os.getenv('RETRY_BUDGET_RATIO', 0.2))
+    RETRY_BUDGET_MIN_PER_SEC = float(os.getenv('RETRY_BUDGET_MIN_PER_SEC', 1))
+    
+    # HTTP连接池配置
+    HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', 10))
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 20))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+    
+    # 客户端限流配置：每个主机的令牌桶速率和容量，以及AIMD并发上限的初始值和范围
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    RATE_LIMIT_RPS = float(os.getenv('RATE_LIMIT_RPS', 50))
+    RATE_LIMIT_BURST = float(os.getenv('RATE_LIMIT_BURST', 100))
+    RATE_LIMIT_INITIAL_CONCURRENCY = int(os.getenv('RATE_LIMIT_INITIAL_CONCURRENCY', 8))
+    RATE_LIMIT_MIN_CONCURRENCY = int(os.getenv('RATE_LIMIT_MIN_CONCURRENCY', 1))
+    RATE_LIMIT_MAX_CONCURRENCY = int(os.getenv('RATE_LIMIT_MAX_CONCURRENCY', 64))
+    RATE_LIMIT_MAX_WAIT = float(os.getenv('RATE_LIMIT_MAX_WAIT', 60))
+    
+    # 镜像主机池配置：可互换的主机列表、延迟EWMA系数、熔断阈值和对冲请求参数
+    HOST_POOL_ENABLED = os.getenv('HOST_POOL_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    # 默认只包含各接口已在使用的主机，其他镜像主机需自行配置
+    HOST_POOL_PUSH2_HOSTS = os.getenv('HOST_POOL_PUSH2_HOSTS',
+                                      'https://push2.eastmoney.com,https://79.push2.eastmoney.com')
+    HOST_POOL_PUSH2HIS_HOSTS = os.getenv('HOST_POOL_PUSH2HIS_HOSTS', 'https://push2his.eastmoney.com')
+    HOST_POOL_ALPHA = float(os.getenv('HOST_POOL_ALPHA', 0.2))
+    HOST_POOL_FAILURE_THRESHOLD = int(os.getenv('HOST_POOL_FAILURE_THRESHOLD', 5))
+    HOST_POOL_RESET_TIMEOUT = float(os.getenv('HOST_POOL_RESET_TIMEOUT', 30))
+    HOST_POOL_HEDGE = os.getenv('HOST_POOL_HEDGE', 'false').lower() in ('1', 'true', 'yes')
+    HOST_POOL_HEDGE_QUANTILE = float(os.getenv('HOST_POOL_HEDGE_QUANTILE', 0.95))
+    HOST_POOL_MIN_HEDGE_DELAY = float(os.getenv('HOST_POOL_MIN_HEDGE_DELAY', 0.05))
+    HOST_POOL_DEFAULT_HEDGE_DELAY = float(os.getenv('HOST_POOL_DEFAULT_HEDGE_DELAY', 1.0))
+    
+    # 全市场快照配置：clist 接口每页条数和并发翻页的线程数
+    SNAPSHOT_PAGE_SIZE = int(os.getenv('SNAPSHOT_PAGE_SIZE', 100))
+    SNAPSHOT_WORKERS = int(os.getenv('SNAPSHOT_WORKERS', 8))
+    
+    # 行情订阅配置：批量行情接口的轮询间隔（秒）
+    SUBSCRIPTION_INTERVAL = float(os.getenv('SUBSCRIPTION_INTERVAL', 3))
+    
+    # 历史行情回填配置：并发请求的线程数和进度日志间隔（秒）
+    BACKFILL_WORKERS = int(os.getenv('BACKFILL_WORKERS', 8))
+    BACKFILL_PROGRESS_INTERVAL = float(os.getenv('BACKFILL_PROGRESS_INTERVAL', 10))
+    
+    # 异步客户端配置
+    AIO_MAX_CONCURRENCY = int(os.getenv('AIO_MAX_CONCURRENCY', 100))
+    
     # 日志配置
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     LOG_FILE = os.getenv('LOG_FILE', 'stock_analyzer.log')
@@ -38,11 +116,44 @@ class Config:
             'default_ttl': cls.REDIS_DEFAULT_TTL
         }
     
+    @classmethod
+    def get_cache_config(cls):
+        """获取进程内缓存配置"""
+        return {
+            'l1_max_items': cls.CACHE_L1_MAX_ITEMS,
+            'l1_max_bytes': cls.CACHE_L1_MAX_BYTES,
+            'l1_ttl': cls.CACHE_L1_TTL,
+            'invalidation_channel': cls.CACHE_INVALIDATION_CHANNEL,
+            'stale_ttl': cls.CACHE_STALE_TTL,
+            'refresh_workers': cls.CACHE_REFRESH_WORKERS,
+            'ttl_overrides': cls.CACHE_TTL_OVERRIDES,
+            'singleflight_lock_ttl': cls.SINGLEFLIGHT_LOCK_TTL,
+            'singleflight_wait_timeout': cls.SINGLEFLIGHT_WAIT_TIMEOUT
+        }
+    
+    @classmethod
+    def get_calendar_config(cls):
+        """获取交易日历配置"""
+        return {
+            'holidays': cls.TRADING_HOLIDAYS
+        }
+    
     @classmethod
     def get_database_config(cls):
         """获取数据库配置"""
         return {
-            'path': cls.DATABASE_PATH
+            'path': cls.DATABASE_PATH,
+            'history_storage': cls.HISTORY_STORAGE,
+            'column_store_path': cls.COLUMN_STORE_PATH
+        }
+    
+    @classmethod
+    def get_tick_store_config(cls):
+        """获取逐笔快照记录配置"""
+        return {
+            'record': cls.TICK_RECORD_ENABLED,
+            'path': cls.TICK_STORE_PATH,
+            'index_interval': cls.TICK_INDEX_INTERVAL
         }
     
     @classmethod
@@ -53,6 +164,87 @@ class Config:
             'retries': cls.REQUEST_RETRIES
         }
     
+    @classmethod
+    def get_http_config(cls):
+        """获取HTTP连接池配置"""
+        return {
+            'pool_connections': cls.HTTP_POOL_CONNECTIONS,
+            'pool_maxsize': cls.HTTP_POOL_MAXSIZE,
+            'connect_timeout': cls.HTTP_CONNECT_TIMEOUT,
+            'read_timeout': cls.REQUEST_TIMEOUT
+        }
+    
+    @classmethod
+    def get_rate_limit_config(cls):
+        """获取客户端限流配置"""
+        return {
+            'enabled': cls.RATE_LIMIT_ENABLED,
+            'rate': cls.RATE_LIMIT_RPS,
+            'burst': cls.RATE_LIMIT_BURST,
+            'initial_concurrency': cls.RATE_LIMIT_INITIAL_CONCURRENCY,
+            'min_concurrency': cls.RATE_LIMIT_MIN_CONCURRENCY,
+            'max_concurrency': cls.RATE_LIMIT_MAX_CONCURRENCY,
+            'max_wait': cls.RATE_LIMIT_MAX_WAIT
+        }
+    
+    @classmethod
+    def get_retry_config(cls):
+        """获取重试策略配置"""
+        return {
+            'base_delay': cls.RETRY_BASE_DELAY,
+            'max_delay': cls.RETRY_MAX_DELAY,
+            'budget_ratio': cls.RETRY_BUDGET_RATIO,
+            'budget_min_per_sec': cls.RETRY_BUDGET_MIN_PER_SEC
+        }
+    
+    @classmethod
+    def get_host_pool_config(cls):
+        """获取镜像主机池配置"""
+        return {
+            'enabled': cls.HOST_POOL_ENABLED,
+            'push2_hosts': cls.HOST_POOL_PUSH2_HOSTS,
+            'push2his_hosts': cls.HOST_POOL_PUSH2HIS_HOSTS,
+            'alpha': cls.HOST_POOL_ALPHA,
+            'failure_threshold': cls.HOST_POOL_FAILURE_THRESHOLD,
+            'reset_timeout': cls.HOST_POOL_RESET_TIMEOUT,
+            'hedge': cls.HOST_POOL_HEDGE,
+            'hedge_quantile': cls.HOST_POOL_HEDGE_QUANTILE,
+            'min_hedge_delay': cls.HOST_POOL_MIN_HEDGE_DELAY,
+            'default_hedge_delay': cls.HOST_POOL_DEFAULT_HEDGE_DELAY
+        }
+    
+    @classmethod
+    def get_snapshot_config(cls):
+        """获取全市场快照配置"""
+        return {
+            'page_size': cls.SNAPSHOT_PAGE_SIZE,
+            'workers': cls.SNAPSHOT_WORKERS
+        }
+    
+    @classmethod
+    def get_subscription_config(cls):
+        """获取行情订阅配置"""
+        return {
+            'interval': cls.SUBSCRIPTION_INTERVAL
+        }
+    
+    @classmethod
+    def get_backfill_config(cls):
+        """获取历史行情回填配置"""
+        return {
+            'workers': cls.BACKFILL_WORKERS,
+            'progress_interval': cls.BACKFILL_PROGRESS_INTERVAL
+        }
+    
+    @classmethod
+    def get_aio_config(cls):
+        """获取异步客户端配置"""
+        return {
+            'max_concurrency': cls.AIO_MAX_CONCURRENCY,
+            'connect_timeout': cls.HTTP_CONNECT_TIMEOUT,
+            'read_timeout': cls.REQUEST_TIMEOUT
+        }
+    
 load_dotenv() 
 # 全局配置实例
 config = Config()
\ No newline at end of file
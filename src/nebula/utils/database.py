@@ -1,11 +1,50 @@
 # -*- coding:utf-8 -*-
 import sqlite3
+import itertools
+import json
 import pandas as pd
-from typing import Optional, List, Dict, Any
+from functools import lru_cache
+from typing import Optional, List, Dict, Any, Union
 from datetime import datetime
 import os
 from .config import config
 
+# 分钟级周期，对应 stock_minute 表
+MINUTE_PERIODS = {'minute', '1', '5', '15', '30', '60'}
+
+# 行情表字段与行情数据列名的对应关系：(数据库字段, 数据列名, 类型, 缺失时的默认值)
+# 默认值为None的字段是必填字段，缺失或无法转换时跳过该行
+HISTORY_FIELDS = {
+    'stock_history': [
+        ('open', '开盘', float, None), ('high', '最高', float, None), ('low', '最低', float, None),
+        ('close', '收盘', float, None), ('volume', '成交量', int, None), ('amount', '成交额', float, None),
+        ('amplitude', '振幅', float, 0.0), ('change_percent', '涨跌幅', float, 0.0),
+        ('change_amount', '涨跌额', float, 0.0), ('turnover_rate', '换手率', float, 0.0),
+    ],
+    'stock_minute': [
+        ('open', '开盘', float, None), ('high', '最高', float, None), ('low', '最低', float, None),
+        ('close', '收盘', float, None), ('volume', '成交量', int, None), ('amount', '成交额', float, None),
+        ('average', '均价', float, 0.0),
+    ],
+}
+
+def _history_table(period: str) -> tuple:
+    """根据周期返回 (表名, 时间列名)"""
+    if period in MINUTE_PERIODS:
+        return 'stock_minute', 'datetime'
+    return 'stock_history', 'date'
+
+@lru_cache(maxsize=None)
+def _history_insert_sql(table_name: str, date_column: str) -> str:
+    """生成行情表的插入语句"""
+    columns = ['symbol', date_column] + [field[0] for field in HISTORY_FIELDS[table_name]] + ['period', 'adjust']
+    placeholders = ', '.join(['?' for _ in columns])
+    return f'''
+        INSERT OR REPLACE INTO {table_name}
+        ({', '.join(columns)})
+        VALUES ({placeholders})
+    '''
+
 class DatabaseManager:
     """数据库管理器，使用SQLite作为默认数据库"""
     
@@ -23,13 +62,22 @@ class DatabaseManager:
     
     def get_connection(self):
         """获取数据库连接"""
-        return sqlite3.connect(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        # WAL模式下NORMAL同步级别不会损坏数据库，只在掉电时可能丢失最近的事务
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
     
     def init_database(self):
         """初始化数据库表结构"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
+            # 启用WAL日志，读写互不阻塞（该设置持久保存在数据库文件中）
+            cursor.execute('PRAGMA journal_mode=WAL')
+            
+            # 为旧版行情表补充周期和复权字段
+            self._migrate_history_tables(cursor)
+            
             # 创建股票基本信息表
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS stock_info (
@@ -59,7 +107,9 @@ class DatabaseManager:
                     change_percent REAL,
                     change_amount REAL,
                     turnover_rate REAL,
-                    UNIQUE(symbol, date)
+                    period TEXT NOT NULL DEFAULT 'daily',
+                    adjust TEXT NOT NULL DEFAULT '',
+                    UNIQUE(symbol, period, adjust, date)
                 )
             ''')
             
@@ -76,7 +126,9 @@ class DatabaseManager:
                     volume INTEGER,
                     amount REAL,
                     average REAL,
-                    UNIQUE(symbol, datetime)
+                    period TEXT NOT NULL DEFAULT 'minute',
+                    adjust TEXT NOT NULL DEFAULT '',
+                    UNIQUE(symbol, period, adjust, datetime)
                 )
             ''')
             
@@ -93,6 +145,45 @@ class DatabaseManager:
                 )
             ''')
             
+            # 创建技术指标流式状态表
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS indicator_state (
+                    symbol TEXT,
+                    period TEXT,
+                    state TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (symbol, period)
+                )
+            ''')
+            
+            # 创建历史行情回填进度表，按 (股票, 周期, 复权方式, 回填区间) 记录
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS backfill_checkpoint (
+                    symbol TEXT,
+                    period TEXT,
+                    adjust TEXT,
+                    start_date TEXT,
+                    end_date TEXT,
+                    status TEXT,
+                    rows INTEGER DEFAULT 0,
+                    error TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (symbol, period, adjust, start_date, end_date)
+                )
+            ''')
+            
+            # 创建历史行情同步起点表，记录增量同步已请求过的最早日期，早于上市日期等无法补齐的区间不再重复请求
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS history_sync_head (
+                    symbol TEXT,
+                    period TEXT,
+                    adjust TEXT,
+                    head TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (symbol, period, adjust)
+                )
+            ''')
+            
             # 创建板块行情表
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS board_quotes (
@@ -143,6 +234,45 @@ class DatabaseManager:
             
             conn.commit()
     
+    def _migrate_history_tables(self, cursor):
+        """
+        迁移旧版行情表
+
+        旧表以 (symbol, 时间) 唯一，不区分周期和复权方式。迁移后旧数据的周期
+        分别记为 'daily' 和 'minute'，复权方式记为不复权
+        """
+        legacy_tables = {
+            'stock_history': ('date', ['open', 'high', 'low', 'close', 'volume', 'amount',
+                                       'amplitude', 'change_percent', 'change_amount', 'turnover_rate'], 'daily'),
+            'stock_minute': ('datetime', ['open', 'high', 'low', 'close', 'volume', 'amount', 'average'], 'minute'),
+        }
+        for table_name, (date_column, value_columns, default_period) in legacy_tables.items():
+            cursor.execute(f"PRAGMA table_info({table_name})")
+            existing_columns = [row[1] for row in cursor.fetchall()]
+            if not existing_columns or 'period' in existing_columns:
+                continue
+            
+            columns = ['symbol', date_column] + value_columns
+            column_defs = ''.join(f"{column} {'INTEGER' if column == 'volume' else 'REAL'}, "
+                                  for column in value_columns)
+            cursor.execute(f"ALTER TABLE {table_name} RENAME TO {table_name}_legacy")
+            cursor.execute(f'''
+                CREATE TABLE {table_name} (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    symbol TEXT,
+                    {date_column} TEXT,
+                    {column_defs}
+                    period TEXT NOT NULL DEFAULT '{default_period}',
+                    adjust TEXT NOT NULL DEFAULT '',
+                    UNIQUE(symbol, period, adjust, {date_column})
+                )
+            ''')
+            cursor.execute(f'''
+                INSERT INTO {table_name} ({', '.join(columns)}, period, adjust)
+                SELECT {', '.join(columns)}, '{default_period}', '' FROM {table_name}_legacy
+            ''')
+            cursor.execute(f"DROP TABLE {table_name}_legacy")
+    
     def save_stock_info(self, symbol: str, info_data: List[Dict[str, Any]]) -> bool:
         """
         保存股票基本信息
@@ -182,83 +312,142 @@ class DatabaseManager:
         except Exception as e:
             print(f"保存股票信息时出错: {e}")
             return False
-    
+
+    def save_stock_info_batch(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        批量保存股票基本信息（单个事务）
+
+        只更新股票简称和市场，已有的行业、上市时间等字段保持不变
+
+        Args:
+            rows: 股票信息列表，每项包含 'symbol' 和 'name'
+
+        Returns:
+            int: 成功保存的记录数
+        """
+        try:
+            now = datetime.now()
+            values = [
+                (row['symbol'], row.get('name'), 'SH' if row['symbol'].startswith('6') else 'SZ', now)
+                for row in rows
+            ]
+            with self.get_connection() as conn:
+                conn.executemany('''
+                    INSERT INTO stock_info (symbol, name, market, updated_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(symbol) DO UPDATE SET
+                        name = COALESCE(excluded.name, stock_info.name),
+                        market = excluded.market,
+                        updated_at = excluded.updated_at
+                ''', values)
+                conn.commit()
+                return len(values)
+        except Exception as e:
+            print(f"批量保存股票信息时出错: {e}")
+            return 0
+
     def save_history_data(self, symbol: str, history_data: List[Dict[str, Any]], 
-                         period: str = 'daily') -> int:
+                         period: str = 'daily', adjust: str = '') -> int:
         """
         保存历史行情数据
         
         Args:
             symbol: 股票代码
             history_data: 历史行情数据列表
-            period: 时间周期 ('daily', 'weekly', 'monthly', 'minute')
+            period: 时间周期 ('daily', 'weekly', 'monthly', 'minute' 或分钟周期 '1', '5', '15', '30', '60')
+            adjust: 复权方式 ('', 'qfq', 'hfq')
             
         Returns:
             int: 成功保存的记录数
         """
         try:
-            saved_count = 0
+            table_name, date_column = _history_table(period)
+            fields = HISTORY_FIELDS[table_name]
+            
+            rows = []
+            for row in history_data:
+                try:
+                    values = [symbol, row['时间']]
+                    for _, name, kind, default in fields:
+                        values.append(kind(row[name] if default is None else row.get(name, default)))
+                    values.extend([period, adjust])
+                    rows.append(values)
+                except (ValueError, KeyError, TypeError) as e:
+                    print(f"跳过无效数据行: {row}, 错误: {e}")
+                    continue
+            
             with self.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                if period == 'minute':
-                    table_name = 'stock_minute'
-                    columns = ['symbol', 'datetime', 'open', 'high', 'low', 'close', 'volume', 'amount', 'average']
-                else:
-                    table_name = 'stock_history'
-                    columns = ['symbol', 'date', 'open', 'high', 'low', 'close', 'volume', 'amount', 
-                              'amplitude', 'change_percent', 'change_amount', 'turnover_rate']
-                
-                for row in history_data:
-                    try:
-                        if period == 'minute':
-                            values = (
-                                symbol,
-                                row['时间'],
-                                float(row['开盘']),
-                                float(row['最高']),
-                                float(row['最低']),
-                                float(row['收盘']),
-                                int(row['成交量']),
-                                float(row['成交额']),
-                                float(row.get('均价', 0))
-                            )
-                        else:
-                            values = (
-                                symbol,
-                                row['时间'],
-                                float(row['开盘']),
-                                float(row['最高']),
-                                float(row['最低']),
-                                float(row['收盘']),
-                                int(row['成交量']),
-                                float(row['成交额']),
-                                float(row.get('振幅', 0)),
-                                float(row.get('涨跌幅', 0)),
-                                float(row.get('涨跌额', 0)),
-                                float(row.get('换手率', 0))
-                            )
-                        
-                        # 构建插入语句
-                        placeholders = ', '.join(['?' for _ in columns])
-                        insert_sql = f'''
-                            INSERT OR REPLACE INTO {table_name} 
-                            ({', '.join(columns)})
-                            VALUES ({placeholders})
-                        '''
-                        
-                        cursor.execute(insert_sql, values)
-                        saved_count += 1
-                    except (ValueError, KeyError) as e:
-                        print(f"跳过无效数据行: {row}, 错误: {e}")
-                        continue
-                
+                conn.executemany(_history_insert_sql(table_name, date_column), rows)
                 conn.commit()
-                return saved_count
+                return len(rows)
         except Exception as e:
             print(f"保存历史行情数据时出错: {e}")
             return 0
     
+    def save_history_frame(self, symbol: str, data: Union[pd.DataFrame, Dict[str, Any]],
+                           period: str = 'daily', adjust: str = '', batch_size: int = 10000,
+                           raise_errors: bool = False) -> int:
+        """
+        批量保存历史行情数据
+        
+        直接接收解析后的DataFrame或列数组，按列完成类型转换，在单个事务中分批executemany写入
+        
+        Args:
+            symbol: 股票代码
+            data: 历史行情DataFrame，或 {列名: 数组} 形式的列数据
+            period: 时间周期
+            adjust: 复权方式
+            batch_size: 每批写入的记录数
+            raise_errors: 写入失败时是否抛出异常，默认打印错误并返回0
+            
+        Returns:
+            int: 成功保存的记录数
+        """
+        try:
+            frame = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+            if frame.empty:
+                return 0
+            table_name, date_column = _history_table(period)
+            
+            valid = frame['时间'].notna().to_numpy().copy()
+            columns = [frame['时间'].astype(str)]
+            for _, name, kind, default in HISTORY_FIELDS[table_name]:
+                if name in frame:
+                    column = pd.to_numeric(frame[name], errors='coerce')
+                else:
+                    column = pd.Series(default, index=frame.index, dtype='float64')
+                if default is None:
+                    valid &= column.notna().to_numpy()
+                else:
+                    column = column.fillna(default)
+                columns.append(column)
+            
+            skipped = len(frame) - int(valid.sum())
+            if skipped:
+                print(f"跳过 {skipped} 条无效数据行")
+            
+            column_lists = []
+            for column, field in zip(columns, [None] + HISTORY_FIELDS[table_name]):
+                column = column[valid]
+                if field is not None and field[2] is int:
+                    column = column.astype('int64')
+                column_lists.append(column.tolist())
+            
+            count = int(valid.sum())
+            insert_sql = _history_insert_sql(table_name, date_column)
+            with self.get_connection() as conn:
+                for begin in range(0, count, batch_size):
+                    batch = [column[begin:begin + batch_size] for column in column_lists]
+                    conn.executemany(insert_sql, zip(itertools.repeat(symbol), *batch,
+                                                     itertools.repeat(period), itertools.repeat(adjust)))
+                conn.commit()
+            return count
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(f"批量保存历史行情数据时出错: {e}")
+            return 0
+    
     def save_indicators(self, symbol: str, date: str, indicators: List[Dict[str, Any]]) -> int:
         """
         保存技术指标数据
@@ -312,6 +501,126 @@ class DatabaseManager:
             print(f"保存技术指标数据时出错: {e}")
             return 0
     
+    def save_indicator_state(self, symbol: str, period: str, state: Dict[str, Any]) -> bool:
+        """
+        保存技术指标流式状态
+        
+        Args:
+            symbol: 股票代码
+            period: 时间周期
+            state: 可JSON序列化的状态字典
+            
+        Returns:
+            bool: 是否保存成功
+        """
+        try:
+            with self.get_connection() as conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO indicator_state (symbol, period, state, updated_at)
+                    VALUES (?, ?, ?, ?)
+                ''', (symbol, period, json.dumps(state, ensure_ascii=False), datetime.now()))
+                conn.commit()
+                return True
+        except Exception as e:
+            print(f"保存指标状态时出错: {e}")
+            return False
+    
+    def get_indicator_state(self, symbol: str, period: str) -> Optional[Dict[str, Any]]:
+        """
+        获取技术指标流式状态
+        
+        Args:
+            symbol: 股票代码
+            period: 时间周期
+            
+        Returns:
+            状态字典或None
+        """
+        try:
+            with self.get_connection() as conn:
+                row = conn.execute('''
+                    SELECT state FROM indicator_state WHERE symbol = ? AND period = ?
+                ''', (symbol, period)).fetchone()
+                return json.loads(row[0]) if row else None
+        except Exception as e:
+            print(f"获取指标状态时出错: {e}")
+            return None
+    
+    def get_indicator_states(self, period: str) -> Dict[str, Dict[str, Any]]:
+        """
+        一次查询获取某个周期下所有股票的技术指标流式状态
+    
+        Args:
+            period: 时间周期
+    
+        Returns:
+            {股票代码: 状态字典}
+        """
+        try:
+            with self.get_connection() as conn:
+                rows = conn.execute('''
+                    SELECT symbol, state FROM indicator_state WHERE period = ?
+                ''', (period,)).fetchall()
+                return {symbol: json.loads(state) for symbol, state in rows}
+        except Exception as e:
+            print(f"获取指标状态时出错: {e}")
+            return {}
+    
+    def save_backfill_checkpoint(self, symbol: str, period: str, adjust: str, start_date: str, end_date: str,
+                                 status: str, rows: int = 0, error: Optional[str] = None) -> bool:
+        """
+        保存历史行情回填进度
+        
+        Args:
+            symbol: 股票代码
+            period: 时间周期
+            adjust: 复权方式
+            start_date: 回填开始日期
+            end_date: 回填结束日期
+            status: 'done' 或 'failed'
+            rows: 写入的记录数
+            error: 失败原因
+            
+        Returns:
+            bool: 是否保存成功
+        """
+        try:
+            with self.get_connection() as conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO backfill_checkpoint
+                    (symbol, period, adjust, start_date, end_date, status, rows, error, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (symbol, period, adjust, start_date, end_date, status, rows, error, datetime.now()))
+                conn.commit()
+                return True
+        except Exception as e:
+            print(f"保存回填进度时出错: {e}")
+            return False
+    
+    def get_backfill_checkpoints(self, adjust: str, start_date: str, end_date: str) -> Dict[tuple, Dict[str, Any]]:
+        """
+        获取某个回填区间内所有股票和周期的进度
+        
+        Args:
+            adjust: 复权方式
+            start_date: 回填开始日期
+            end_date: 回填结束日期
+            
+        Returns:
+            {(股票代码, 周期): {'status': ..., 'rows': ..., 'error': ...}}
+        """
+        try:
+            with self.get_connection() as conn:
+                rows = conn.execute('''
+                    SELECT symbol, period, status, rows, error FROM backfill_checkpoint
+                    WHERE adjust = ? AND start_date = ? AND end_date = ?
+                ''', (adjust, start_date, end_date)).fetchall()
+                return {(symbol, period): {'status': status, 'rows': count, 'error': error}
+                        for symbol, period, status, count, error in rows}
+        except Exception as e:
+            print(f"获取回填进度时出错: {e}")
+            return {}
+    
     def get_stock_info(self, symbol: str) -> Optional[List[Dict[str, Any]]]:
         """
         获取股票基本信息
@@ -346,7 +655,7 @@ class DatabaseManager:
             return None
     
     def get_history_data(self, symbol: str, start_date: str = None, 
-                        end_date: str = None, period: str = 'daily') -> Optional[pd.DataFrame]:
+                        end_date: str = None, period: str = 'daily', adjust: str = '') -> Optional[pd.DataFrame]:
         """
         获取历史行情数据
         
@@ -354,29 +663,27 @@ class DatabaseManager:
             symbol: 股票代码
             start_date: 开始日期
             end_date: 结束日期
-            period: 时间周期 ('daily', 'weekly', 'monthly', 'minute')
+            period: 时间周期 ('daily', 'weekly', 'monthly', 'minute' 或分钟周期 '1', '5', '15', '30', '60')
+            adjust: 复权方式 ('', 'qfq', 'hfq')
             
         Returns:
             历史行情数据DataFrame或None
         """
         try:
             with self.get_connection() as conn:
-                if period == 'minute':
-                    table_name = 'stock_minute'
+                table_name, date_column = _history_table(period)
+                if table_name == 'stock_minute':
                     columns = ['datetime as 时间', 'open as 开盘', 'high as 最高', 'low as 最低', 
                               'close as 收盘', 'volume as 成交量', 'amount as 成交额', 'average as 均价']
-                    date_column = 'datetime'
                 else:
-                    table_name = 'stock_history'
                     columns = ['date as 时间', 'open as 开盘', 'high as 最高', 'low as 最低', 
                               'close as 收盘', 'volume as 成交量', 'amount as 成交额', 
                               'amplitude as 振幅', 'change_percent as 涨跌幅', 
                               'change_amount as 涨跌额', 'turnover_rate as 换手率']
-                    date_column = 'date'
                 
                 # 构建查询条件
-                query = f"SELECT {', '.join(columns)} FROM {table_name} WHERE symbol = ?"
-                params = [symbol]
+                query = f"SELECT {', '.join(columns)} FROM {table_name} WHERE symbol = ? AND period = ? AND adjust = ?"
+                params = [symbol, period, adjust]
                 
                 if start_date:
                     query += f" AND {date_column} >= ?"
@@ -395,5 +702,133 @@ class DatabaseManager:
             print(f"获取历史行情数据时出错: {e}")
             return None
 
+    def get_latest_timestamp(self, symbol: str, period: str = 'daily', adjust: str = '') -> Optional[str]:
+        """
+        获取已保存行情数据的最新时间
+        
+        Args:
+            symbol: 股票代码
+            period: 时间周期
+            adjust: 复权方式
+            
+        Returns:
+            最新的日期或时间字符串，无数据时返回None
+        """
+        try:
+            table_name, date_column = _history_table(period)
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT MAX({date_column}) FROM {table_name}
+                    WHERE symbol = ? AND period = ? AND adjust = ?
+                ''', (symbol, period, adjust))
+                row = cursor.fetchone()
+                return row[0] if row else None
+        except Exception as e:
+            print(f"获取最新行情时间时出错: {e}")
+            return None
+    
+    def get_earliest_timestamp(self, symbol: str, period: str = 'daily', adjust: str = '') -> Optional[str]:
+        """
+        获取已保存行情数据的最早时间
+        
+        Args:
+            symbol: 股票代码
+            period: 时间周期
+            adjust: 复权方式
+            
+        Returns:
+            最早的日期或时间字符串，无数据时返回None
+        """
+        try:
+            table_name, date_column = _history_table(period)
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT MIN({date_column}) FROM {table_name}
+                    WHERE symbol = ? AND period = ? AND adjust = ?
+                ''', (symbol, period, adjust))
+                row = cursor.fetchone()
+                return row[0] if row else None
+        except Exception as e:
+            print(f"获取最早行情时间时出错: {e}")
+            return None
+    
+    def get_sync_head(self, symbol: str, period: str = 'daily', adjust: str = '') -> Optional[str]:
+        """
+        获取增量同步已请求过的最早日期
+        
+        Args:
+            symbol: 股票代码
+            period: 时间周期
+            adjust: 复权方式
+            
+        Returns:
+            'YYYY-MM-DD' 格式的日期，未记录时返回None
+        """
+        try:
+            with self.get_connection() as conn:
+                row = conn.execute('''
+                    SELECT head FROM history_sync_head WHERE symbol = ? AND period = ? AND adjust = ?
+                ''', (symbol, period, adjust)).fetchone()
+                return row[0] if row else None
+        except Exception as e:
+            print(f"获取同步起点时出错: {e}")
+            return None
+    
+    def save_sync_head(self, symbol: str, head: str, period: str = 'daily', adjust: str = '') -> bool:
+        """
+        记录增量同步已请求过的最早日期，只在早于已有记录时更新
+        
+        Args:
+            symbol: 股票代码
+            head: 'YYYY-MM-DD' 格式的日期
+            period: 时间周期
+            adjust: 复权方式
+            
+        Returns:
+            bool: 是否保存成功
+        """
+        try:
+            with self.get_connection() as conn:
+                conn.execute('''
+                    INSERT INTO history_sync_head (symbol, period, adjust, head, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (symbol, period, adjust)
+                    DO UPDATE SET head = MIN(head, excluded.head), updated_at = excluded.updated_at
+                ''', (symbol, period, adjust, head, datetime.now()))
+                conn.commit()
+                return True
+        except Exception as e:
+            print(f"保存同步起点时出错: {e}")
+            return False
+    
+    def delete_history_data(self, symbol: str, start_date: str, period: str = 'daily', adjust: str = '') -> int:
+        """
+        删除指定时间（含）之后的行情数据，用于替换尚未收盘的最后一根K线
+        
+        Args:
+            symbol: 股票代码
+            start_date: 开始日期或时间
+            period: 时间周期
+            adjust: 复权方式
+            
+        Returns:
+            int: 删除的记录数
+        """
+        try:
+            table_name, date_column = _history_table(period)
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    DELETE FROM {table_name}
+                    WHERE symbol = ? AND period = ? AND adjust = ? AND {date_column} >= ?
+                ''', (symbol, period, adjust, start_date))
+                conn.commit()
+                return cursor.rowcount
+        except Exception as e:
+            print(f"删除历史行情数据时出错: {e}")
+            return 0
+
 # 全局数据库管理器实例
 db_manager = DatabaseManager()
\ No newline at end of file
@@ -1,49 +1,26 @@
 # -*- coding:utf-8 -*-
-import time
 import requests
-from typing import Optional, Callable, Any
-from functools import wraps
+from typing import Optional
 from .config import config
+from .http import http_transport
 from .logger import logger
+from .retry import RetryPolicy, DeadlineExceeded
 
-def retry_on_failure(max_retries: Optional[int] = None, delay: float = 1.0, 
-                    backoff: float = 2.0, exceptions: tuple = (requests.RequestException,)):
+def retry_on_failure(max_retries: Optional[int] = None, delay: Optional[float] = None,
+                    backoff: float = 2.0, exceptions: Optional[tuple] = None) -> RetryPolicy:
     """
-    重试装饰器
+    重试装饰器，返回 RetryPolicy：重试受截止时间和进程级重试预算限制，退避时间带随机抖动，
+    嵌套的重试装饰器只在最外层重试
     
     Args:
         max_retries: 最大重试次数，默认使用配置文件中的值
-        delay: 初始延迟时间（秒）
-        backoff: 延迟时间增长倍数
-        exceptions: 需要重试的异常类型
+        delay: 初始退避时间上限（秒），默认使用配置项 RETRY_BASE_DELAY
+        backoff: 退避时间增长倍数
+        exceptions: 需要重试的异常类型，默认为 requests.RequestException 和 NetworkError
     """
-    if max_retries is None:
-        max_retries = config.get_api_config()['retries']
-    
-    def decorator(func: Callable) -> Callable:
-        @wraps(func)
-        def wrapper(*args, **kwargs) -> Any:
-            retries = 0
-            current_delay = delay
-            
-            while retries <= max_retries:
-                try:
-                    return func(*args, **kwargs)
-                except exceptions as e:
-                    retries += 1
-                    if retries > max_retries:
-                        raise e
-                    
-                    logger.warning(f"请求失败 (尝试 {retries}/{max_retries + 1}): {str(e)}")
-                    logger.info(f"等待 {current_delay} 秒后重试...")
-                    time.sleep(current_delay)
-                    current_delay *= backoff
-            
-            # 这行代码不应该被执行到
-            raise Exception("重试逻辑异常")
-        
-        return wrapper
-    return decorator
+    if exceptions is None:
+        exceptions = (requests.RequestException, NetworkError)
+    return RetryPolicy(max_retries=max_retries, base_delay=delay, multiplier=backoff, exceptions=exceptions)
 
 class StockAnalyzerError(Exception):
     """Stock Analyzer基础异常类"""
@@ -107,6 +84,7 @@ def make_request(url: str, params: Optional[dict] = None,
         
     Raises:
         NetworkError: 网络错误
+        DeadlineExceeded: 超过截止时间
         APIError: API错误
     """
     if timeout is None:
@@ -114,9 +92,11 @@ def make_request(url: str, params: Optional[dict] = None,
     
     try:
         logger.debug(f"发送HTTP请求: {url}, 参数: {params}, 超时: {timeout}")
-        response = requests.get(url, params=params, timeout=timeout)
+        response = http_transport.get(url, params=params, timeout=timeout)
         logger.debug(f"HTTP请求成功: {response.status_code}")
         return response
+    except DeadlineExceeded:
+        raise
     except requests.Timeout as e:
         logger.error(f"请求超时 ({timeout}秒): {str(e)}")
         raise NetworkError(f"请求超时 ({timeout}秒)") from e
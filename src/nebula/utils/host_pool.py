@@ -0,0 +1,327 @@
+# -*- coding:utf-8 -*-
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Optional, List, Dict, Any, Callable, Iterable
+from urllib.parse import urlsplit, urlunsplit
+import numpy as np
+import requests
+from .config import config
+from .logger import logger
+from .retry import DeadlineExceeded, run_in_context
+
+# 熔断器状态
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+class HostState:
+    """单个主机的延迟统计和熔断器"""
+
+    def __init__(self, base_url: str, alpha: float, window: int):
+        self.base_url = base_url
+        self.alpha = alpha
+        self.ewma: Optional[float] = None
+        self.samples = deque(maxlen=window)
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.requests = 0
+        self.errors = 0
+
+    def observe(self, latency: float):
+        self.samples.append(latency)
+        self.ewma = latency if self.ewma is None else self.alpha * latency + (1 - self.alpha) * self.ewma
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        return float(np.quantile(np.fromiter(self.samples, dtype=float), q))
+
+class HostPool:
+    """
+    一组可互换的镜像主机
+
+    按延迟的指数加权移动平均（EWMA）选择最快的主机；连续失败达到阈值的主机熔断一段时间，
+    之后放行一个试探请求，成功则恢复。请求失败时依次换到其他主机重试。开启对冲时，
+    若首选主机在其近期延迟的p95内未返回，向第二个主机发送相同请求，采用先返回的结果
+    """
+
+    def __init__(self, base_urls: Iterable[str], alpha: Optional[float] = None,
+                 failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None,
+                 hedge: Optional[bool] = None, hedge_quantile: Optional[float] = None,
+                 min_hedge_delay: Optional[float] = None, default_hedge_delay: Optional[float] = None,
+                 window: int = 200, min_samples: int = 10):
+        """
+        初始化主机池，参数默认读取配置项 HOST_POOL_*
+
+        Args:
+            base_urls: 镜像主机地址，如 ['https://push2.eastmoney.com', 'https://79.push2.eastmoney.com']
+            alpha: 延迟EWMA的平滑系数
+            failure_threshold: 连续失败多少次后熔断
+            reset_timeout: 熔断后多久放行试探请求（秒）
+            hedge: 是否默认开启对冲请求
+            hedge_quantile: 对冲等待时间使用的延迟分位数
+            min_hedge_delay: 对冲等待时间的下限（秒）
+            default_hedge_delay: 延迟样本不足时的对冲等待时间（秒）
+            window: 每个主机保留的延迟样本数
+            min_samples: 按分位数计算对冲等待时间所需的最少样本数
+        """
+        pool_config = config.get_host_pool_config()
+        self.alpha = alpha or pool_config['alpha']
+        self.failure_threshold = failure_threshold or pool_config['failure_threshold']
+        self.reset_timeout = reset_timeout or pool_config['reset_timeout']
+        self.hedge = pool_config['hedge'] if hedge is None else hedge
+        self.hedge_quantile = hedge_quantile or pool_config['hedge_quantile']
+        self.min_hedge_delay = min_hedge_delay if min_hedge_delay is not None else pool_config['min_hedge_delay']
+        self.default_hedge_delay = default_hedge_delay or pool_config['default_hedge_delay']
+        self.min_samples = min_samples
+
+        self.hosts: Dict[str, HostState] = {}
+        for base_url in base_urls:
+            parts = urlsplit(base_url)
+            self.hosts[parts.netloc] = HostState(f"{parts.scheme}://{parts.netloc}", self.alpha, window)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._stats = {'requests': 0, 'failovers': 0, 'hedges': 0, 'hedge_wins': 0}
+
+    def __contains__(self, netloc: str) -> bool:
+        return netloc in self.hosts
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=2 * len(self.hosts),
+                                                        thread_name_prefix="nebula-hedge")
+        return self._executor
+
+    def select(self) -> List[str]:
+        """
+        按优先级排列可用主机
+
+        Returns:
+            主机名列表：未熔断的主机按EWMA升序，没有样本的主机以已测主机EWMA的均值作为先验，
+            与已测主机相同时排在其后（都没有样本时按配置顺序）；其后为可以试探的熔断主机；
+            全部熔断时返回最早熔断的主机
+        """
+        now = time.monotonic()
+        with self._lock:
+            closed, trials, opened = [], [], []
+            for netloc, host in self.hosts.items():
+                if host.state == OPEN and now - host.opened_at >= self.reset_timeout:
+                    host.state = HALF_OPEN
+                if host.state == CLOSED:
+                    closed.append(netloc)
+                elif host.state == HALF_OPEN and not host.trial_in_flight:
+                    trials.append(netloc)
+                else:
+                    opened.append(netloc)
+            measured = [self.hosts[netloc].ewma for netloc in closed if self.hosts[netloc].ewma is not None]
+            prior = sum(measured) / len(measured) if measured else 0.0
+            closed.sort(key=lambda netloc: (prior, 1) if self.hosts[netloc].ewma is None
+                        else (self.hosts[netloc].ewma, 0))
+            candidates = closed + trials
+            if not candidates:
+                candidates = sorted(opened, key=lambda netloc: self.hosts[netloc].opened_at)[:1]
+            return candidates
+
+    def record(self, netloc: str, latency: float, ok: bool):
+        """
+        记录一次请求结果
+
+        Args:
+            netloc: 主机名
+            latency: 耗时（秒）
+            ok: 是否成功（非5xx响应）
+        """
+        with self._lock:
+            host = self.hosts[netloc]
+            host.requests += 1
+            host.observe(latency)
+            host.trial_in_flight = False
+            if ok:
+                if host.state != CLOSED:
+                    logger.info(f"主机恢复: {netloc}")
+                host.state = CLOSED
+                host.failures = 0
+                return
+            host.errors += 1
+            host.failures += 1
+            if host.state == HALF_OPEN or host.failures >= self.failure_threshold:
+                if host.state != OPEN:
+                    logger.warning(f"主机熔断: {netloc}，连续失败 {host.failures} 次")
+                host.state = OPEN
+                host.opened_at = time.monotonic()
+
+    def hedge_delay(self, netloc: str) -> float:
+        """对冲等待时间：主机近期延迟的分位数，样本不足时使用默认值"""
+        with self._lock:
+            host = self.hosts[netloc]
+            delay = host.quantile(self.hedge_quantile) if len(host.samples) >= self.min_samples else None
+        return max(self.min_hedge_delay, delay if delay is not None else self.default_hedge_delay)
+
+    def _attempt(self, send: Callable[..., requests.Response], netloc: str, method: str, url: str,
+                 kwargs: dict) -> requests.Response:
+        """向指定主机发送请求并记录结果"""
+        parts = urlsplit(url)
+        target = urlunsplit((parts.scheme, netloc, parts.path, parts.query, parts.fragment))
+        with self._lock:
+            if self.hosts[netloc].state == HALF_OPEN:
+                self.hosts[netloc].trial_in_flight = True
+        start = time.monotonic()
+        try:
+            response = send(method, target, **kwargs)
+        except DeadlineExceeded:
+            # 截止时间导致的失败与主机无关
+            with self._lock:
+                self.hosts[netloc].trial_in_flight = False
+            raise
+        except requests.RequestException:
+            self.record(netloc, time.monotonic() - start, ok=False)
+            raise
+        self.record(netloc, time.monotonic() - start, ok=response.status_code < 500)
+        return response
+
+    def _hedged(self, send: Callable[..., requests.Response], hosts: List[str], method: str, url: str,
+                kwargs: dict) -> requests.Response:
+        """
+        向首选主机发送请求，超过对冲等待时间仍未返回时向第二个主机发送相同请求；
+        首选主机提前失败（异常或5xx）时立即向第二个主机发送
+
+        Returns:
+            先返回的成功响应；两个主机都返回5xx时返回最后一个响应
+        """
+        executor = self._get_executor()
+        attempt = run_in_context(self._attempt)
+        primary, secondary = hosts[0], hosts[1]
+        futures = {executor.submit(attempt, send, primary, method, url, kwargs): primary}
+        done, _ = wait(futures, timeout=self.hedge_delay(primary))
+        if not done:
+            with self._lock:
+                self._stats['hedges'] += 1
+            futures[executor.submit(attempt, send, secondary, method, url, kwargs)] = secondary
+
+        error, last_response = None, None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except DeadlineExceeded:
+                    raise
+                except requests.RequestException as e:
+                    error = e
+                    response = None
+                if response is not None and response.status_code < 500:
+                    if futures[future] != primary:
+                        with self._lock:
+                            self._stats['hedge_wins'] += 1
+                    # 未完成的请求在后台结束，其延迟仍会计入统计
+                    return response
+                if response is not None:
+                    last_response = response
+                if secondary not in futures.values():
+                    # 首选主机在对冲等待时间内失败，立即换到第二个主机
+                    with self._lock:
+                        self._stats['failovers'] += 1
+                    logger.warning(f"切换到镜像主机: {secondary}")
+                    future = executor.submit(attempt, send, secondary, method, url, kwargs)
+                    futures[future] = secondary
+                    pending.add(future)
+        if last_response is not None:
+            return last_response
+        raise error
+
+    def request(self, send: Callable[..., requests.Response], method: str, url: str,
+                hedge: Optional[bool] = None, **kwargs) -> requests.Response:
+        """
+        通过主机池发送请求
+
+        Args:
+            send: 实际发送请求的函数，签名同 HttpTransport.send
+            method: 请求方法
+            url: 请求URL，其主机会被替换为选中的镜像主机
+            hedge: 是否开启对冲请求，默认使用主机池的设置
+            **kwargs: 传给 send 的其他参数
+
+        Returns:
+            requests响应对象；所有主机都返回5xx时返回最后一个响应
+
+        Raises:
+            DeadlineExceeded: 超过截止时间，不再尝试其他主机
+            requests.RequestException: 所有主机都请求失败
+        """
+        with self._lock:
+            self._stats['requests'] += 1
+        hosts = self.select()
+        hedge = self.hedge if hedge is None else hedge
+        last_error, last_response = None, None
+        if hedge and len(hosts) >= 2:
+            try:
+                response = self._hedged(send, hosts, method, url, kwargs)
+            except DeadlineExceeded:
+                raise
+            except requests.RequestException as e:
+                last_error = e
+            else:
+                if response.status_code < 500:
+                    return response
+                last_response = response
+            # 对冲的两个主机都失败时，继续尝试其余主机
+            hosts = hosts[2:]
+            if not hosts:
+                if last_response is not None:
+                    return last_response
+                raise last_error
+            with self._lock:
+                self._stats['failovers'] += 1
+            logger.warning(f"切换到镜像主机: {hosts[0]}")
+
+        for i, netloc in enumerate(hosts):
+            if i > 0:
+                with self._lock:
+                    self._stats['failovers'] += 1
+                logger.warning(f"切换到镜像主机: {netloc}")
+            try:
+                response = self._attempt(send, netloc, method, url, kwargs)
+            except DeadlineExceeded:
+                raise
+            except requests.RequestException as e:
+                last_error = e
+                continue
+            if response.status_code < 500:
+                return response
+            last_response = response
+        if last_response is not None:
+            return last_response
+        raise last_error
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        主机池统计
+
+        Returns:
+            requests、failovers、hedges、hedge_wins: 请求数、换主机重试次数、对冲次数、对冲请求先返回的次数
+            hosts: 各主机的熔断状态、EWMA延迟、p95延迟、请求数和失败数
+        """
+        with self._lock:
+            hosts = {
+                netloc: {
+                    'state': host.state,
+                    'ewma': host.ewma,
+                    'p95': host.quantile(0.95),
+                    'requests': host.requests,
+                    'errors': host.errors,
+                }
+                for netloc, host in self.hosts.items()
+            }
+            return {**self._stats, 'hosts': hosts}
+
+def _split_hosts(value: str) -> List[str]:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+# 行情接口和历史行情接口的镜像主机池
+push2_pool = HostPool(_split_hosts(config.get_host_pool_config()['push2_hosts']))
+push2his_pool = HostPool(_split_hosts(config.get_host_pool_config()['push2his_hosts']))
@@ -0,0 +1,172 @@
+# -*- coding:utf-8 -*-
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Optional, Any, Dict, Iterable
+from urllib.parse import urlsplit
+from .config import config
+from .logger import logger
+from .rate_limit import RateLimiter, rate_limiter, is_overload_status
+from .host_pool import HostPool, push2_pool, push2his_pool
+from .retry import DeadlineExceeded, clamp_timeout, remaining_time
+
+class HttpTransport:
+    """进程级HTTP传输层，按主机维护连接池并保持长连接"""
+    
+    def __init__(self, pool_connections: Optional[int] = None, pool_maxsize: Optional[int] = None,
+                 connect_timeout: Optional[float] = None, read_timeout: Optional[float] = None,
+                 limiter: Optional[RateLimiter] = None, pools: Optional[Iterable[HostPool]] = None):
+        """
+        初始化HTTP传输层
+        
+        Args:
+            pool_connections: 缓存的主机连接池数量
+            pool_maxsize: 每个主机连接池的最大连接数
+            connect_timeout: 建立连接的超时时间（秒）
+            read_timeout: 读取响应的默认超时时间（秒）
+            limiter: 按主机限流的限流器，默认使用全局限流器
+            pools: 镜像主机池，发往池中主机的请求会在池内选择主机、熔断和换主机重试，
+                默认使用行情和历史行情的主机池（HOST_POOL_ENABLED 关闭时不使用）
+        """
+        http_config = config.get_http_config()
+        self.pool_connections = pool_connections or http_config['pool_connections']
+        self.pool_maxsize = pool_maxsize or http_config['pool_maxsize']
+        self.connect_timeout = connect_timeout or http_config['connect_timeout']
+        self.read_timeout = read_timeout or http_config['read_timeout']
+        self.limiter = limiter or rate_limiter
+        if pools is None:
+            pools = [push2_pool, push2his_pool] if config.get_host_pool_config()['enabled'] else []
+        self.pools = list(pools)
+        
+        self._lock = threading.Lock()
+        self._session = None
+        self._adapter = None
+    
+    def _get_session(self) -> requests.Session:
+        """获取共享的Session，首次使用时创建"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                                          pool_maxsize=self.pool_maxsize)
+                    session = requests.Session()
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._adapter = adapter
+                    self._session = session
+                    logger.debug(f"HTTP连接池已创建: pool_connections={self.pool_connections}, "
+                                 f"pool_maxsize={self.pool_maxsize}")
+        return self._session
+    
+    def _timeout(self, timeout: Optional[float]) -> tuple:
+        """生成 (连接超时, 读取超时) 元组，均不超过当前截止时间的剩余时间"""
+        read_timeout = clamp_timeout(timeout if timeout is not None else self.read_timeout)
+        return (min(self.connect_timeout, read_timeout), read_timeout)
+    
+    def _pool_for(self, url: str) -> Optional[HostPool]:
+        """URL所在主机所属的主机池"""
+        netloc = urlsplit(url).netloc
+        for pool in self.pools:
+            if netloc in pool:
+                return pool
+        return None
+    
+    def request(self, method: str, url: str, params: Optional[dict] = None, json: Any = None,
+                timeout: Optional[float] = None, hedge: Optional[bool] = None, **kwargs) -> requests.Response:
+        """
+        发送HTTP请求，URL的主机属于某个主机池时由主机池选择实际请求的主机
+        
+        Args:
+            method: 请求方法
+            url: 请求URL
+            params: 查询参数
+            json: JSON请求体
+            timeout: 读取超时时间，默认使用配置文件中的值
+            hedge: 是否开启对冲请求，默认使用主机池的设置，不属于主机池的URL忽略此参数
+            
+        Returns:
+            requests响应对象
+        """
+        pool = self._pool_for(url)
+        if pool is not None:
+            return pool.request(self.send, method, url, hedge=hedge, params=params, json=json,
+                                timeout=timeout, **kwargs)
+        return self.send(method, url, params=params, json=json, timeout=timeout, **kwargs)
+    
+    def send(self, method: str, url: str, params: Optional[dict] = None, json: Any = None,
+             timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        """向指定URL发送HTTP请求，只经过限流，不经过主机池；等待限流许可和读取响应的时间不超过当前截止时间"""
+        session = self._get_session()
+        host_limiter = self.limiter.for_url(url)
+        if host_limiter is not None:
+            # 按主机限流：429、5xx和超时减小并发上限，正常响应逐步增大
+            host_limiter.acquire(clamp_timeout(self.limiter.max_wait))
+        overloaded = False
+        try:
+            response = session.request(method, url, params=params, json=json,
+                                       timeout=self._timeout(timeout), **kwargs)
+            overloaded = is_overload_status(response.status_code)
+            return response
+        except requests.Timeout as e:
+            remaining = remaining_time()
+            if remaining is not None and remaining <= 0:
+                # 超时时间被截止时间缩短，不视为服务端过载
+                raise DeadlineExceeded("已超过截止时间") from e
+            overloaded = True
+            raise
+        finally:
+            if host_limiter is not None:
+                host_limiter.release(overloaded)
+    
+    def get(self, url: str, params: Optional[dict] = None, timeout: Optional[float] = None,
+            **kwargs) -> requests.Response:
+        """发送GET请求"""
+        return self.request('GET', url, params=params, timeout=timeout, **kwargs)
+    
+    def post(self, url: str, json: Any = None, timeout: Optional[float] = None,
+             **kwargs) -> requests.Response:
+        """发送POST请求"""
+        return self.request('POST', url, json=json, timeout=timeout, **kwargs)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取连接复用统计
+        
+        Returns:
+            dict: 请求总数、新建连接数、复用次数、各主机明细、各主机的限流状态及主机池状态
+        """
+        hosts = {}
+        if self._adapter is not None:
+            pools = self._adapter.poolmanager.pools
+            pool_list = [pools.get(key) for key in pools.keys()]
+            for pool in filter(None, pool_list):
+                host = f"{pool.scheme}://{pool.host}:{pool.port}"
+                hosts[host] = {
+                    'requests': pool.num_requests,
+                    'connections': pool.num_connections,
+                    'reused': max(pool.num_requests - pool.num_connections, 0)
+                }
+        
+        total_requests = sum(item['requests'] for item in hosts.values())
+        total_connections = sum(item['connections'] for item in hosts.values())
+        reused = sum(item['reused'] for item in hosts.values())
+        return {
+            'requests': total_requests,
+            'connections': total_connections,
+            'reused': reused,
+            'reuse_ratio': reused / total_requests if total_requests else 0.0,
+            'hosts': hosts,
+            'rate_limits': self.limiter.stats(),
+            'host_pools': {', '.join(pool.hosts): pool.stats() for pool in self.pools}
+        }
+    
+    def close(self):
+        """关闭所有连接"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+                self._adapter = None
+
+# 全局HTTP传输层实例
+http_transport = HttpTransport()
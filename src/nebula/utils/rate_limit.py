@@ -0,0 +1,233 @@
+# -*- coding:utf-8 -*-
+import asyncio
+import threading
+import time
+from typing import Optional, Dict, Any
+from urllib.parse import urlsplit
+import requests
+from .config import config
+from .logger import logger
+
+class RateLimitTimeout(requests.Timeout, TimeoutError):
+    """等待限流许可超时，同时是 requests.Timeout 和 TimeoutError，可由现有的超时处理逻辑捕获"""
+    pass
+
+def is_overload_status(status_code: int) -> bool:
+    """HTTP 429 和 5xx 视为服务端过载"""
+    return status_code == 429 or status_code >= 500
+
+class HostLimiter:
+    """
+    单个主机的限流器
+
+    令牌桶限制请求速率，AIMD（加性增、乘性减）调整并发上限：每个正常响应使并发上限增加 1/上限，
+    即每一轮请求约增加1；遇到 429、5xx 或超时时上限减半，冷却时间内的多次过载只减半一次
+    """
+
+    def __init__(self, rate: float, burst: float, initial_concurrency: float, min_concurrency: float,
+                 max_concurrency: float, backoff: float = 0.5, cooldown: float = 1.0, poll_interval: float = 0.01):
+        """
+        初始化限流器
+
+        Args:
+            rate: 令牌生成速率（每秒请求数）
+            burst: 令牌桶容量，允许的突发请求数
+            initial_concurrency: 初始并发上限
+            min_concurrency: 并发上限的下限
+            max_concurrency: 并发上限的上限
+            backoff: 过载时并发上限乘以的系数
+            cooldown: 两次减小并发上限的最短间隔（秒）
+            poll_interval: 异步等待时检查并发许可的间隔（秒）
+        """
+        self.rate = rate
+        self.burst = burst
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.limit = float(min(max(initial_concurrency, min_concurrency), max_concurrency))
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.poll_interval = poll_interval
+
+        self._cond = threading.Condition()
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._last_decrease = 0.0
+        self._in_flight = 0
+        self._waiting = 0
+        self._stats = {'requests': 0, 'successes': 0, 'overloads': 0, 'throttled': 0, 'timeouts': 0}
+
+    def _reserve_token(self) -> float:
+        """预留一个令牌，返回需要等待的时间（秒），调用时需持有锁"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0.0
+        self._stats['throttled'] += 1
+        return -self._tokens / self.rate
+
+    def _try_enter(self) -> bool:
+        """并发数未达上限时占用一个并发许可，调用时需持有锁"""
+        if self._in_flight < max(int(self.limit), 1):
+            self._in_flight += 1
+            self._stats['requests'] += 1
+            return True
+        return False
+
+    def _timeout(self):
+        self._stats['timeouts'] += 1
+        raise RateLimitTimeout(f"等待限流许可超时: 并发上限 {int(self.limit)}，排队 {self._waiting}")
+
+    def acquire(self, timeout: Optional[float] = None):
+        """
+        获取一个请求许可，必要时阻塞等待，完成请求后必须调用 release
+
+        Args:
+            timeout: 等待并发许可的最长时间（秒），None表示一直等待
+
+        Raises:
+            RateLimitTimeout: 等待超时
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._waiting += 1
+            try:
+                while not self._try_enter():
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._timeout()
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+            wait = self._reserve_token()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, timeout: Optional[float] = None):
+        """acquire 的异步版本，等待期间不阻塞事件循环"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._waiting += 1
+        try:
+            while True:
+                with self._cond:
+                    if self._try_enter():
+                        wait = self._reserve_token()
+                        break
+                    if deadline is not None and time.monotonic() >= deadline:
+                        self._timeout()
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            with self._cond:
+                self._waiting -= 1
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # 取消时归还并发许可，不计入请求结果
+                with self._cond:
+                    self._in_flight -= 1
+                    self._cond.notify_all()
+                raise
+
+    def release(self, overloaded: bool = False):
+        """
+        归还请求许可并根据结果调整并发上限
+
+        Args:
+            overloaded: 是否遇到过载（429、5xx或超时）
+        """
+        with self._cond:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if overloaded:
+                self._stats['overloads'] += 1
+                if now - self._last_decrease >= self.cooldown:
+                    previous = self.limit
+                    self.limit = max(self.min_concurrency, self.limit * self.backoff)
+                    self._last_decrease = now
+                    logger.warning(f"服务端过载，并发上限 {previous:.1f} -> {self.limit:.1f}")
+            else:
+                self._stats['successes'] += 1
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        当前限流状态
+
+        Returns:
+            rate、burst、tokens: 令牌桶参数和剩余令牌
+            limit: 当前并发上限
+            in_flight: 在途请求数
+            waiting: 排队等待许可的请求数
+            requests、successes、overloads、throttled、timeouts: 累计计数
+        """
+        with self._cond:
+            elapsed = time.monotonic() - self._last_refill
+            return {
+                'rate': self.rate,
+                'burst': self.burst,
+                'tokens': min(self.burst, self._tokens + elapsed * self.rate),
+                'limit': int(self.limit),
+                'in_flight': self._in_flight,
+                'waiting': self._waiting,
+                **self._stats
+            }
+
+class RateLimiter:
+    """按主机管理限流器，同步和异步传输层共用"""
+
+    def __init__(self, enabled: Optional[bool] = None, rate: Optional[float] = None, burst: Optional[float] = None,
+                 initial_concurrency: Optional[int] = None, min_concurrency: Optional[int] = None,
+                 max_concurrency: Optional[int] = None, max_wait: Optional[float] = None):
+        """
+        初始化限流器，参数默认读取配置项 RATE_LIMIT_*
+
+        Args:
+            enabled: 是否启用限流
+            rate: 每个主机每秒请求数
+            burst: 每个主机允许的突发请求数
+            initial_concurrency: 每个主机的初始并发上限
+            min_concurrency: 并发上限的下限
+            max_concurrency: 并发上限的上限
+            max_wait: 等待并发许可的最长时间（秒）
+        """
+        rate_config = config.get_rate_limit_config()
+        self.enabled = rate_config['enabled'] if enabled is None else enabled
+        self.rate = rate or rate_config['rate']
+        self.burst = burst or rate_config['burst']
+        self.initial_concurrency = initial_concurrency or rate_config['initial_concurrency']
+        self.min_concurrency = min_concurrency or rate_config['min_concurrency']
+        self.max_concurrency = max_concurrency or rate_config['max_concurrency']
+        self.max_wait = max_wait or rate_config['max_wait']
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, HostLimiter] = {}
+
+    def for_host(self, host: str) -> HostLimiter:
+        """获取主机的限流器，首次使用时创建"""
+        limiter = self._hosts.get(host)
+        if limiter is None:
+            with self._lock:
+                limiter = self._hosts.get(host)
+                if limiter is None:
+                    limiter = HostLimiter(self.rate, self.burst, self.initial_concurrency,
+                                          self.min_concurrency, self.max_concurrency)
+                    self._hosts[host] = limiter
+        return limiter
+
+    def for_url(self, url: str) -> Optional[HostLimiter]:
+        """获取URL所在主机的限流器，未启用限流时返回None"""
+        if not self.enabled:
+            return None
+        return self.for_host(urlsplit(url).netloc)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各主机的限流状态"""
+        with self._lock:
+            hosts = dict(self._hosts)
+        return {host: limiter.stats() for host, limiter in hosts.items()}
+
+# 全局限流器实例
+rate_limiter = RateLimiter()
@@ -0,0 +1,249 @@
+# -*- coding:utf-8 -*-
+import contextvars
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Optional, Callable, Any, Dict, Iterator, Tuple
+import requests
+from .config import config
+from .logger import logger
+
+class DeadlineExceeded(requests.Timeout, TimeoutError):
+    """超过调用方给定的截止时间，同时是 requests.Timeout 和 TimeoutError，可由现有的超时处理逻辑捕获"""
+    pass
+
+# 当前调用链的截止时间（time.monotonic() 时刻），None表示不限
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar('nebula_deadline', default=None)
+# 是否已处于某个重试策略之内，嵌套的重试策略不再重试，避免重试次数相乘
+_retrying: contextvars.ContextVar[bool] = contextvars.ContextVar('nebula_retrying', default=False)
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[Optional[float]]:
+    """
+    在代码块内设置截止时间，嵌套时取更早的截止时间
+
+    Args:
+        seconds: 距现在的秒数，None或0表示不另设截止时间
+
+    Yields:
+        生效的截止时间（time.monotonic() 时刻），没有截止时间时为None
+    """
+    current = _deadline.get()
+    if not seconds:
+        yield current
+        return
+    deadline = time.monotonic() + seconds
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+def remaining_time() -> Optional[float]:
+    """当前截止时间的剩余秒数，没有截止时间时返回None"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+def check_deadline():
+    """
+    截止时间已过时抛出异常
+
+    Raises:
+        DeadlineExceeded: 已超过截止时间
+    """
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded("已超过截止时间")
+
+def clamp_timeout(timeout: Optional[float]) -> Optional[float]:
+    """
+    将超时时间限制在截止时间之内
+
+    Args:
+        timeout: 原超时时间（秒），None表示不限
+
+    Returns:
+        不超过剩余时间的超时时间
+
+    Raises:
+        DeadlineExceeded: 已超过截止时间
+    """
+    check_deadline()
+    remaining = remaining_time()
+    if remaining is None:
+        return timeout
+    return remaining if timeout is None else min(timeout, remaining)
+
+def run_in_context(func: Callable) -> Callable:
+    """包装函数，使其在线程池中执行时沿用当前的截止时间"""
+    context = contextvars.copy_context()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+class RetryBudget:
+    """
+    进程级重试预算
+
+    每个请求存入 ratio 个令牌，每次重试取出1个，另按 min_per_sec 的速率补充令牌，
+    保证请求量很低时仍可重试。上游持续故障时重试数被限制在请求数的 ratio 倍左右，不会形成重试风暴
+    """
+
+    def __init__(self, ratio: Optional[float] = None, min_per_sec: Optional[float] = None,
+                 max_balance: Optional[float] = None):
+        """
+        初始化重试预算，参数默认读取配置项 RETRY_BUDGET_*
+
+        Args:
+            ratio: 重试数占请求数的比例上限
+            min_per_sec: 每秒保底的重试数
+            max_balance: 令牌数上限，默认为 10 倍的 min_per_sec
+        """
+        retry_config = config.get_retry_config()
+        self.ratio = ratio if ratio is not None else retry_config['budget_ratio']
+        self.min_per_sec = min_per_sec if min_per_sec is not None else retry_config['budget_min_per_sec']
+        self.max_balance = max_balance or max(10 * self.min_per_sec, 1.0)
+        self._lock = threading.Lock()
+        self._balance = self.max_balance
+        self._last_refill = time.monotonic()
+        self._stats = {'requests': 0, 'retries': 0, 'denied': 0}
+
+    def _refill(self):
+        now = time.monotonic()
+        self._balance = min(self.max_balance, self._balance + (now - self._last_refill) * self.min_per_sec)
+        self._last_refill = now
+
+    def record_request(self):
+        """记录一次请求（含重试）"""
+        with self._lock:
+            self._stats['requests'] += 1
+            self._refill()
+            self._balance = min(self.max_balance, self._balance + self.ratio)
+
+    def try_retry(self) -> bool:
+        """申请一次重试，预算不足时返回False"""
+        with self._lock:
+            self._refill()
+            if self._balance >= 1:
+                self._balance -= 1
+                self._stats['retries'] += 1
+                return True
+            self._stats['denied'] += 1
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        重试预算状态
+
+        Returns:
+            balance: 当前可用的重试数
+            requests、retries、denied: 请求数、重试数、因预算不足放弃的重试数
+        """
+        with self._lock:
+            self._refill()
+            return {'balance': self._balance, **self._stats}
+
+class RetryPolicy:
+    """
+    重试策略：有上限的重试次数、带随机抖动的指数退避、截止时间和进程级重试预算
+
+    退避时间为 [0, min(max_delay, base_delay * multiplier^n)] 内的随机值；剩余时间不够退避时直接失败。
+    嵌套调用（如已重试的函数内部再调用带重试的请求函数）只在最外层重试
+    """
+
+    def __init__(self, max_retries: Optional[int] = None, base_delay: Optional[float] = None,
+                 multiplier: float = 2.0, max_delay: Optional[float] = None,
+                 exceptions: Tuple[type, ...] = (requests.RequestException,),
+                 budget: Optional[RetryBudget] = None):
+        """
+        初始化重试策略，参数默认读取配置项 REQUEST_RETRIES 和 RETRY_*
+
+        Args:
+            max_retries: 最大重试次数
+            base_delay: 初始退避时间（秒）
+            multiplier: 退避时间增长倍数
+            max_delay: 退避时间上限（秒）
+            exceptions: 需要重试的异常类型，DeadlineExceeded 不会重试
+            budget: 重试预算，默认使用全局重试预算
+        """
+        retry_config = config.get_retry_config()
+        self.max_retries = max_retries if max_retries is not None else config.get_api_config()['retries']
+        self.base_delay = base_delay if base_delay is not None else retry_config['base_delay']
+        self.multiplier = multiplier
+        self.max_delay = max_delay if max_delay is not None else retry_config['max_delay']
+        self.exceptions = exceptions
+        self.budget = budget or retry_budget
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次重试前的退避时间（秒），从0开始计数"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * self.multiplier ** attempt))
+
+    def call(self, func: Callable, *args, deadline: Optional[float] = None, **kwargs) -> Any:
+        """
+        按策略调用函数
+
+        Args:
+            func: 被调用的函数
+            *args: 位置参数
+            deadline: 整个调用（含重试和退避）的最长耗时（秒），默认沿用外层的截止时间
+            **kwargs: 关键字参数
+
+        Returns:
+            函数返回值
+
+        Raises:
+            DeadlineExceeded: 超过截止时间
+            最后一次调用抛出的异常: 重试次数或预算用完，或剩余时间不够再次重试
+        """
+        with deadline_scope(deadline):
+            return self._call(func, args, kwargs)
+
+    def _call(self, func: Callable, args: tuple, kwargs: dict) -> Any:
+        if _retrying.get():
+            check_deadline()
+            return func(*args, **kwargs)
+
+        token = _retrying.set(True)
+        try:
+            attempt = 0
+            while True:
+                check_deadline()
+                self.budget.record_request()
+                try:
+                    return func(*args, **kwargs)
+                except DeadlineExceeded:
+                    raise
+                except self.exceptions as e:
+                    if attempt >= self.max_retries:
+                        raise
+                    wait = self.backoff(attempt)
+                    remaining = remaining_time()
+                    if remaining is not None and wait >= remaining:
+                        logger.warning(f"请求失败，剩余时间不足以重试: {str(e)}")
+                        raise
+                    if not self.budget.try_retry():
+                        logger.warning(f"请求失败，重试预算已用完: {str(e)}")
+                        raise
+                    attempt += 1
+                    logger.warning(f"请求失败 (尝试 {attempt}/{self.max_retries + 1}): {str(e)}")
+                    logger.info(f"等待 {wait:.2f} 秒后重试...")
+                    time.sleep(wait)
+        finally:
+            _retrying.reset(token)
+
+    def __call__(self, func: Callable) -> Callable:
+        """作为装饰器使用，被装饰函数的 deadline 关键字参数同时作为重试的截止时间"""
+        @wraps(func)
+        def wrapper(*args, **kwargs) -> Any:
+            with deadline_scope(kwargs.get('deadline')):
+                return self._call(func, args, kwargs)
+        return wrapper
+
+# 全局重试预算实例
+retry_budget = RetryBudget()
@@ -0,0 +1,145 @@
+# -*- coding:utf-8 -*-
+import time
+import uuid
+import threading
+from concurrent.futures import Future
+from typing import Optional, Any, Callable, Dict
+from .cache import cache_manager, RELEASE_SCRIPT
+from .config import config
+from .logger import logger
+
+class SingleFlight:
+    """
+    合并同一键的并发请求
+
+    进程内：同一时刻只有一个线程（领导者）执行加载函数，其他线程等待并共享其结果或异常；
+    跨进程：领导者执行前通过 Redis 的 SET NX PX 获取短期锁，未获得锁的进程等待锁释放后再执行
+    加载函数——此时领导者已写入缓存，加载函数中的缓存检查会直接命中。Redis不可用时只做进程内合并
+    """
+
+    def __init__(self, lock_ttl: Optional[float] = None, wait_timeout: Optional[float] = None,
+                 poll_interval: float = 0.05, redis_client: Any = None):
+        """
+        初始化请求合并器
+
+        Args:
+            lock_ttl: 跨进程锁的过期时间（秒），防止持锁进程崩溃后锁永久存在
+            wait_timeout: 等待其他进程释放锁的最长时间（秒），超时后自行加载
+            poll_interval: 检查锁是否释放的间隔（秒）
+            redis_client: Redis客户端，默认使用全局缓存管理器的连接；传入False时只做进程内合并
+        """
+        cache_config = config.get_cache_config()
+        self.lock_ttl = lock_ttl or cache_config['singleflight_lock_ttl']
+        self.wait_timeout = wait_timeout or cache_config['singleflight_wait_timeout']
+        self.poll_interval = poll_interval
+        self._redis_client = redis_client
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self._stats = {'calls': 0, 'executions': 0, 'collapsed': 0, 'remote_waits': 0, 'remote_timeouts': 0}
+
+    @property
+    def redis_client(self):
+        return self._redis_client if self._redis_client is not None else cache_manager.redis_client
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        执行加载函数，同一键的并发调用只执行一次
+
+        Args:
+            key: 请求键，通常与缓存键相同
+            fn: 加载函数，应在开始时检查缓存，以便跨进程等待结束后直接命中
+
+        Returns:
+            加载函数的返回值
+        """
+        with self._lock:
+            self._stats['calls'] += 1
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self._stats['collapsed'] += 1
+
+        if not leader:
+            logger.debug(f"合并并发请求: {key}")
+            return future.result()
+
+        try:
+            result = self._run_exclusive(key, fn)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def _run_exclusive(self, key: str, fn: Callable[[], Any]) -> Any:
+        """在跨进程锁的保护下执行加载函数"""
+        client = self.redis_client
+        if not client:
+            self._count('executions')
+            return fn()
+
+        lock_key = f"singleflight:{key}"
+        token = uuid.uuid4().hex
+        try:
+            acquired = client.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))
+        except Exception as e:
+            logger.warning(f"获取跨进程锁失败: {key}, 错误: {e}")
+            self._count('executions')
+            return fn()
+
+        if not acquired:
+            self._wait_remote(client, lock_key)
+            self._count('executions')
+            return fn()
+
+        try:
+            self._count('executions')
+            return fn()
+        finally:
+            try:
+                client.eval(RELEASE_SCRIPT, 1, lock_key, token)
+            except Exception as e:
+                logger.warning(f"释放跨进程锁失败: {key}, 错误: {e}")
+
+    def _wait_remote(self, client: Any, lock_key: str):
+        """等待其他进程释放锁"""
+        self._count('remote_waits')
+        deadline = time.monotonic() + self.wait_timeout
+        try:
+            while time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                if not client.exists(lock_key):
+                    return
+        except Exception as e:
+            logger.warning(f"检查跨进程锁失败: {lock_key}, 错误: {e}")
+            return
+        self._count('remote_timeouts')
+        logger.warning(f"等待跨进程锁超时: {lock_key}")
+
+    def stats(self) -> Dict[str, int]:
+        """
+        请求合并统计
+
+        Returns:
+            calls: 调用次数
+            executions: 实际执行加载函数的次数
+            collapsed: 在进程内被合并的调用次数
+            remote_waits: 等待其他进程加载的次数
+            remote_timeouts: 等待其他进程超时的次数
+        """
+        with self._lock:
+            return dict(self._stats)
+
+# 全局请求合并器实例
+single_flight = SingleFlight()
@@ -0,0 +1,283 @@
+# -*- coding:utf-8 -*-
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Optional, Dict, Any, Iterable, Iterator, List, Union
+import numpy as np
+import pandas as pd
+from .config import config
+from .logger import logger
+from .trading_calendar import trading_calendar, CN_TZ
+
+SCHEMA_VERSION = 1
+
+# 每条记录的定长字段：(字段名, 数据类型, 行情数据列名)，价格和量均为float64，缺失值为NaN
+TICK_COLUMNS = [
+    ('timestamp', '<i8', '时间'),
+    ('symbol', 'S8', '代码'),
+    ('last', '<f8', '最新'),
+    ('volume', '<f8', '总手'),
+    ('amount', '<f8', '金额'),
+] + [
+    (f"{side}{level}_{kind}", '<f8', f"{label}{'一二三四五'[level - 1]}{'价' if kind == 'price' else '量'}")
+    for side, label in (('ask', '卖'), ('bid', '买')) for level in range(1, 6) for kind in ('price', 'volume')
+]
+TICK_DTYPE = np.dtype([(name, dtype) for name, dtype, _ in TICK_COLUMNS])
+INDEX_DTYPE = np.dtype([('timestamp', '<i8'), ('offset', '<i8')])
+
+def _to_millis(value: Union[str, datetime, pd.Timestamp]) -> int:
+    """将日期或时间转换为毫秒时间戳（按北京时间的本地时间存储，带时区的时间先换算为北京时间）"""
+    value = pd.Timestamp(value)
+    if value.tzinfo is not None:
+        value = value.tz_convert(CN_TZ).tz_localize(None)
+    return int(value.value // 10**6)
+
+class TickStore:
+    """
+    只追加的定长二进制逐笔快照存储
+
+    每个交易日一个目录，ticks.bin 按接收时间顺序存放定长记录（TICK_DTYPE），
+    index.bin 为稀疏时间索引，每个索引间隔记录一次 (时间戳, 记录偏移)。
+    回放时内存映射 ticks.bin，先在稀疏索引中二分查找，再只在一个索引间隔内定位，
+    返回内存映射数组的切片，不解析、不拷贝。写入假定只有一个进程
+    """
+
+    def __init__(self, root: Optional[str] = None, index_interval: Optional[float] = None):
+        """
+        初始化逐笔快照存储
+
+        Args:
+            root: 存储根目录，默认读取配置项 TICK_STORE_PATH
+            index_interval: 稀疏时间索引的间隔（秒），默认读取配置项 TICK_INDEX_INTERVAL
+        """
+        tick_config = config.get_tick_store_config()
+        self.root = root or tick_config['path']
+        self.index_interval = index_interval or tick_config['index_interval']
+        self._lock = threading.Lock()
+        # 交易日 -> (最后写入的时间戳, 最后一个索引条目所在的索引间隔)
+        self._tails: Dict[str, tuple] = {}
+        self._checked_days = set()
+
+    def _day_dir(self, day: str) -> str:
+        return os.path.join(self.root, day)
+
+    def _path(self, day: str, name: str) -> str:
+        return os.path.join(self._day_dir(day), name)
+
+    def days(self) -> List[str]:
+        """已记录的交易日（YYYYMMDD），升序"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(day for day in os.listdir(self.root) if os.path.exists(self._path(day, 'ticks.bin')))
+
+    def _check_schema(self, day: str):
+        """新交易日写入字段定义，已有交易日的字段定义必须与当前一致"""
+        if day in self._checked_days:
+            return
+        path = self._path(day, 'schema.json')
+        schema = {'version': SCHEMA_VERSION, 'dtype': [[name, dtype] for name, dtype, _ in TICK_COLUMNS]}
+        if not os.path.exists(path):
+            os.makedirs(self._day_dir(day), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(schema, f)
+        else:
+            with open(path, encoding='utf-8') as f:
+                if json.load(f) != schema:
+                    raise ValueError(f"逐笔快照字段定义与已有数据不一致: {day}")
+        self._checked_days.add(day)
+
+    def _length(self, day: str) -> int:
+        path = self._path(day, 'ticks.bin')
+        return os.path.getsize(path) // TICK_DTYPE.itemsize if os.path.exists(path) else 0
+
+    def _tail(self, day: str, length: int) -> tuple:
+        """读取交易日最后写入的时间戳和最后的索引间隔，重启后从文件恢复"""
+        tail = self._tails.get(day)
+        if tail is None:
+            ticks, index = self.open_day(day), self._open_index(day, length)
+            index_path = self._path(day, 'index.bin')
+            if os.path.exists(index_path) and os.path.getsize(index_path) != index.nbytes:
+                # 丢弃写入中断留下的不完整条目和指向不完整记录的条目
+                index.tofile(index_path)
+            last_ts = int(ticks['timestamp'][-1]) if len(ticks) else None
+            last_bucket = int(index['timestamp'][-1] // (self.index_interval * 1000)) if len(index) else None
+            tail = (last_ts, last_bucket)
+        return tail
+
+    @staticmethod
+    def _numeric(values: Any) -> np.ndarray:
+        """转换为float64数组，None和无法解析的值为NaN"""
+        try:
+            return np.asarray(values, dtype='float64')
+        except (TypeError, ValueError):
+            return pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype='float64')
+
+    def _records(self, data: Union[pd.DataFrame, Dict[str, Any]]) -> np.ndarray:
+        """行情数据转换为定长记录，时间戳在写入时填充"""
+        labels = [label for _, _, label in TICK_COLUMNS[2:]]
+        if isinstance(data, pd.DataFrame):
+            symbols = data['代码'].astype(str).to_numpy(dtype='S8')
+            # 整表一次转换，避免逐列构造Series
+            values = self._numeric(data.reindex(columns=labels)).T
+        else:
+            symbols = np.array([str(symbol) for symbol in data['代码']], dtype='S8')
+            values = [self._numeric(data[label]) if label in data else np.full(len(symbols), np.nan)
+                      for label in labels]
+        records = np.zeros(len(symbols), dtype=TICK_DTYPE)
+        records['symbol'] = symbols
+        for (name, _, _), column in zip(TICK_COLUMNS[2:], values):
+            records[name] = column
+        return records
+
+    def append(self, data: Union[pd.DataFrame, Dict[str, Any]],
+               timestamp: Optional[Union[str, datetime, pd.Timestamp]] = None) -> int:
+        """
+        追加一次行情快照
+
+        Args:
+            data: 含“代码”列和 TICK_MAP 中五档、最新、总手、金额列的DataFrame或 {列名: 列表}，缺少的列记为NaN
+            timestamp: 快照时间，默认为当前北京时间；早于已记录的最后时间时按最后时间记录，保证时间有序
+
+        Returns:
+            int: 写入的记录数
+        """
+        try:
+            millis = _to_millis(timestamp if timestamp is not None else trading_calendar.now())
+            records = self._records(data)
+            if len(records) == 0:
+                return 0
+            with self._lock:
+                day = pd.Timestamp(millis, unit='ms').strftime('%Y%m%d')
+                self._check_schema(day)
+                length = self._length(day)
+                last_ts, last_bucket = self._tail(day, length)
+                if last_ts is not None:
+                    millis = max(millis, last_ts)
+                records['timestamp'] = millis
+
+                # 先按完整记录数截断，丢弃写入中断留下的不完整尾部
+                with open(self._path(day, 'ticks.bin'), 'ab') as f:
+                    f.truncate(length * TICK_DTYPE.itemsize)
+                    f.write(records.tobytes())
+                bucket = int(millis // (self.index_interval * 1000))
+                if bucket != last_bucket:
+                    entry = np.array([(millis, length)], dtype=INDEX_DTYPE)
+                    with open(self._path(day, 'index.bin'), 'ab') as f:
+                        f.write(entry.tobytes())
+                self._tails[day] = (millis, bucket)
+                return len(records)
+        except Exception as e:
+            logger.error(f"保存逐笔快照时出错: {e}")
+            return 0
+
+    def open_day(self, day: str) -> np.ndarray:
+        """
+        以只读方式内存映射一个交易日的全部记录
+
+        Args:
+            day: 交易日，YYYYMMDD
+
+        Returns:
+            TICK_DTYPE 结构化数组
+        """
+        length = self._length(day)
+        if length == 0:
+            return np.empty(0, dtype=TICK_DTYPE)
+        return np.memmap(self._path(day, 'ticks.bin'), dtype=TICK_DTYPE, mode='r', shape=(length,))
+
+    def _open_index(self, day: str, length: int) -> np.ndarray:
+        """读取稀疏时间索引，忽略指向不完整记录之后的条目"""
+        path = self._path(day, 'index.bin')
+        if not os.path.exists(path):
+            return np.empty(0, dtype=INDEX_DTYPE)
+        index = np.fromfile(path, dtype=INDEX_DTYPE, count=os.path.getsize(path) // INDEX_DTYPE.itemsize)
+        return index[index['offset'] < length]
+
+    @staticmethod
+    def _locate(ticks: np.ndarray, index: np.ndarray, millis: int, side: str) -> int:
+        """定位时间戳的记录偏移：先二分查找稀疏索引，再在一个索引间隔内二分查找"""
+        position = int(np.searchsorted(index['timestamp'], millis, side='right'))
+        low = int(index['offset'][position - 1]) if position > 0 else 0
+        high = int(index['offset'][position]) if position < len(index) else len(ticks)
+        return low + int(np.searchsorted(np.ascontiguousarray(ticks['timestamp'][low:high]), millis, side=side))
+
+    def _day_range(self, day: str, start: Optional[int], end: Optional[int]) -> np.ndarray:
+        ticks = self.open_day(day)
+        if len(ticks) == 0:
+            return ticks
+        index = self._open_index(day, len(ticks))
+        begin = self._locate(ticks, index, start, 'left') if start is not None else 0
+        stop = self._locate(ticks, index, end, 'right') if end is not None else len(ticks)
+        return ticks[begin:stop]
+
+    def _bounds(self, start: Optional[str], end: Optional[str]) -> tuple:
+        start_ms = _to_millis(start) if start else None
+        end_ms = None
+        if end:
+            end_ts = pd.Timestamp(end)
+            # 只给出日期时包含当天的全部数据
+            if len(str(end).strip()) <= 10:
+                end_ts = end_ts + pd.Timedelta(days=1) - pd.Timedelta(milliseconds=1)
+            end_ms = _to_millis(end_ts)
+        return start_ms, end_ms
+
+    def _days_between(self, start_ms: Optional[int], end_ms: Optional[int]) -> List[str]:
+        first = pd.Timestamp(start_ms, unit='ms').strftime('%Y%m%d') if start_ms is not None else None
+        last = pd.Timestamp(end_ms, unit='ms').strftime('%Y%m%d') if end_ms is not None else None
+        return [day for day in self.days() if (first is None or day >= first) and (last is None or day <= last)]
+
+    def replay(self, start: Optional[str] = None, end: Optional[str] = None,
+               symbols: Optional[Iterable[str]] = None, chunk_size: int = 100_000) -> Iterator[np.ndarray]:
+        """
+        按时间顺序回放区间内的记录
+
+        Args:
+            start: 开始时间（含）
+            end: 结束时间（含），只给出日期时包含当天
+            symbols: 只回放这些股票，默认全部
+            chunk_size: 每块的记录数
+
+        Yields:
+            TICK_DTYPE 结构化数组；不过滤股票时为内存映射文件的只读切片
+        """
+        start_ms, end_ms = self._bounds(start, end)
+        wanted = np.array([str(symbol) for symbol in symbols], dtype='S8') if symbols is not None else None
+        for day in self._days_between(start_ms, end_ms):
+            ticks = self._day_range(day, start_ms, end_ms)
+            for offset in range(0, len(ticks), chunk_size):
+                chunk = ticks[offset:offset + chunk_size]
+                if wanted is not None:
+                    chunk = chunk[np.isin(chunk['symbol'], wanted)]
+                    if len(chunk) == 0:
+                        continue
+                yield chunk
+
+    def read(self, start: Optional[str] = None, end: Optional[str] = None,
+             symbols: Optional[Iterable[str]] = None) -> np.ndarray:
+        """
+        读取区间内的全部记录，参数同 replay
+
+        Returns:
+            TICK_DTYPE 结构化数组；区间只在一个交易日内且不过滤股票时为内存映射文件的切片，否则为拷贝
+        """
+        chunks = list(self.replay(start, end, symbols, chunk_size=np.iinfo(np.int64).max))
+        if not chunks:
+            return np.empty(0, dtype=TICK_DTYPE)
+        return chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+
+    @staticmethod
+    def to_frame(ticks: np.ndarray) -> pd.DataFrame:
+        """
+        将记录转换为DataFrame
+
+        Returns:
+            “时间”为datetime64、“代码”为字符串，其余列名与 TICK_MAP 一致的DataFrame
+        """
+        frame = pd.DataFrame({label: np.asarray(ticks[name]) for name, _, label in TICK_COLUMNS[2:]})
+        frame.insert(0, '代码', np.asarray(ticks['symbol']).astype('U8'))
+        frame.insert(0, '时间', pd.to_datetime(np.asarray(ticks['timestamp']), unit='ms'))
+        return frame
+
+# 全局逐笔快照存储实例
+tick_store = TickStore()
@@ -0,0 +1,195 @@
+# -*- coding:utf-8 -*-
+import json
+from datetime import datetime, date, time, timedelta, timezone
+from typing import Optional, Iterable, Union, Dict
+import pandas as pd
+from .config import config
+from .logger import logger
+
+# A股交易时间均为北京时间
+CN_TZ = timezone(timedelta(hours=8))
+
+# 交易日内的时段：(开始时间, 结束时间, 时段名称)，不在其中的时间为 closed
+SESSIONS = [
+    (time(9, 15), time(9, 25), 'call_auction'),      # 开盘集合竞价
+    (time(9, 25), time(9, 30), 'pre_open'),          # 集合竞价撮合完成，等待连续竞价
+    (time(9, 30), time(11, 30), 'continuous'),       # 上午连续竞价
+    (time(11, 30), time(13, 0), 'lunch_break'),      # 午间休市
+    (time(13, 0), time(14, 57), 'continuous'),       # 下午连续竞价
+    (time(14, 57), time(15, 0), 'closing_auction'),  # 收盘集合竞价
+]
+# 行情会发生变化的时段
+TRADING_PHASES = {'call_auction', 'continuous', 'closing_auction'}
+SESSION_OPEN = SESSIONS[0][0]
+SESSION_CLOSE = SESSIONS[-1][1]
+
+def _to_date(value: Union[str, date, datetime]) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return pd.Timestamp(value).date()
+
+class TradingCalendar:
+    """A股交易日历，周末及配置的节假日休市"""
+
+    def __init__(self, holidays: Optional[Iterable[Union[str, date]]] = None):
+        """
+        初始化交易日历
+
+        Args:
+            holidays: 节假日列表，默认读取配置项 TRADING_HOLIDAYS（逗号分隔的 YYYY-MM-DD）
+        """
+        if holidays is None:
+            holidays = [item for item in config.get_calendar_config()['holidays'].split(',') if item.strip()]
+        self.holidays = {_to_date(item.strip() if isinstance(item, str) else item) for item in holidays}
+
+    def now(self) -> datetime:
+        """当前北京时间"""
+        return datetime.now(CN_TZ)
+
+    def localize(self, dt: Optional[datetime]) -> datetime:
+        """转为北京时间，不带时区的时间视为北京时间"""
+        if dt is None:
+            return self.now()
+        if dt.tzinfo is None:
+            return dt.replace(tzinfo=CN_TZ)
+        return dt.astimezone(CN_TZ)
+
+    def is_trading_day(self, day: Union[str, date, datetime]) -> bool:
+        """是否为交易日"""
+        day = _to_date(day)
+        return day.weekday() < 5 and day not in self.holidays
+
+    def next_trading_day(self, day: Union[str, date, datetime]) -> date:
+        """下一个交易日（不含当天）"""
+        day = _to_date(day) + timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day
+
+    def previous_trading_day(self, day: Union[str, date, datetime]) -> date:
+        """上一个交易日（不含当天）"""
+        day = _to_date(day) - timedelta(days=1)
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+        return day
+
+    def phase(self, dt: Optional[datetime] = None) -> str:
+        """
+        获取所处的交易时段
+
+        Returns:
+            call_auction、pre_open、continuous、lunch_break、closing_auction 或 closed
+        """
+        dt = self.localize(dt)
+        if not self.is_trading_day(dt):
+            return 'closed'
+        current = dt.time()
+        for start, end, name in SESSIONS:
+            if start <= current < end:
+                return name
+        return 'closed'
+
+    def is_trading(self, dt: Optional[datetime] = None) -> bool:
+        """行情是否处于变化中（集合竞价或连续竞价）"""
+        return self.phase(dt) in TRADING_PHASES
+
+    def next_phase_change(self, dt: Optional[datetime] = None) -> datetime:
+        """下一次交易时段切换的时间"""
+        dt = self.localize(dt)
+        if self.is_trading_day(dt):
+            for start, end, _ in SESSIONS:
+                for boundary in (start, end):
+                    candidate = datetime.combine(dt.date(), boundary, CN_TZ)
+                    if candidate > dt:
+                        return candidate
+        return self.next_open(dt)
+
+    def next_open(self, dt: Optional[datetime] = None) -> datetime:
+        """下一个交易日开盘（集合竞价开始）的时间"""
+        dt = self.localize(dt)
+        if self.is_trading_day(dt) and dt.time() < SESSION_OPEN:
+            return datetime.combine(dt.date(), SESSION_OPEN, CN_TZ)
+        return datetime.combine(self.next_trading_day(dt), SESSION_OPEN, CN_TZ)
+
+    def last_close(self, dt: Optional[datetime] = None) -> datetime:
+        """最近一次收盘的时间（不晚于dt）"""
+        dt = self.localize(dt)
+        if self.is_trading_day(dt) and dt.time() >= SESSION_CLOSE:
+            return datetime.combine(dt.date(), SESSION_CLOSE, CN_TZ)
+        return datetime.combine(self.previous_trading_day(dt), SESSION_CLOSE, CN_TZ)
+
+# 各接口的默认过期策略：trading 为行情变化时段内的过期时间（秒），
+# 其他时段缓存到下一次时段切换，且不超过 idle_max
+DEFAULT_TTLS = {
+    'realtime': {'trading': 3, 'idle_max': 6 * 3600},
+    'history': {'trading': 60, 'idle_max': 24 * 3600},
+    'indicators': {'trading': 60, 'idle_max': 24 * 3600},
+    'board': {'trading': 10, 'idle_max': 6 * 3600},
+    'snapshot': {'trading': 5, 'idle_max': 6 * 3600},
+    'hot_rank': {'trading': 60, 'idle_max': 6 * 3600},
+}
+
+class TTLPolicy:
+    """根据交易时段计算缓存过期时间"""
+
+    def __init__(self, calendar: Optional[TradingCalendar] = None, overrides: Optional[Dict[str, Dict[str, int]]] = None):
+        """
+        初始化过期策略
+
+        Args:
+            calendar: 交易日历
+            overrides: 按接口覆盖默认策略，例如 {"realtime": {"trading": 5}}，默认读取配置项 CACHE_TTL_OVERRIDES（JSON）
+        """
+        self.calendar = calendar or TradingCalendar()
+        if overrides is None:
+            overrides = self._load_overrides(config.get_cache_config()['ttl_overrides'])
+        self.rules = {name: dict(rule) for name, rule in DEFAULT_TTLS.items()}
+        for name, rule in overrides.items():
+            self.rules.setdefault(name, dict(DEFAULT_TTLS['realtime'])).update(rule)
+
+    @staticmethod
+    def _load_overrides(text: str) -> Dict[str, Dict[str, int]]:
+        if not text:
+            return {}
+        try:
+            return json.loads(text)
+        except ValueError as e:
+            logger.warning(f"CACHE_TTL_OVERRIDES 格式无效，已忽略: {e}")
+            return {}
+
+    def _seconds_until(self, target: datetime, now: datetime) -> int:
+        return max(1, int((target - now).total_seconds()))
+
+    def ttl(self, endpoint: str, end: Optional[Union[str, datetime]] = None, now: Optional[datetime] = None) -> int:
+        """
+        计算缓存过期时间
+
+        Args:
+            endpoint: 接口名称，如 realtime、history、indicators
+            end: 数据区间的结束时间；不晚于最近一次收盘时数据不再变化，缓存到下一个交易日开盘
+            now: 当前时间，默认为当前北京时间
+
+        Returns:
+            int: 过期时间（秒）
+        """
+        rule = self.rules.get(endpoint, self.rules['realtime'])
+        now = self.calendar.localize(now)
+        idle_max = rule['idle_max']
+
+        if end is not None:
+            end_dt = pd.Timestamp(end).to_pydatetime()
+            if isinstance(end, str) and len(end.strip()) <= 10:
+                # 只给出日期时，当天的K线在收盘后才不再变化
+                end_dt = datetime.combine(end_dt.date(), SESSION_CLOSE)
+            if self.calendar.localize(end_dt) <= self.calendar.last_close(now):
+                return min(self._seconds_until(self.calendar.next_open(now), now), idle_max)
+
+        if self.calendar.is_trading(now):
+            return rule['trading']
+        return min(self._seconds_until(self.calendar.next_phase_change(now), now), idle_max)
+
+# 全局交易日历和过期策略实例
+trading_calendar = TradingCalendar()
+ttl_policy = TTLPolicy(trading_calendar)
@@ -0,0 +1,198 @@
+import pytest
+import json
+import asyncio
+from unittest.mock import patch, AsyncMock
+
+pytest.importorskip("aiohttp")
+
+# 测试异步传输层
+class TestAsyncTransport:
+    def test_semaphore_bounds_concurrency(self):
+        """测试并发请求数受信号量限制"""
+        from aiohttp import web
+        from nebula.aio.transport import AsyncTransport
+
+        state = {"in_flight": 0, "peak": 0}
+
+        async def handler(request):
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+            await asyncio.sleep(0.02)
+            state["in_flight"] -= 1
+            return web.json_response({"data": {"ok": True}})
+
+        async def main():
+            app = web.Application()
+            app.router.add_get("/api", handler)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            try:
+                async with AsyncTransport(max_concurrency=4) as transport:
+                    results = await asyncio.gather(*[
+                        transport.get_json(f"http://127.0.0.1:{port}/api") for _ in range(20)
+                    ])
+            finally:
+                await runner.cleanup()
+            return results
+
+        results = asyncio.run(main())
+        assert len(results) == 20
+        assert all(item == {"data": {"ok": True}} for item in results)
+        assert state["peak"] <= 4
+
+    def test_session_replaced_on_new_loop(self):
+        """测试事件循环变化时替换旧Session：原循环仍在运行时在原循环上关闭，已停止时分离并告警"""
+        import threading
+        from nebula.aio.transport import AsyncTransport
+
+        transport = AsyncTransport()
+
+        async def session():
+            return transport._ensure_session()
+
+        async def use_and_close():
+            used = transport._ensure_session()
+            await transport.close()
+            return used
+
+        # 切换事件循环前先关闭
+        first = asyncio.run(use_and_close())
+        assert first.closed and transport._session is None
+
+        # 原事件循环仍在其他线程中运行
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        try:
+            first = asyncio.run_coroutine_threadsafe(session(), loop).result(5)
+            second = asyncio.run(session())
+            asyncio.run_coroutine_threadsafe(asyncio.sleep(0.05), loop).result(5)
+            assert second is not first
+            assert first.closed and not second.closed
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(5)
+            loop.close()
+
+        # 原事件循环已停止：分离旧Session并提示调用方先 close()
+        with patch('nebula.aio.transport.logger') as mock_logger:
+            third = asyncio.run(session())
+            mock_logger.warning.assert_called_once()
+        assert third is not second and second.closed
+        asyncio.run(transport.close())
+
+# 测试异步行情接口
+class TestAsyncRealtimeQuote:
+    def test_get_stock_realtime_quote(self):
+        """测试异步获取实时行情与同步版本解析一致"""
+        from nebula.aio import get_stock_realtime_quote
+
+        payload = {"data": {"f43": 5.5, "f19": 5.6, "f20": 10, "f39": 5.4, "f40": 10}}
+        with patch('nebula.aio.realtime_quote.async_transport.get_json',
+                   new=AsyncMock(return_value=payload)):
+            result = asyncio.run(get_stock_realtime_quote("600028", use_cache=False, save_to_db=False))
+
+        data = {item["item"]: item["value"] for item in json.loads(result)}
+        assert data["最新"] == 5.5
+        assert data["买一量"] == 1000
+
+    def test_get_stock_realtime_quotes_concurrent_batches(self):
+        """测试异步批量行情按批次并发请求"""
+        from nebula.aio import get_stock_realtime_quotes
+
+        async def fake_get_json(url, params=None, timeout=None):
+            diff = [{"f12": secid.split(".")[1], "f14": "", "f2": 1.0}
+                    for secid in params["secids"].split(",")]
+            return {"data": {"diff": diff}}
+
+        symbols = [f"6000{i:02d}" for i in range(10)]
+        with patch('nebula.aio.realtime_quote.async_transport.get_json',
+                   new=AsyncMock(side_effect=fake_get_json)) as mock_get:
+            result = asyncio.run(get_stock_realtime_quotes(symbols, batch_size=3,
+                                                           use_cache=False, save_to_db=False))
+
+        assert mock_get.await_count == 4
+        assert json.loads(result)["代码"] == symbols
+
+    def test_deadline_covers_concurrent_batches(self):
+        """测试截止时间由各批次共用，超时后返回错误而不是等待全部请求"""
+        import time
+        from nebula.aio import get_stock_realtime_quotes
+
+        async def slow_get_json(url, params=None, timeout=None):
+            await asyncio.sleep(5)
+
+        start = time.monotonic()
+        with patch('nebula.aio.realtime_quote.async_transport.get_json',
+                   new=AsyncMock(side_effect=slow_get_json)):
+            result = asyncio.run(get_stock_realtime_quotes(["600000", "600001"], batch_size=1, use_cache=False,
+                                                           save_to_db=False, deadline=0.1))
+
+        assert time.monotonic() - start < 2
+        assert "超过截止时间" in json.loads(result)["error"]
+
+    def test_deadline_raises_for_frame(self):
+        """测试返回DataFrame的异步接口超时抛出 DeadlineExceeded，请求自身的超时不被转换"""
+        from nebula.aio.history_quote import get_stock_history_frame
+        from nebula.aio.transport import deadline_timeout
+        from nebula.utils.retry import DeadlineExceeded
+
+        async def slow_get_json(url, params=None, timeout=None):
+            await asyncio.sleep(5)
+
+        with patch('nebula.aio.history_quote.async_transport.get_json',
+                   new=AsyncMock(side_effect=slow_get_json)):
+            with pytest.raises(DeadlineExceeded):
+                asyncio.run(get_stock_history_frame("600000", period="daily", use_cache=False,
+                                                    save_to_db=False, deadline=0.1))
+
+        async def own_timeout():
+            async with deadline_timeout(5):
+                raise asyncio.TimeoutError()
+
+        with pytest.raises(TimeoutError) as exc_info:
+            asyncio.run(own_timeout())
+        assert not isinstance(exc_info.value, DeadlineExceeded)
+
+# 测试异步缓存
+class TestAsyncCache:
+    def test_local_fallback(self):
+        """测试Redis不可用时使用内存缓存"""
+        from nebula.aio.cache import AsyncCacheManager
+
+        async def main():
+            cache = AsyncCacheManager(url="redis://127.0.0.1:1/0")
+            assert await cache.set("key", {"a": 1}) is True
+            assert await cache.get("key") == {"a": 1}
+            assert await cache.exists("key") is True
+            assert await cache.delete("key") is True
+            assert await cache.get("key") is None
+            assert await cache.set_many({"a": 1, "b": 2}) is True
+            assert await cache.get_many(["a", "b", "c"]) == {"a": 1, "b": 2}
+            assert await cache.delete_many(["a", "c"]) == 1
+
+        asyncio.run(main())
+
+    def test_concurrent_first_calls_connect_once(self):
+        """测试同一事件循环上并发的首次调用只创建一个Redis客户端"""
+        from nebula.aio.cache import AsyncCacheManager
+
+        async def slow_ping():
+            await asyncio.sleep(0.01)
+            return True
+
+        async def main():
+            cache = AsyncCacheManager(host="127.0.0.1", url="redis://localhost:6379/0")
+            with patch("nebula.aio.cache.aioredis.Redis") as redis_cls:
+                redis_cls.return_value.ping = slow_ping
+                clients = await asyncio.gather(*[cache._get_client() for _ in range(5)])
+            assert redis_cls.call_count == 1
+            assert all(client is clients[0] for client in clients)
+
+        asyncio.run(main())
+
+if __name__ == '__main__':
+    pytest.main([__file__, "-v"])
@@ -43,6 +43,787 @@ class TestRealtimeQuote:
             # 验证返回错误信息
             assert '"error"' in result
 
+    def test_get_stock_realtime_quote_coalesced(self):
+        """测试缓存未命中时并发请求同一股票只访问一次上游接口"""
+        import threading
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from nebula.core import realtime_quote
+
+        calls = []
+        started = threading.Event()
+
+        def slow_request(url, params=None, timeout=None):
+            calls.append(params["secid"])
+            started.set()
+            time.sleep(0.2)
+            mock_response = Mock()
+            mock_response.json.return_value = {"data": {"f43": 10.5, "f57": "600016", "f58": "民生银行"}}
+            return mock_response
+
+        realtime_quote.cache_manager.delete("realtime_quote_600016")
+        with patch('nebula.core.realtime_quote.make_request', side_effect=slow_request), \
+                patch.object(realtime_quote.single_flight, "_redis_client", False):
+            with ThreadPoolExecutor(max_workers=5) as pool:
+                first = pool.submit(realtime_quote.get_stock_realtime_quote, "600016", True, False)
+                started.wait()
+                others = [pool.submit(realtime_quote.get_stock_realtime_quote, "600016", True, False)
+                          for _ in range(4)]
+                results = [first.result()] + [f.result() for f in others]
+
+        assert calls == ["1.600016"]
+        assert len(set(results)) == 1
+        realtime_quote.cache_manager.delete("realtime_quote_600016")
+
+    def test_get_stock_realtime_quotes_batch(self):
+        """测试批量获取实时行情（自动分批并按列返回）"""
+        from nebula.core.realtime_quote import get_stock_realtime_quotes, TICK_MAP
+
+        def fake_request(url, params=None, timeout=None):
+            mock_response = Mock()
+            diff = []
+            for secid in params["secids"].split(","):
+                code = secid.split(".")[1]
+                diff.append({"f12": code, "f13": int(secid[0]), "f14": f"股票{code}",
+                             "f2": 10.5, "f3": 1.2, "f5": 1000, "f6": 1050000.0, "f31": 10.49})
+            mock_response.json.return_value = {"data": {"total": len(diff), "diff": diff}}
+            return mock_response
+
+        symbols = ["600900", "000001", "600028", "000002", "600900"]
+        with patch('nebula.core.realtime_quote.make_request', side_effect=fake_request) as mock_request:
+            result = get_stock_realtime_quotes(symbols, batch_size=2, use_cache=False, save_to_db=False)
+
+        # 去重后4只股票，每批2只，共2次请求
+        assert mock_request.call_count == 2
+        data = json.loads(result)
+        assert data["代码"] == ["600900", "000001", "600028", "000002"]
+        assert set(TICK_MAP).issubset(data)
+        assert data["最新"] == [10.5] * 4
+        assert data["买一价"] == [10.49] * 4
+        assert data["卖五价"] == [None] * 4
+        assert data["均价"][0] == 10.5
+
+    def test_realtime_quotes_recorded_as_ticks(self, tmp_path):
+        """测试开启逐笔快照记录后，新请求到的批量行情追加到逐笔快照存储"""
+        from nebula.core import realtime_quote
+        from nebula.utils.config import Config
+        from nebula.utils.tick_store import TickStore
+
+        def fake_request(url, params=None, timeout=None):
+            mock_response = Mock()
+            diff = [{"f12": secid.split(".")[1], "f14": "股票", "f2": 10.5, "f5": 1000, "f31": 10.49}
+                    for secid in params["secids"].split(",")]
+            mock_response.json.return_value = {"data": {"total": len(diff), "diff": diff}}
+            return mock_response
+
+        store = TickStore(str(tmp_path))
+        with patch('nebula.core.realtime_quote.make_request', side_effect=fake_request), \
+                patch.object(realtime_quote, 'tick_store', store), \
+                patch.object(Config, 'TICK_RECORD_ENABLED', True):
+            realtime_quote.get_stock_realtime_quotes(["600900", "000001"], use_cache=False, save_to_db=False)
+
+        ticks = store.read()
+        assert ticks["symbol"].tolist() == [b"600900", b"000001"]
+        assert ticks["last"].tolist() == [10.5, 10.5] and ticks["bid1_price"].tolist() == [10.49, 10.49]
+
+    def test_get_stock_realtime_quotes_partial_cache(self):
+        """测试批量行情按股票缓存，只请求缓存中缺失的股票"""
+        from nebula.core import realtime_quote
+
+        requested = []
+
+        def fake_request(url, params=None, timeout=None):
+            requested.append(params["secids"])
+            mock_response = Mock()
+            diff = [{"f12": secid.split(".")[1], "f14": "股票", "f2": 10.5}
+                    for secid in params["secids"].split(",")]
+            mock_response.json.return_value = {"data": {"total": len(diff), "diff": diff}}
+            return mock_response
+
+        realtime_quote.cache_manager.delete_many(
+            [realtime_quote._quote_cache_key(symbol) for symbol in ("600900", "000001", "600028")]
+        )
+        with patch('nebula.core.realtime_quote.make_request', side_effect=fake_request):
+            realtime_quote.get_stock_realtime_quotes(["600900", "000001"], save_to_db=False)
+            result = realtime_quote.get_stock_realtime_quotes(["600028", "000001", "600900"], save_to_db=False)
+            cached = realtime_quote.get_stock_realtime_quotes(["000001", "600900"], save_to_db=False)
+
+        assert requested == ["1.600900,0.000001", "1.600028"]
+        assert json.loads(result)["代码"] == ["600028", "000001", "600900"]
+        assert json.loads(cached)["代码"] == ["000001", "600900"]
+        assert json.loads(cached)["最新"] == [10.5, 10.5]
+
+# 测试历史行情模块
+class TestHistoryQuote:
+    def test_get_stock_history_quote_daily(self):
+        """测试解析日线数据"""
+        from nebula.core.history_quote import get_stock_history_quote
+
+        mock_response = Mock()
+        mock_response.json.return_value = {
+            "data": {
+                "klines": [
+                    "2023-07-03,22.10,22.30,22.50,22.00,100000,223000000.0,2.26,0.90,0.20,0.04",
+                    "2023-07-04,22.30,22.20,22.40,22.10,90000,200000000.0,1.35,-0.45,-0.10,0.04",
+                ]
+            }
+        }
+        with patch('nebula.core.history_quote.http_transport.get', return_value=mock_response):
+            result = get_stock_history_quote("600900", period="daily", start_date="2023-07-01",
+                                             end_date="2023-07-10", use_cache=False, save_to_db=False)
+
+        data = json.loads(result)
+        assert [row["时间"] for row in data] == ["2023-07-03", "2023-07-04"]
+        assert data[0]["收盘"] == 22.30
+        assert data[1]["成交量"] == 90000
+
+    def test_parse_rows_matches_legacy(self):
+        """测试快速解析与逐行解析结果一致，包括分时数据和含缺失值的行"""
+        import pandas as pd
+        from nebula.core.kline_parser import KLINE_DAILY, TRENDS, parse_rows, parse_rows_legacy
+
+        trends = ["2025-07-09 09:30,22.10,22.11,22.12,22.09,1200,2653200.0,22.110",
+                  "2025-07-09 09:31,22.11,22.15,22.16,22.10,800,1772000.0,22.125"]
+        fast = parse_rows(trends, TRENDS)
+        pd.testing.assert_frame_equal(fast, parse_rows_legacy(trends, TRENDS["columns"]))
+        assert fast["时间"].tolist() == ["2025-07-09 09:30:00", "2025-07-09 09:31:00"]
+        assert fast["成交量"].dtype == "int64" and fast["均价"].dtype == "float64"
+
+        # 停牌等情况下接口返回 '-'，整数列无法按固定类型解析时退回逐行解析
+        klines = ["2023-07-03,22.10,22.30,22.50,22.00,100000,223000000.0,2.26,0.90,0.20,0.04",
+                  "2023-07-04,22.30,22.20,22.40,22.10,-,-,1.35,-0.45,-0.10,-"]
+        fast = parse_rows(klines, KLINE_DAILY)
+        pd.testing.assert_frame_equal(fast, parse_rows_legacy(klines, KLINE_DAILY["columns"]))
+        assert pd.isna(fast.loc[1, "成交量"]) and fast.loc[1, "收盘"] == 22.20
+
+    def test_get_stock_history_quote_range_cache(self):
+        """测试区间缓存：覆盖区间内的请求直接截取，只请求未覆盖的缺口"""
+        import pandas as pd
+        from nebula.core import history_quote
+
+        days = pd.bdate_range("2023-01-02", "2023-03-31").strftime("%Y-%m-%d")
+        requested = []
+
+        def fake_get(url, params=None, timeout=None):
+            requested.append((params["beg"], params["end"]))
+            beg = pd.to_datetime(params["beg"]).strftime("%Y-%m-%d")
+            end = pd.to_datetime(params["end"]).strftime("%Y-%m-%d")
+            klines = [f"{day},10,{10 + i / 100:.2f},11,9,1000,10000,1,1,0.1,0.5"
+                      for i, day in enumerate(days) if beg <= day <= end]
+            mock_response = Mock()
+            mock_response.json.return_value = {"data": {"klines": klines}}
+            return mock_response
+
+        history_quote.cache_manager.delete(history_quote._range_cache_key("600901", "daily", ""))
+        with patch('nebula.core.history_quote.http_transport.get', side_effect=fake_get):
+            first = history_quote.get_stock_history_quote("600901", "daily", "2023-01-01", "2023-01-31", save_to_db=False)
+            inside = history_quote.get_stock_history_quote("600901", "daily", "2023-01-10", "2023-01-20", save_to_db=False)
+            shifted = history_quote.get_stock_history_quote("600901", "daily", "2023-01-15", "2023-02-15", save_to_db=False)
+
+        assert requested == [("20230101", "20230131"), ("20230131", "20230215")]
+        assert [row["时间"] for row in json.loads(inside)] == [d for d in days if "2023-01-10" <= d <= "2023-01-20"]
+        shifted = json.loads(shifted)
+        assert [row["时间"] for row in shifted] == [d for d in days if "2023-01-15" <= d <= "2023-02-15"]
+        # 与缓存重叠部分的数据与首次请求一致
+        overlap = [row for row in json.loads(first) if row["时间"] >= "2023-01-15"]
+        assert shifted[:len(overlap)] == overlap
+        entry = history_quote.cache_manager.get(history_quote._range_cache_key("600901", "daily", ""))
+        assert (entry["start"], entry["end"]) == ("2023-01-01", "2023-02-15")
+        history_quote.cache_manager.delete(history_quote._range_cache_key("600901", "daily", ""))
+
+    def test_get_stock_history_quote_columnar_storage(self, tmp_path):
+        """测试历史行情保存到列式存储"""
+        from nebula.core.history_quote import get_stock_history_quote
+        from nebula.utils.column_store import ColumnStore
+
+        store = ColumnStore(str(tmp_path))
+        mock_response = Mock()
+        mock_response.json.return_value = {"data": {"klines": [
+            "2023-07-03,22.10,22.30,22.50,22.00,100000,223000000.0,2.26,0.90,0.20,0.04"
+        ]}}
+        with patch('nebula.core.history_quote.column_store', store), \
+             patch('nebula.core.history_quote.http_transport.get', return_value=mock_response):
+            get_stock_history_quote("600900", period="daily", start_date="2023-07-01", end_date="2023-07-10",
+                                    use_cache=False, storage="columnar")
+
+        assert store.read_range("600900")["close"].tolist() == [22.30]
+
+    def test_get_stock_history_quote_sync(self, tmp_path):
+        """测试增量同步只请求缺失的K线并从数据库返回完整区间"""
+        from nebula.core.history_quote import get_stock_history_quote
+        from nebula.utils.database import DatabaseManager
+
+        db = DatabaseManager(str(tmp_path / "sync.db"))
+        bars = [
+            "2023-07-03,22.10,22.30,22.50,22.00,100000,223000000.0,2.26,0.90,0.20,0.04",
+            "2023-07-04,22.30,22.20,22.40,22.10,90000,200000000.0,1.35,-0.45,-0.10,0.04",
+            "2023-07-05,22.20,22.60,22.70,22.10,95000,210000000.0,2.70,1.80,0.40,0.04",
+        ]
+        requested = []
+
+        def fake_get(url, params=None, timeout=None):
+            requested.append(params["beg"])
+            begin = f"{params['beg'][:4]}-{params['beg'][4:6]}-{params['beg'][6:]}"
+            mock_response = Mock()
+            mock_response.json.return_value = {"data": {"klines": [b for b in available if b[:10] >= begin]}}
+            return mock_response
+
+        with patch('nebula.core.history_quote.db_manager', db), \
+             patch('nebula.core.history_quote.http_transport.get', side_effect=fake_get):
+            available = bars[:2]
+            get_stock_history_quote("600900", period="daily", start_date="2023-07-01",
+                                    end_date="2023-07-10", use_cache=False, sync=True)
+            available = bars
+            result = get_stock_history_quote("600900", period="daily", start_date="2023-07-01",
+                                             end_date="2023-07-10", use_cache=False, sync=True)
+
+        # 第二次只从最新一根K线开始请求
+        assert requested == ["20230701", "20230704"]
+        data = json.loads(result)
+        assert [row["时间"] for row in data] == ["2023-07-03", "2023-07-04", "2023-07-05"]
+        assert list(data[0].keys())[:3] == ["时间", "开盘", "收盘"]
+        assert db.get_latest_timestamp("600900", "daily") == "2023-07-05"
+        assert db.get_latest_timestamp("600900", "weekly") is None
+
+        # 请求区间早于已保存的最早K线时补齐开头缺少的部分
+        earlier = "2023-06-30,22.00,22.10,22.20,21.90,80000,176000000.0,1.36,0.45,0.10,0.04"
+        requested.clear()
+        with patch('nebula.core.history_quote.db_manager', db), \
+             patch('nebula.core.history_quote.http_transport.get', side_effect=fake_get):
+            available = [earlier] + bars
+            result = get_stock_history_quote("600900", period="daily", start_date="2023-06-01",
+                                             end_date="2023-07-10", use_cache=False, sync=True)
+        assert requested == ["20230601", "20230705"]
+        assert [row["时间"] for row in json.loads(result)] == ["2023-06-30", "2023-07-03", "2023-07-04",
+                                                                "2023-07-05"]
+        assert db.get_earliest_timestamp("600900", "daily") == "2023-06-30"
+
+        # 开始日期早于上市日期时，开头缺少的部分只请求一次
+        requested.clear()
+        with patch('nebula.core.history_quote.db_manager', db), \
+             patch('nebula.core.history_quote.http_transport.get', side_effect=fake_get):
+            for _ in range(2):
+                get_stock_history_quote("600900", period="daily", start_date="2023-01-03",
+                                        end_date="2023-07-10", use_cache=False, sync=True)
+        assert requested == ["20230103", "20230705", "20230705"]
+        assert db.get_sync_head("600900", "daily") == "2023-01-03"
+
+class TestBackfill:
+    def test_backfill_resumes_from_checkpoints(self, tmp_path):
+        """测试并发回填写入数据库并记录进度，重新运行时只请求未完成的项"""
+        import pandas as pd
+        from nebula.core.backfill import BackfillEngine
+        from nebula.utils.database import DatabaseManager
+
+        db = DatabaseManager(str(tmp_path / "backfill.db"))
+        failing = {"000002"}
+        calls = []
+
+        def fake_fetch(symbol, period, start_date, end_date, adjust, timeout):
+            calls.append((symbol, period))
+            if symbol in failing:
+                raise ConnectionError("连接中断")
+            return pd.DataFrame({"时间": ["2023-07-03", "2023-07-04"], "开盘": [1.0, 1.1], "收盘": [1.1, 1.2],
+                                 "最高": [1.2, 1.3], "最低": [0.9, 1.0], "成交量": [100, 200],
+                                 "成交额": [1e4, 2e4]})
+
+        symbols = ["600000", "000001", "000002"]
+        progress = []
+        with patch('nebula.core.backfill._fetch_history', side_effect=fake_fetch):
+            engine = BackfillEngine(symbols, ["daily"], "2023-07-01", "2023-07-10", workers=2, db=db,
+                                    storage="sqlite", on_progress=progress.append)
+            first = engine.run()
+            failing.clear()
+            calls.clear()
+            second = engine.run()
+
+        assert (first["done"], first["failed"], first["rows"]) == (2, 1, 4)
+        assert [item["done"] + item["failed"] for item in progress[:3]] == [1, 2, 3]
+        # 第二次只重新请求失败的一项
+        assert calls == [("000002", "daily")]
+        assert (second["skipped"], second["done"], second["failed"]) == (2, 1, 0)
+        assert engine.pending() == []
+        assert len(db.get_history_data("000002", "2023-07-01", "2023-07-10")) == 2
+
+    def test_backfill_save_failure_and_interrupt(self, tmp_path):
+        """测试写入失败的项记为失败并在下次重新请求，中断时不再执行排队中的请求"""
+        import sqlite3
+        import pandas as pd
+        from nebula.core.backfill import BackfillEngine
+        from nebula.utils.database import DatabaseManager
+
+        db = DatabaseManager(str(tmp_path / "backfill.db"))
+        frame = pd.DataFrame({"时间": ["2023-07-03"], "开盘": [1.0], "收盘": [1.1], "最高": [1.2], "最低": [0.9],
+                              "成交量": [100], "成交额": [1e4]})
+        calls = []
+
+        def fake_fetch(symbol, period, start_date, end_date, adjust, timeout):
+            calls.append(symbol)
+            return frame
+
+        save = db.save_history_frame
+
+        def locked_save(symbol, data, period, adjust, **kwargs):
+            if symbol == "000001":
+                raise sqlite3.OperationalError("database is locked")
+            return save(symbol, data, period, adjust, **kwargs)
+
+        with patch('nebula.core.backfill._fetch_history', side_effect=fake_fetch):
+            engine = BackfillEngine(["600000", "000001"], ["daily"], workers=2, db=db, storage="sqlite")
+            with patch.object(db, 'save_history_frame', side_effect=locked_save):
+                result = engine.run()
+            assert (result["done"], result["failed"]) == (1, 1)
+            assert engine.pending() == [("000001", "daily")]
+
+            def interrupt(progress):
+                raise KeyboardInterrupt
+            calls.clear()
+            symbols = [f"{600100 + i}" for i in range(20)]
+            engine = BackfillEngine(symbols, ["daily"], workers=1, db=db, storage="sqlite", on_progress=interrupt)
+            with pytest.raises(KeyboardInterrupt):
+                engine.run()
+        # 同时在途的请求不超过线程数的2倍，其余请求被取消
+        assert len(calls) <= 2
+        assert len(engine.pending()) >= 19
+
+class TestMarketSnapshot:
+    def test_get_market_snapshot_paged(self):
+        """测试全市场快照分页并发获取、按列返回并整体缓存"""
+        from nebula.core import market_snapshot
+
+        codes = [f"{600000 + i}" for i in range(7)]
+
+        def fake_get(url, params=None, timeout=None):
+            page, size = int(params["pn"]), int(params["pz"])
+            diff = [{"f12": code, "f14": f"股票{code}", "f2": 10.0, "f3": 1.5, "f4": 0.15, "f5": 1000,
+                     "f6": 1000000.0, "f8": 0.5, "f20": 1e10, "f21": 8e9, "f9": "-", "f23": 1.2}
+                    for code in codes[(page - 1) * size:page * size]]
+            mock_response = Mock()
+            mock_response.json.return_value = {"data": {"total": len(codes), "diff": diff}}
+            return mock_response
+
+        market_snapshot.cache_manager.delete(market_snapshot.SNAPSHOT_CACHE_KEY)
+        with patch('nebula.core.market_snapshot.http_transport.get', side_effect=fake_get) as mock_get:
+            result = market_snapshot.get_market_snapshot(save_to_db=False, page_size=3)
+            cached = market_snapshot.get_market_snapshot(save_to_db=False, page_size=3)
+            frame = market_snapshot.get_market_snapshot_frame(save_to_db=False)
+        market_snapshot.cache_manager.delete(market_snapshot.SNAPSHOT_CACHE_KEY)
+
+        # 7只股票每页3只，共3页；之后的调用都命中整体缓存
+        assert mock_get.call_count == 3
+        assert "\n" not in result and result == cached
+        data = json.loads(result)
+        assert data["代码"] == codes
+        assert data["最新价"] == [10.0] * 7 and data["市盈率-动态"] == [None] * 7
+        assert frame["总市值"].dtype == "float64" and frame["市盈率-动态"].isna().all()
+
+    def test_get_market_snapshot_capped_page_size(self):
+        """测试服务端限制每页条数时按第一页实际返回的条数分页，不漏掉股票"""
+        from nebula.core import market_snapshot
+
+        codes = [f"{600000 + i}" for i in range(7)]
+
+        def capped_get(url, params=None, timeout=None):
+            page, size = int(params["pn"]), min(int(params["pz"]), 2)
+            diff = [{"f12": code, "f14": f"股票{code}", "f2": 10.0} for code in codes[(page - 1) * size:page * size]]
+            mock_response = Mock()
+            mock_response.json.return_value = {"data": {"total": len(codes), "diff": diff}}
+            return mock_response
+
+        with patch('nebula.core.market_snapshot.http_transport.get', side_effect=capped_get) as mock_get:
+            frame = market_snapshot.get_market_snapshot_frame(use_cache=False, save_to_db=False, page_size=5)
+        assert mock_get.call_count == 4
+        assert frame["代码"].tolist() == codes
+
+class TestScreener:
+    @staticmethod
+    def make_frame(rows=5000):
+        import numpy as np
+        import pandas as pd
+        rng = np.random.default_rng(1)
+        price = rng.uniform(2, 200, rows)
+        frame = pd.DataFrame({
+            "代码": [f"{i:06d}" for i in range(rows)],
+            "最新价": price,
+            "涨跌幅": rng.normal(0, 3, rows),
+            "换手率": rng.uniform(0, 20, rows),
+            "成交额": rng.uniform(1e6, 1e10, rows),
+            "EMA20": price * rng.uniform(0.9, 1.1, rows),
+        })
+        frame.loc[::50, "涨跌幅"] = np.nan
+        return frame
+
+    def test_screen_matches_pandas(self):
+        """测试筛选和排序结果与逐条pandas表达式一致，NaN不入选"""
+        from nebula.screener import Screener
+
+        frame = self.make_frame()
+        screener = Screener(frame)
+        result = screener.screen(["涨跌幅 > 2", "换手率 between 1 and 10", ("最新价", ">", "EMA20")],
+                                 rank_by="成交额", top=20)
+
+        expected = frame[(frame["涨跌幅"] > 2) & frame["换手率"].between(1, 10) & (frame["最新价"] > frame["EMA20"])]
+        expected = expected.sort_values("成交额", ascending=False).head(20).reset_index(drop=True)
+        assert result["代码"].tolist() == expected["代码"].tolist()
+
+        # 重复筛选复用排序索引，边界条件与pandas一致
+        assert len(screener.screen(["涨跌幅 <= 0"])) == int((frame["涨跌幅"] <= 0).sum())
+        assert len(screener.screen([("涨跌幅", "!=", 0)])) == int(frame["涨跌幅"].notna().sum())
+        assert screener.screen([("代码", "in", ["000003", "000001"])])["代码"].tolist() == ["000001", "000003"]
+        assert screener.screen(rank_by="最新价", top=3, ascending=True)["最新价"].is_monotonic_increasing
+
+    def test_screen_from_snapshot(self):
+        """测试从全市场快照和已保存的指标列创建选股器"""
+        import pandas as pd
+        from nebula import screener
+
+        snapshot = pd.DataFrame({"代码": ["600900", "000001"], "最新价": [28.0, 11.0], "涨跌幅": [6.0, 1.0]})
+        indicators = pd.DataFrame({"代码": ["600900"], "EMA20": [27.5]})
+        with patch('nebula.screener.get_market_snapshot_frame', return_value=snapshot), \
+                patch('nebula.screener.load_indicator_frame', return_value=indicators):
+            result = screener.screen(["涨跌幅 > 5", "最新价 > EMA20"])
+            missing = screener.screen(["最新价 > EMA20"])
+
+        assert result["代码"].tolist() == ["600900"]
+        # 没有指标状态的股票不满足指标条件
+        assert missing["代码"].tolist() == ["600900"]
+
+        with pytest.raises(ValueError):
+            screener.parse_condition("涨跌幅 ~ 5")
+
+# 测试批量指标计算
+class TestBatchIndicators:
+    def _random_history(self, seed, bars):
+        import numpy as np
+        import pandas as pd
+        rng = np.random.default_rng(seed)
+        close = 20 + np.cumsum(rng.normal(0, 0.3, bars))
+        return pd.DataFrame({
+            "时间": pd.date_range("2023-01-02", periods=bars, freq="B").strftime("%Y-%m-%d"),
+            "开盘": close, "收盘": close,
+            "最高": close + rng.uniform(0, 0.5, bars),
+            "最低": close - rng.uniform(0, 0.5, bars),
+            "成交量": rng.integers(1000, 10000, bars),
+        })
+
+    def test_parity_with_ta(self):
+        """测试批量计算结果与基于ta的单只股票计算一致"""
+        import numpy as np
+        from nebula.core.indicators import calculate_indicators, interpret_indicators
+        from nebula.core.batch_indicators import (
+            stack_history, calculate_indicators_batch, interpret_indicators_batch
+        )
+
+        # 包含历史不足50根的股票，验证左侧补齐的处理
+        frames = {f"60000{i}": self._random_history(i, bars) for i, bars in enumerate([80, 50, 45, 60])}
+        symbols, close, high, low = stack_history(frames)
+        batch = calculate_indicators_batch(close, high, low)
+
+        for row, symbol in enumerate(symbols):
+            expected = calculate_indicators(frames[symbol].to_dict(orient="records"))
+            width = len(expected)
+            for name, values in batch.items():
+                np.testing.assert_allclose(values[row, -width:], expected[name].to_numpy(dtype=float),
+                                           rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=f"{symbol} {name}")
+
+        signals = interpret_indicators_batch(symbols, close, batch)
+        expected = interpret_indicators(calculate_indicators(frames["600000"].to_dict(orient="records")))
+        assert signals["600000"] == [item for item in expected if item["指标名称"] not in ("支撑位", "阻力位")]
+
+        signals = interpret_indicators_batch(symbols, close, batch, high, low)
+        for symbol in symbols:
+            expected = interpret_indicators(calculate_indicators(frames[symbol].to_dict(orient="records")))
+            assert signals[symbol] == expected
+
+    def test_support_resistance_matches_loop(self):
+        """测试向量化支撑位和阻力位与逐根K线比较的结果一致"""
+        import numpy as np
+        from nebula.core.indicators import find_support_resistance
+        from nebula.core.batch_indicators import centered_extrema
+
+        df = self._random_history(11, 300).rename(columns={"最高": "high", "最低": "low", "收盘": "close"})
+        # 价格取一位小数，制造相等的极值
+        df[["high", "low", "close"]] = df[["high", "low", "close"]].round(1)
+        for window in (2, 5, 8):
+            supports, resistances = [], []
+            for i in range(window, len(df) - window):
+                if df["low"].iloc[i] == min(df["low"].iloc[i - window:i + window + 1]):
+                    supports.append(df["low"].iloc[i])
+                if df["high"].iloc[i] == max(df["high"].iloc[i - window:i + window + 1]):
+                    resistances.append(df["high"].iloc[i])
+            current = df["close"].iloc[-1]
+            expected = (sorted([s for s in supports if s < current], reverse=True)[:3],
+                        sorted([r for r in resistances if r > current])[:3])
+            assert find_support_resistance(df, window) == expected
+
+        lowest = centered_extrema(df["low"].to_numpy(), [1, 4, 7], np.minimum)
+        for window, values in lowest.items():
+            naive = df["low"].rolling(2 * window + 1, center=True).min().to_numpy()
+            np.testing.assert_array_equal(values, naive)
+
+    def test_cluster_levels(self):
+        """测试相近价位的合并"""
+        import numpy as np
+        from nebula.core.batch_indicators import cluster_levels, support_resistance
+
+        levels, counts = cluster_levels(np.array([10.0, 10.02, 12.0, np.nan, 9.99, 12.1]), tolerance=0.005)
+        np.testing.assert_allclose(levels, [10.003333333333334, 12.0, 12.1])
+        assert counts.tolist() == [3, 1, 1]
+
+        low = np.array([[5, 3, 5, 5, 3.01, 5, 5, 4, 5, 5, 6]], dtype=float)
+        high = low + 1
+        close = np.full_like(low, 4.5)
+        supports, resistances = support_resistance(high, low, close, window=1, tolerance=0.01)
+        np.testing.assert_allclose(supports[0], [4.0, 3.005, np.nan])
+        np.testing.assert_allclose(resistances[0], [6.0, np.nan, np.nan])
+
+class TestStreamingIndicators:
+    def test_parity_with_batch(self):
+        """测试逐根更新的流式指标与批量计算结果一致"""
+        import numpy as np
+        from nebula.core.batch_indicators import calculate_indicators_batch
+        from nebula.core.streaming_indicators import IndicatorState
+
+        history = TestBatchIndicators()._random_history(7, 120)
+        close = history["收盘"].to_numpy()[None, :]
+        high = history["最高"].to_numpy()[None, :]
+        low = history["最低"].to_numpy()[None, :]
+        batch = calculate_indicators_batch(close, high, low)
+
+        state = IndicatorState()
+        state.seed(history.iloc[:60])
+        for i in range(60, 120):
+            bar = history.iloc[i]
+            snapshot = state.update(bar["最高"], bar["最低"], bar["收盘"], bar["时间"])
+            for name, values in batch.items():
+                np.testing.assert_allclose(snapshot[name], values[0, i], rtol=1e-9, atol=1e-9,
+                                           equal_nan=True, err_msg=f"{i} {name}")
+
+    def test_replace_last_bar_and_serialize(self):
+        """测试同一时间K线的替换更新以及状态序列化"""
+        import json
+        from nebula.core.streaming_indicators import IndicatorState
+
+        history = TestBatchIndicators()._random_history(3, 80)
+        expected = IndicatorState()
+        expected.seed(history)
+
+        state = IndicatorState()
+        state.seed(history.iloc[:-1])
+        last = history.iloc[-1]
+        # 盘中最后一根K线先以其他价格更新，收盘后再以最终价格替换
+        state.update(last["最高"] + 1, last["最低"], last["收盘"] + 1, last["时间"])
+        state.update(last["最高"] + 2, last["最低"] - 1, last["收盘"] - 1, last["时间"])
+        data = state.to_dict()
+        # 撤销记录只包含标量和被移出窗口的值，不复制整个窗口
+        assert len(json.dumps(data["undo"])) < len(json.dumps(data)) / 3
+        state = IndicatorState.from_dict(json.loads(json.dumps(data)))
+        snapshot = state.update(last["最高"], last["最低"], last["收盘"], last["时间"])
+        assert snapshot == expected.snapshot()
+        assert len(state.advice("600000")) == len(expected.advice("600000"))
+
+        # 兼容旧版本保存的完整上一状态
+        previous = IndicatorState()
+        previous.seed(history.iloc[:-1])
+        legacy = dict(data, previous=previous._state_dict())
+        del legacy["undo"]
+        state = IndicatorState.from_dict(json.loads(json.dumps(legacy)))
+        assert state.update(last["最高"], last["最低"], last["收盘"], last["时间"]) == expected.snapshot()
+
+    def test_save_and_load_state(self, tmp_path):
+        """测试指标状态保存到缓存和数据库后可以重新加载"""
+        from nebula.utils.database import DatabaseManager
+        from nebula.core import streaming_indicators
+        from nebula.core.streaming_indicators import IndicatorState, save_indicator_state, load_indicator_state
+
+        history = TestBatchIndicators()._random_history(5, 60)
+        state = IndicatorState()
+        state.seed(history)
+
+        db = DatabaseManager(str(tmp_path / "state.db"))
+        with patch.object(streaming_indicators, "db_manager", db):
+            assert save_indicator_state("600000", state)
+            streaming_indicators.cache_manager.delete("indicator_state_600000_daily")
+            loaded = load_indicator_state("600000")
+            frame = streaming_indicators.load_indicator_frame()
+        assert loaded.snapshot() == state.snapshot()
+        assert frame["代码"].tolist() == ["600000"] and frame.loc[0, "EMA20"] == state.snapshot()["EMA20"]
+        assert loaded.last_time == history["时间"].iloc[-1]
+
+class TestDataAPI:
+    HISTORY_RESPONSE = {
+        "data": {
+            "klines": [
+                "2023-07-03,22.10,22.30,22.50,22.00,100000,223000000.0,2.26,0.90,0.20,0.04",
+                "2023-07-04,22.30,22.20,22.40,22.10,90000,200000000.0,1.35,-0.45,-0.10,0.04",
+            ]
+        }
+    }
+
+    def test_history_outputs(self):
+        """测试历史行情按DataFrame、结构化数组和紧凑JSON输出"""
+        import numpy as np
+        from nebula import data
+
+        mock_response = Mock()
+        mock_response.json.return_value = self.HISTORY_RESPONSE
+        with patch('nebula.core.history_quote.http_transport.get', return_value=mock_response):
+            frame = data.history("600900", "daily", "2023-07-01", "2023-07-10", use_cache=False, save_to_db=False)
+            array = data.history("600900", "daily", "2023-07-01", "2023-07-10", use_cache=False, save_to_db=False,
+                                 output='array')
+            compact = data.history("600900", "daily", "2023-07-01", "2023-07-10", use_cache=False, save_to_db=False,
+                                   output='json')
+
+        assert str(frame["时间"].dtype).startswith("datetime64")
+        assert frame["收盘"].dtype == np.float64
+        assert frame["收盘"].tolist() == [22.30, 22.20]
+
+        assert isinstance(array, np.ndarray) and array.dtype.names == tuple(frame.columns)
+        assert array["时间"][0] == np.datetime64("2023-07-03")
+        assert array["成交量"].tolist() == [100000, 90000]
+
+        assert "\n" not in compact
+        rows = json.loads(compact)
+        assert rows[0]["时间"].startswith("2023-07-03") and rows[1]["收盘"] == 22.20
+
+    def test_realtime_quotes_frame_and_errors(self):
+        """测试批量行情的数值类型，以及类型化接口出错时抛出异常、字符串接口返回错误信息"""
+        import numpy as np
+        from nebula import data
+        from nebula.core.realtime_quote import get_stock_realtime_quotes
+        from nebula.utils.errors import NetworkError
+
+        def fake_request(url, params=None, timeout=None):
+            mock_response = Mock()
+            diff = [{"f12": secid.split(".")[1], "f14": "测试", "f2": 10.5, "f5": 1000, "f6": 1050000.0}
+                    for secid in params["secids"].split(",")]
+            mock_response.json.return_value = {"data": {"diff": diff}}
+            return mock_response
+
+        with patch('nebula.core.realtime_quote.make_request', side_effect=fake_request):
+            frame = data.realtime_quotes(["600900", "000001"], use_cache=False, save_to_db=False)
+            array = data.realtime_quotes(["600900", "000001"], use_cache=False, save_to_db=False, output='array')
+        assert frame["代码"].tolist() == ["600900", "000001"]
+        assert frame["最新"].dtype == np.float64 and frame["卖五价"].isna().all()
+        assert array.dtype["代码"] == np.dtype("U6") and array["最新"].tolist() == [10.5, 10.5]
+
+        with patch('nebula.core.realtime_quote.make_request', side_effect=NetworkError("网络错误")):
+            with pytest.raises(NetworkError):
+                data.realtime_quotes(["600900"], use_cache=False, save_to_db=False)
+            assert "error" in json.loads(get_stock_realtime_quotes(["600900"], use_cache=False, save_to_db=False))
+
+        with pytest.raises(ValueError):
+            data.convert(frame, 'xml')
+
+class TestSubscriptions:
+    @staticmethod
+    def quotes(prices):
+        import pandas as pd
+        return pd.DataFrame({"代码": list(prices), "名称": ["股票" + code for code in prices],
+                             "最新": [price for price, _ in prices.values()],
+                             "总手": [volume for _, volume in prices.values()],
+                             "买一价": [float("nan")] * len(prices)})
+
+    def test_shared_poll_and_field_diffs(self):
+        """测试多个订阅共享一次轮询，只推送发生变化的字段"""
+        from nebula.core.subscriptions import SubscriptionManager
+
+        states = [
+            {"600900": (22.1, 100), "000001": (11.0, 50), "600519": (1500.0, 10)},
+            {"600900": (22.2, 100), "000001": (11.0, 50), "600519": (1500.0, 12)},
+            {"600900": (22.2, 100), "000001": (11.0, 50), "600519": (1500.0, 12)},
+        ]
+        requested = []
+
+        def fetcher(symbols):
+            requested.append(symbols)
+            state = states[min(len(requested), len(states)) - 1]
+            return self.quotes({code: state[code] for code in symbols})
+
+        manager = SubscriptionManager(interval=60, fetcher=fetcher, autostart=False)
+        a = manager.subscribe(["600900", "000001"])
+        b = manager.subscribe(["600900", "600519"])
+
+        manager.poll_once()
+        assert requested == [["600900", "000001", "600519"]]
+        first = a.get(timeout=1)
+        assert set(first) == {"600900", "000001"}
+        assert first["600900"] == {"名称": "股票600900", "最新": 22.1, "总手": 100, "买一价": None}
+        assert set(b.get(timeout=1)) == {"600900", "600519"}
+
+        changes = manager.poll_once()
+        assert changes == {"600900": {"最新": 22.2}, "600519": {"总手": 12}}
+        assert a.get(timeout=1) == {"600900": {"最新": 22.2}}
+        assert b.get(timeout=1) == {"600900": {"最新": 22.2}, "600519": {"总手": 12}}
+
+        # 没有变化时不推送
+        assert manager.poll_once() == {}
+        assert a.get(timeout=0.01) is None
+
+        # 新订阅先收到已有的完整行情；取消订阅后不再轮询不再关注的股票
+        c = manager.subscribe(["600519"])
+        assert c.get(timeout=1)["600519"]["总手"] == 12
+        a.close()
+        manager.poll_once()
+        assert requested[-1] == ["600900", "600519"]
+        assert a.get() is None and list(a) == []
+        assert manager.stats()['subscriptions'] == 2
+
+    def test_callback_and_scheduler(self):
+        """测试调度线程按间隔轮询并调用回调，全部取消订阅后线程退出"""
+        import threading
+        from nebula.core.subscriptions import SubscriptionManager
+
+        prices = iter(range(1000))
+        received = []
+        got_three = threading.Event()
+
+        def fetcher(symbols):
+            return self.quotes({"600900": (float(next(prices)), 100)})
+
+        def callback(changes):
+            received.append(changes)
+            if len(received) >= 3:
+                got_three.set()
+
+        manager = SubscriptionManager(interval=0.01, fetcher=fetcher)
+        subscription = manager.subscribe(["600900"], callback=callback)
+        assert got_three.wait(2)
+        subscription.close()
+        assert received[1] == {"600900": {"最新": 1.0}}
+
+        thread = manager._thread
+        if thread is not None:
+            thread.join(1)
+        assert manager._thread is None
+
+    def test_async_iteration(self):
+        """测试异步迭代订阅"""
+        import asyncio
+        from nebula.core.subscriptions import SubscriptionManager
+
+        manager = SubscriptionManager(interval=60, fetcher=lambda symbols: self.quotes({"600900": (22.1, 100)}),
+                                      autostart=False)
+
+        async def main():
+            subscription = manager.subscribe(["600900"])
+            updates = []
+
+            async def consume():
+                async for changes in subscription:
+                    updates.append(changes)
+
+            task = asyncio.create_task(consume())
+            await asyncio.sleep(0)
+            await asyncio.get_running_loop().run_in_executor(None, manager.poll_once)
+            await asyncio.sleep(0.05)
+            subscription.close()
+            await asyncio.wait_for(task, 1)
+            return updates
+
+        updates = asyncio.run(main())
+        assert len(updates) == 1 and updates[0]["600900"]["最新"] == 22.1
+
 # 测试配置模块
 class TestConfig:
     def test_config_defaults(self):
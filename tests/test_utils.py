@@ -35,6 +35,800 @@ class TestCache:
         assert cache.exists("test_key2") == True
         assert cache.exists("nonexistent_key") == False
 
+    def test_local_cache_lru_and_budget(self):
+        """测试进程内缓存的LRU淘汰、大小限制和过期"""
+        import time
+        from nebula.utils.cache import LocalCache
+
+        cache = LocalCache(max_items=2, max_bytes=10)
+        cache.set("a", "1111", 60)
+        cache.set("b", "2222", 60)
+        assert cache.get("a") == "1111"
+        cache.set("c", "3333", 60)  # 条目数超限，淘汰最久未使用的 b
+        assert cache.get("b") is None
+        cache.set("d", "444444", 60)  # 大小超限，淘汰 a
+        assert cache.get("a") is None and cache.get("d") == "444444"
+        assert cache.size <= 10
+        assert cache.set("big", "x" * 11, 60) is False
+
+        cache.set("e", "5", 0.01)
+        time.sleep(0.02)
+        assert cache.get("e") is None
+        stats = cache.stats()
+        assert stats["evictions"] == 3 and stats["hits"] == 2
+
+        # 大小按UTF-8字节数计算：4个汉字占12字节，超过10字节的上限
+        assert cache.set("cn", "长江电力", 60) is False
+        assert cache.set("cn", "长江", 60) is True and cache.stats()["bytes"] <= 10
+
+    def test_two_tier_cache(self):
+        """测试L1位于Redis之前，并在收到其他进程的失效通知时清除"""
+        import json
+        from unittest.mock import MagicMock
+        from nebula.utils.cache import CacheManager
+
+        import time
+        cache = CacheManager()
+        redis_client = MagicMock()
+        pipe = redis_client.pipeline.return_value
+        # GET 与 PTTL 在同一次往返中执行，Redis中的条目还剩2秒过期
+        pipe.execute.side_effect = [[json.dumps({"v": 1}), 2000], [True, 1]]
+        cache.redis_client = redis_client
+
+        assert cache.get("k") == {"v": 1}
+        assert cache.get("k") == {"v": 1}
+        assert pipe.get.call_count == 1
+        assert cache.stats()["l1"]["hits"] == 1 and cache.stats()["l2"]["hits"] == 1
+        # L1条目不晚于Redis中的条目过期
+        assert cache.l1._entries["k"][1] - time.time() <= 2
+
+        # 本进程发出的通知不影响本地条目，其他进程的通知会清除
+        cache._handle_invalidation({"data": cache._invalidation_message("k")})
+        assert cache.l1.get("k") is not None
+        cache._handle_invalidation({"data": json.dumps({"origin": "other", "keys": ["k"]})})
+        assert cache.l1.get("k") is None
+
+        assert cache.set("k2", [1, 2], ttl=600) is True
+        redis_client.pipeline.return_value.publish.assert_called_once()
+        assert cache.l1._entries["k2"][1] - time.time() <= cache.l1_ttl
+
+    def test_batch_operations(self):
+        """测试批量缓存操作在本地缓存和Redis上各只需一次往返"""
+        import json
+        from unittest.mock import MagicMock
+        from nebula.utils.cache import CacheManager
+
+        cache = CacheManager()
+        cache.redis_client = None
+        assert cache.set_many({"a": 1, "b": [2], "c": {"x": 3}}) is True
+        assert cache.get_many(["a", "b", "missing", "c"]) == {"a": 1, "b": [2], "c": {"x": 3}}
+        assert cache.delete_many(["a", "b", "missing"]) == 2
+        assert cache.get_many(["a", "c"]) == {"c": {"x": 3}}
+
+        import time
+        redis_client = MagicMock()
+        pipe = redis_client.pipeline.return_value
+        # MGET 和各键的 PTTL 在同一次往返中执行
+        pipe.execute.side_effect = [[[json.dumps(1), None], 1500, -2], [True, True, 1]]
+        cache.redis_client = redis_client
+        cache.l1.clear()
+        # c 仍在L1中，只有 k1、k2 需要访问Redis
+        cache.l1.set("c", json.dumps({"x": 3}), 60)
+        assert cache.get_many(["k1", "k2", "c"]) == {"k1": 1, "c": {"x": 3}}
+        pipe.mget.assert_called_once_with(["k1", "k2"])
+        assert cache.stats()["l2"] == {"hits": 1, "misses": 1}
+        assert cache.l1._entries["k1"][1] - time.time() <= 1.5
+
+        assert cache.set_many({"k3": 3, "k4": 4}, ttl=30) is True
+        assert pipe.setex.call_count == 2
+        assert pipe.execute.call_count == 2
+
+    def test_stale_while_revalidate(self):
+        """测试软过期后立即返回旧值并在后台刷新"""
+        import threading
+        from nebula.utils.cache import CacheManager
+
+        cache = CacheManager()
+        cache.redis_client = None
+        refreshed = threading.Event()
+        loads = []
+
+        def loader():
+            loads.append(1)
+            refreshed.set()
+            return {"version": len(loads)}
+
+        # 不存在时同步加载
+        assert cache.get_or_refresh("swr", loader, ttl=60) == {"version": 1}
+        assert cache.get_or_refresh("swr", loader, ttl=60) == {"version": 1}
+        assert len(loads) == 1
+
+        # 软过期后返回旧值，后台刷新
+        cache.set_with_stale("swr", {"version": 0}, ttl=0, stale_ttl=60)
+        refreshed.clear()
+        assert cache.get_or_refresh("swr", loader, ttl=60) == {"version": 0}
+        assert refreshed.wait(5)
+        cache._refresh_executor.shutdown(wait=True)
+        cache._refresh_executor = None
+        assert cache.get("swr") == {"version": 2}
+
+        # 刷新失败时保留旧值
+        def failing():
+            raise RuntimeError("upstream down")
+        cache.set_with_stale("swr", {"version": 0}, ttl=0, stale_ttl=60)
+        assert cache.get_or_refresh("swr", failing) == {"version": 0}
+        cache._refresh_executor.shutdown(wait=True)
+        cache._refresh_executor = None
+        # 旧值只由 get_or_refresh 返回，普通读取视为未命中
+        assert cache.get("swr") is None
+        assert cache.get_many(["swr"]) == {}
+        assert cache.exists("swr") is False
+        assert cache.get_or_refresh("swr", failing) == {"version": 0}
+        cache._refresh_executor.shutdown(wait=True)
+        stats = cache.stats()["swr"]
+        assert stats["stale"] == 3 and stats["refreshes"] == 1 and stats["refresh_errors"] == 2
+
+    def test_refresh_lock_release_checks_token(self):
+        """测试后台刷新结束时只通过比较删除释放自己持有的跨进程刷新锁"""
+        from unittest.mock import MagicMock
+        from nebula.utils.cache import CacheManager, RELEASE_SCRIPT
+
+        cache = CacheManager()
+        redis_client = MagicMock()
+        redis_client.set.return_value = True
+        cache.redis_client = redis_client
+        cache.set_with_stale = MagicMock()
+
+        cache._schedule_refresh("swr", lambda: {"version": 1}, 60, 60)
+        cache._refresh_executor.shutdown(wait=True)
+
+        token = redis_client.set.call_args.args[1]
+        redis_client.eval.assert_called_once_with(RELEASE_SCRIPT, 1, "swr_refresh:swr", token)
+        redis_client.delete.assert_not_called()
+
+# 测试交易日历和缓存过期策略
+class TestTradingCalendar:
+    def test_phases(self):
+        """测试交易时段划分、节假日和开收盘时间"""
+        from datetime import datetime
+        from nebula.utils.trading_calendar import TradingCalendar, CN_TZ
+
+        calendar = TradingCalendar(holidays=["2024-10-01"])
+        assert calendar.phase(datetime(2024, 9, 30, 9, 20)) == "call_auction"
+        assert calendar.phase(datetime(2024, 9, 30, 9, 27)) == "pre_open"
+        assert calendar.phase(datetime(2024, 9, 30, 10, 0)) == "continuous"
+        assert calendar.phase(datetime(2024, 9, 30, 12, 0)) == "lunch_break"
+        assert calendar.phase(datetime(2024, 9, 30, 14, 58)) == "closing_auction"
+        assert calendar.phase(datetime(2024, 9, 30, 15, 0)) == "closed"
+        assert calendar.phase(datetime(2024, 10, 1, 10, 0)) == "closed"  # 节假日
+        assert calendar.phase(datetime(2024, 9, 28, 10, 0)) == "closed"  # 周六
+        # 其他时区的时间按北京时间判断：UTC 02:00 即北京时间 10:00
+        assert calendar.phase(datetime.fromisoformat("2024-09-30T02:00:00+00:00")) == "continuous"
+
+        assert calendar.next_open(datetime(2024, 9, 30, 16, 0)) == datetime(2024, 10, 2, 9, 15, tzinfo=CN_TZ)
+        assert calendar.last_close(datetime(2024, 10, 1, 10, 0)) == datetime(2024, 9, 30, 15, 0, tzinfo=CN_TZ)
+        assert calendar.next_phase_change(datetime(2024, 9, 30, 12, 0)) == datetime(2024, 9, 30, 13, 0, tzinfo=CN_TZ)
+
+    def test_ttl_policy(self):
+        """测试按交易时段计算的缓存过期时间"""
+        from datetime import datetime
+        from nebula.utils.trading_calendar import TradingCalendar, TTLPolicy
+
+        policy = TTLPolicy(TradingCalendar(holidays=[]), overrides={"realtime": {"trading": 5}})
+        trading = datetime(2024, 9, 30, 10, 0)
+        lunch = datetime(2024, 9, 30, 12, 0)
+        evening = datetime(2024, 9, 30, 20, 0)
+
+        assert policy.ttl("realtime", now=trading) == 5
+        assert policy.ttl("realtime", now=lunch) == 3600
+        assert policy.ttl("realtime", now=evening) == 6 * 3600  # 距开盘13.25小时，受 idle_max 限制
+        assert policy.ttl("history", now=trading) == 60
+        # 区间在最近一次收盘之前，缓存到下一个交易日开盘
+        assert policy.ttl("history", end="2024-09-27", now=trading) == 23 * 3600 + 15 * 60
+        assert policy.ttl("history", end="2024-09-30", now=trading) == 60
+        assert policy.ttl("history", end="2024-09-30", now=evening) == 13 * 3600 + 15 * 60
+
+# 测试请求合并
+class TestSingleFlight:
+    def test_concurrent_calls_collapsed(self):
+        """测试同一键的并发调用只执行一次并共享结果"""
+        import threading
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from nebula.utils.singleflight import SingleFlight
+
+        flight = SingleFlight(redis_client=False)
+        calls = []
+        started = threading.Event()
+
+        def load():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return "value"
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            leader = pool.submit(flight.do, "key", load)
+            started.wait()
+            followers = [pool.submit(flight.do, "key", load) for _ in range(7)]
+            results = [leader.result()] + [f.result() for f in followers]
+
+        assert results == ["value"] * 8
+        assert len(calls) == 1
+        stats = flight.stats()
+        assert stats["calls"] == 8 and stats["executions"] == 1 and stats["collapsed"] == 7
+
+        # 异常同样传递给等待的调用方，之后的调用重新执行
+        def fail():
+            raise ValueError("boom")
+        with pytest.raises(ValueError):
+            flight.do("key", fail)
+        assert flight.do("key", lambda: "again") == "again"
+
+    def test_cross_process_lock(self):
+        """测试未获得跨进程锁时等待锁释放后再加载"""
+        from unittest.mock import MagicMock
+        from nebula.utils.singleflight import SingleFlight
+
+        redis_client = MagicMock()
+        redis_client.set.return_value = None  # 锁已被其他进程持有
+        redis_client.exists.side_effect = [1, 1, 0]
+        flight = SingleFlight(poll_interval=0.001, redis_client=redis_client)
+
+        assert flight.do("key", lambda: "cached") == "cached"
+        assert redis_client.exists.call_count == 3
+        assert flight.stats()["remote_waits"] == 1
+
+        redis_client.set.return_value = True
+        assert flight.do("key", lambda: "fresh") == "fresh"
+        redis_client.eval.assert_called_once()
+
+# 测试HTTP传输层
+class TestHttpTransport:
+    def test_connection_reuse(self):
+        """测试同一主机的多次请求复用连接"""
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from nebula.utils.http import HttpTransport
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                body = b'{"data": {}}'
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            transport = HttpTransport(pool_maxsize=2, connect_timeout=2, read_timeout=2)
+            url = f"http://127.0.0.1:{server.server_port}/api"
+            for _ in range(5):
+                assert transport.get(url).json() == {"data": {}}
+
+            stats = transport.stats()
+            assert stats['requests'] == 5
+            assert stats['connections'] == 1
+            assert stats['reused'] == 4
+            transport.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+# 测试客户端限流
+class TestRateLimit:
+    def test_aimd_concurrency_and_queue_depth(self):
+        """测试并发上限的加性增、乘性减，以及排队深度和等待超时"""
+        import threading
+        import time
+        from nebula.utils.rate_limit import HostLimiter, RateLimitTimeout
+
+        limiter = HostLimiter(rate=1000, burst=1000, initial_concurrency=2, min_concurrency=1,
+                              max_concurrency=4, cooldown=60)
+        limiter.acquire()
+        limiter.acquire()
+        with pytest.raises(RateLimitTimeout):
+            limiter.acquire(timeout=0.05)
+
+        waiter = threading.Thread(target=limiter.acquire)
+        waiter.start()
+        time.sleep(0.05)
+        assert limiter.stats()['waiting'] == 1 and limiter.stats()['in_flight'] == 2
+
+        # 正常响应：上限 2 -> 2.5，等待中的请求获得许可
+        limiter.release()
+        waiter.join(1)
+        assert not waiter.is_alive()
+        assert limiter.stats()['waiting'] == 0 and limiter.limit == 2.5
+
+        # 过载减半，冷却时间内再次过载不重复减小
+        limiter.release(overloaded=True)
+        limiter.release(overloaded=True)
+        stats = limiter.stats()
+        assert limiter.limit == 1.25 and stats['in_flight'] == 0
+        assert (stats['successes'], stats['overloads'], stats['timeouts']) == (1, 2, 1)
+
+        for _ in range(100):
+            limiter.acquire()
+            limiter.release()
+        assert limiter.limit == 4
+
+    def test_acquire_async(self):
+        """测试异步获取许可时排队等待，不阻塞事件循环"""
+        import asyncio
+        from nebula.utils.rate_limit import HostLimiter
+
+        limiter = HostLimiter(rate=1000, burst=1000, initial_concurrency=1, min_concurrency=1, max_concurrency=1)
+        order = []
+
+        async def worker(name):
+            await limiter.acquire_async(timeout=1)
+            order.append(f"{name}-start")
+            await asyncio.sleep(0.02)
+            order.append(f"{name}-end")
+            limiter.release()
+
+        async def main():
+            await asyncio.gather(worker("a"), worker("b"))
+
+        asyncio.run(main())
+        assert order == ["a-start", "a-end", "b-start", "b-end"]
+        assert limiter.stats()['in_flight'] == 0
+
+    def test_token_bucket_rate(self):
+        """测试令牌用完后按速率放行"""
+        import time
+        from nebula.utils.rate_limit import HostLimiter
+
+        limiter = HostLimiter(rate=50, burst=2, initial_concurrency=10, min_concurrency=1, max_concurrency=10)
+        start = time.monotonic()
+        for _ in range(7):
+            limiter.acquire()
+            limiter.release()
+        # 前2个请求使用突发容量，其余5个按每秒50个放行，约0.1秒
+        assert time.monotonic() - start >= 0.09
+        assert limiter.stats()['throttled'] == 5
+
+    def test_transport_backs_off_on_429(self):
+        """测试传输层遇到429时减小并发上限，恢复后逐步增大"""
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from nebula.utils.http import HttpTransport
+        from nebula.utils.rate_limit import RateLimiter
+
+        responses = [429, 503] + [200] * 10
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status = responses.pop(0)
+                body = b'{}'
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            limiter = RateLimiter(enabled=True, rate=1000, burst=1000, initial_concurrency=8,
+                                  min_concurrency=1, max_concurrency=16, max_wait=1)
+            transport = HttpTransport(connect_timeout=2, read_timeout=2, limiter=limiter)
+            url = f"http://127.0.0.1:{server.server_port}/api"
+            statuses = [transport.get(url).status_code for _ in range(2)]
+            host = f"127.0.0.1:{server.server_port}"
+            backed_off = transport.stats()['rate_limits'][host]
+            for _ in range(10):
+                transport.get(url)
+            recovered = transport.stats()['rate_limits'][host]
+            transport.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert statuses == [429, 503]
+        # 两次过载在冷却时间内只减半一次
+        assert backed_off['limit'] == 4 and backed_off['overloads'] == 2
+        assert recovered['limit'] > 4 and recovered['successes'] == 10 and recovered['in_flight'] == 0
+
+# 测试镜像主机池
+class TestHostPool:
+    def _start_server(self, name, delay):
+        """启动返回主机名的本地服务，delay[0] 为注入的响应延迟（秒）"""
+        import threading
+        import time
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                time.sleep(delay[0])
+                body = f'{{"host": "{name}"}}'.encode()
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def _transport(self, pool):
+        from nebula.utils.http import HttpTransport
+        from nebula.utils.rate_limit import RateLimiter
+        return HttpTransport(connect_timeout=2, read_timeout=2, limiter=RateLimiter(enabled=False), pools=[pool])
+
+    def test_prefers_fast_host_and_fails_over(self):
+        """测试按延迟EWMA选择主机，主机不可用时换主机重试并熔断"""
+        from nebula.utils.host_pool import HostPool, OPEN
+
+        fast, slow = self._start_server("fast", [0.0]), self._start_server("slow", [0.05])
+        fast_host, slow_host = f"127.0.0.1:{fast.server_port}", f"127.0.0.1:{slow.server_port}"
+        pool = HostPool([f"http://{fast_host}", f"http://{slow_host}"], failure_threshold=2,
+                        reset_timeout=60, hedge=False)
+        transport = self._transport(pool)
+        try:
+            # URL中的主机只用于匹配主机池，实际请求的主机由主机池选择
+            url = f"http://{slow_host}/api/qt/stock/get"
+            hosts = [transport.get(url).json()["host"] for _ in range(10)]
+            # 都没有样本时按配置顺序，之后没有样本的主机排在已测主机之后
+            assert hosts == ["fast"] * 10
+            assert pool.stats()['hosts'][slow_host]['requests'] == 0
+
+            fast.shutdown()
+            fast.server_close()
+            # 断开长连接，之后连接该主机会被拒绝
+            transport.close()
+            assert [transport.get(url).json()["host"] for _ in range(4)] == ["slow"] * 4
+            stats = pool.stats()
+            assert stats['hosts'][fast_host]['state'] == OPEN
+            # 熔断后不再先尝试不可用的主机
+            assert stats['failovers'] == 2 and stats['hosts'][fast_host]['errors'] == 2
+        finally:
+            transport.close()
+            slow.shutdown()
+            slow.server_close()
+
+    def test_select_unsampled_hosts_with_prior(self):
+        """测试没有样本的主机以已测主机EWMA的均值作为先验排序"""
+        from nebula.utils.host_pool import HostPool
+
+        pool = HostPool(["https://a.example.com", "https://b.example.com", "https://c.example.com"])
+        assert pool.select() == ["a.example.com", "b.example.com", "c.example.com"]
+        pool.record("b.example.com", 0.3, ok=True)
+        assert pool.select() == ["b.example.com", "a.example.com", "c.example.com"]
+        pool.record("c.example.com", 0.1, ok=True)
+        assert pool.select() == ["c.example.com", "a.example.com", "b.example.com"]
+
+    def test_half_open_trial(self):
+        """测试熔断超时后放行一个试探请求，成功则恢复"""
+        import time
+        from nebula.utils.host_pool import HostPool, CLOSED, OPEN, HALF_OPEN
+
+        pool = HostPool(["https://a.example.com", "https://b.example.com"], failure_threshold=1,
+                        reset_timeout=0.05)
+        pool.record("a.example.com", 0.01, ok=False)
+        assert pool.hosts["a.example.com"].state == OPEN
+        assert pool.select() == ["b.example.com"]
+
+        time.sleep(0.06)
+        assert pool.select() == ["b.example.com", "a.example.com"]
+        assert pool.hosts["a.example.com"].state == HALF_OPEN
+        pool.record("a.example.com", 0.01, ok=False)
+        assert pool.hosts["a.example.com"].state == OPEN
+
+        time.sleep(0.06)
+        pool.select()
+        pool.record("a.example.com", 0.01, ok=True)
+        assert pool.hosts["a.example.com"].state == CLOSED
+
+    def test_hedged_request(self):
+        """测试首选主机超过p95延迟仍未返回时，向第二个主机发送对冲请求并采用先返回的结果"""
+        import time
+        from nebula.utils.host_pool import HostPool
+
+        delay_a = [0.0]
+        server_a, server_b = self._start_server("a", delay_a), self._start_server("b", [0.0])
+        host_a, host_b = f"127.0.0.1:{server_a.server_port}", f"127.0.0.1:{server_b.server_port}"
+        pool = HostPool([f"http://{host_a}", f"http://{host_b}"], hedge=True, min_hedge_delay=0.02,
+                        default_hedge_delay=0.02)
+        transport = self._transport(pool)
+        try:
+            for _ in range(10):
+                pool.record(host_a, 0.001, ok=True)
+                pool.record(host_b, 0.01, ok=True)
+            # 正常情况下首选主机在对冲等待时间内返回，不发送对冲请求
+            assert transport.get(f"http://{host_a}/api").json()["host"] == "a"
+            assert pool.stats()['hedges'] == 0
+
+            delay_a[0] = 0.5
+            start = time.monotonic()
+            assert transport.get(f"http://{host_a}/api").json()["host"] == "b"
+            assert time.monotonic() - start < 0.4
+            stats = pool.stats()
+            assert stats['hedges'] == 1 and stats['hedge_wins'] == 1
+
+            # 关闭对冲时等待首选主机返回
+            assert transport.get(f"http://{host_a}/api", hedge=False).json()["host"] == "a"
+        finally:
+            transport.close()
+            for server in (server_a, server_b):
+                server.shutdown()
+                server.server_close()
+
+    def test_hedged_request_fails_over_on_fast_failure(self):
+        """测试开启对冲时首选主机提前失败或返回5xx，立即换到第二个主机，两者都失败时继续尝试其余主机"""
+        import requests
+        from nebula.utils.host_pool import HostPool
+
+        def make_send(results):
+            calls = []
+
+            def send(method, url, **kwargs):
+                netloc = url.split("/")[2]
+                calls.append(netloc)
+                result = results[netloc]
+                if isinstance(result, Exception):
+                    raise result
+                response = requests.Response()
+                response.status_code = result
+                return response
+            return send, calls
+
+        for failure in (requests.ConnectionError("refused"), 502):
+            pool = HostPool(["https://a.example.com", "https://b.example.com"], hedge=True,
+                            default_hedge_delay=5, failure_threshold=10)
+            send, calls = make_send({"a.example.com": failure, "b.example.com": 200})
+            assert pool.request(send, "GET", "https://a.example.com/api").status_code == 200
+            assert calls == ["a.example.com", "b.example.com"]
+            assert pool.stats()['failovers'] == 1 and pool.stats()['hedges'] == 0
+
+        pool = HostPool(["https://a.example.com", "https://b.example.com", "https://c.example.com"],
+                        hedge=True, default_hedge_delay=5, failure_threshold=10)
+        send, calls = make_send({"a.example.com": 503, "b.example.com": 502, "c.example.com": 200})
+        assert pool.request(send, "GET", "https://a.example.com/api").status_code == 200
+        assert calls == ["a.example.com", "b.example.com", "c.example.com"]
+
+# 测试重试策略
+class TestRetryPolicy:
+    def test_nested_policies_retry_once(self):
+        """测试嵌套的重试策略只在最外层重试，尝试次数不相乘"""
+        import requests
+        from nebula.utils.retry import RetryPolicy, RetryBudget
+
+        budget = RetryBudget(ratio=1, min_per_sec=100)
+        calls = []
+
+        @RetryPolicy(max_retries=2, base_delay=0.001, budget=budget)
+        def inner():
+            calls.append(1)
+            raise requests.ConnectionError("down")
+
+        @RetryPolicy(max_retries=2, base_delay=0.001, budget=budget)
+        def outer():
+            return inner()
+
+        with pytest.raises(requests.ConnectionError):
+            outer()
+        assert len(calls) == 3
+
+    def test_deadline_bounds_retries(self):
+        """测试截止时间限制重试和退避的总耗时"""
+        import time
+        import requests
+        from nebula.utils.retry import RetryPolicy, RetryBudget, DeadlineExceeded
+
+        policy = RetryPolicy(max_retries=100, base_delay=0.05, max_delay=0.05,
+                             budget=RetryBudget(ratio=1, min_per_sec=1000))
+        calls = []
+
+        def fail():
+            calls.append(1)
+            raise requests.ConnectionError("down")
+
+        start = time.monotonic()
+        with pytest.raises((requests.ConnectionError, DeadlineExceeded)):
+            policy.call(fail, deadline=0.2)
+        assert time.monotonic() - start < 0.3
+        assert 1 < len(calls) < 100
+
+    def test_retry_budget(self):
+        """测试重试预算用完后不再重试"""
+        import requests
+        from nebula.utils.retry import RetryPolicy, RetryBudget
+
+        budget = RetryBudget(ratio=0.1, min_per_sec=0, max_balance=2)
+        policy = RetryPolicy(max_retries=5, base_delay=0.001, budget=budget)
+        calls = []
+
+        def fail():
+            calls.append(1)
+            raise requests.ConnectionError("down")
+
+        for _ in range(3):
+            with pytest.raises(requests.ConnectionError):
+                policy.call(fail)
+        # 第一次调用用完初始的2个重试，请求存入的令牌不足1个，之后每次调用只尝试一次
+        assert len(calls) == 5
+        stats = budget.stats()
+        assert stats['retries'] == 2 and stats['denied'] == 3
+
+    def test_transport_timeout_clamped_to_deadline(self):
+        """测试传输层的读取超时不超过截止时间，截止时间导致的超时不计入主机过载"""
+        import threading
+        import time
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from nebula.utils.http import HttpTransport
+        from nebula.utils.rate_limit import RateLimiter
+        from nebula.utils.retry import DeadlineExceeded, deadline_scope
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                time.sleep(0.5)
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Length", "2")
+                    self.end_headers()
+                    self.wfile.write(b'{}')
+                except (BrokenPipeError, ConnectionResetError):
+                    # 客户端已因截止时间断开
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            limiter = RateLimiter(enabled=True, rate=1000, burst=1000, initial_concurrency=8,
+                                  min_concurrency=1, max_concurrency=16, max_wait=1)
+            transport = HttpTransport(connect_timeout=2, read_timeout=30, limiter=limiter, pools=[])
+            url = f"http://127.0.0.1:{server.server_port}/api"
+            start = time.monotonic()
+            with pytest.raises(DeadlineExceeded):
+                with deadline_scope(0.1):
+                    transport.get(url)
+            assert time.monotonic() - start < 0.4
+            host_stats = transport.stats()['rate_limits'][f"127.0.0.1:{server.server_port}"]
+            assert host_stats['overloads'] == 0 and host_stats['in_flight'] == 0
+            transport.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+# 测试逐笔快照存储
+class TestTickStore:
+    def test_append_and_replay(self, tmp_path):
+        """测试按交易日追加定长记录，通过稀疏时间索引定位区间并按块回放"""
+        import numpy as np
+        from nebula.utils.tick_store import TickStore, TICK_DTYPE
+
+        store = TickStore(str(tmp_path), index_interval=60)
+        for second in range(0, 600, 3):
+            time = f"2026-10-16 09:{30 + second // 60:02d}:{second % 60:02d}"
+            store.append({"代码": ["600900", "000001"], "最新": [22.0 + second / 1000, 11.0],
+                          "总手": [second, second], "卖一价": [22.01, None]}, time)
+        store.append({"代码": ["600900"], "最新": [23.0]}, "2026-10-17 09:30:00")
+
+        assert store.days() == ["20261016", "20261017"]
+        assert (tmp_path / "20261016" / "ticks.bin").stat().st_size == 400 * TICK_DTYPE.itemsize
+        # 10分钟的数据，每分钟一个索引条目
+        assert (tmp_path / "20261016" / "index.bin").stat().st_size == 10 * 16
+
+        ticks = store.read("2026-10-16 09:31:30", "2026-10-16 09:32:00")
+        assert isinstance(ticks, np.memmap)
+        assert len(ticks) == 22 and ticks["volume"][0] == 90 and ticks["volume"][-1] == 120
+        assert np.isnan(ticks["ask1_price"][1]) and np.isnan(ticks["bid5_volume"]).all()
+
+        only = store.read("2026-10-16", "2026-10-17", symbols=["600900"])
+        assert len(only) == 201 and (only["symbol"] == b"600900").all()
+        assert only["last"][-1] == 23.0
+
+        chunks = list(store.replay(chunk_size=150))
+        assert [len(chunk) for chunk in chunks] == [150, 150, 100, 1]
+        frame = store.to_frame(chunks[-1])
+        assert frame.loc[0, "代码"] == "600900" and str(frame.loc[0, "时间"]) == "2026-10-17 09:30:00"
+        assert len(store.read("2026-10-18")) == 0
+
+    def test_recovers_interrupted_write(self, tmp_path):
+        """测试写入中断留下的不完整尾部在下次写入时被丢弃，时间保持有序"""
+        from nebula.utils.tick_store import TickStore
+
+        store = TickStore(str(tmp_path), index_interval=1)
+        store.append({"代码": ["600900"], "最新": [22.0]}, "2026-10-16 09:30:00")
+        with open(tmp_path / "20261016" / "ticks.bin", "ab") as f:
+            f.write(b"\x00" * 50)
+        with open(tmp_path / "20261016" / "index.bin", "ab") as f:
+            f.write(b"\x00" * 5)
+
+        reopened = TickStore(str(tmp_path), index_interval=1)
+        assert len(reopened.read()) == 1
+        reopened.append({"代码": ["600900"], "最新": [22.1]}, "2026-10-16 09:30:05")
+        # 早于最后时间的快照按最后时间记录
+        reopened.append({"代码": ["600900"], "最新": [22.2]}, "2026-10-16 09:29:00")
+        ticks = reopened.read("2026-10-16 09:30:01")
+        assert ticks["last"].tolist() == [22.1, 22.2]
+        assert (tmp_path / "20261016" / "index.bin").stat().st_size == 2 * 16
+
+    def test_default_timestamp_is_beijing_time(self, tmp_path):
+        """测试未指定时间时按当前北京时间记录，带时区的时间换算为北京时间"""
+        from datetime import datetime, timezone
+        from nebula.utils.tick_store import TickStore
+        from nebula.utils.trading_calendar import CN_TZ
+
+        store = TickStore(str(tmp_path))
+        now = datetime(2026, 10, 16, 9, 31, 0, tzinfo=CN_TZ)
+        with patch("nebula.utils.tick_store.trading_calendar.now", return_value=now):
+            store.append({"代码": ["600900"], "最新": [22.0]})
+        store.append({"代码": ["600900"], "最新": [22.1]}, datetime(2026, 10, 16, 1, 45, tzinfo=timezone.utc))
+
+        ticks = store.read("2026-10-16 09:30:00", "2026-10-16 10:00:00")
+        assert ticks["last"].tolist() == [22.0, 22.1]
+        assert str(store.to_frame(ticks).loc[0, "时间"]) == "2026-10-16 09:31:00"
+
+# 测试列式存储
+class TestColumnStore:
+    def _frame(self, times, closes):
+        import pandas as pd
+        return pd.DataFrame({"时间": times, "开盘": closes, "收盘": closes, "最高": closes,
+                             "最低": closes, "成交量": [100] * len(times), "成交额": [1000.0] * len(times)})
+
+    def test_append_merge_and_range_read(self):
+        """测试追加、合并写入和零拷贝区间读取"""
+        import numpy as np
+        from nebula.utils.column_store import ColumnStore
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = ColumnStore(tmp_dir)
+            assert store.get_latest_timestamp("600900") is None
+            assert store.save_history_frame("600900", self._frame(["2023-07-03", "2023-07-04"], [1.0, 2.0])) == 2
+            # 追加
+            assert store.save_history_frame("600900", self._frame(["2023-07-06"], [4.0])) == 1
+            # 与已有数据重叠时合并，相同时间以新数据为准
+            assert store.save_history_frame("600900", self._frame(["2023-07-04", "2023-07-05"], [2.5, 3.0])) == 2
+
+            arrays = store.read_range("600900", "2023-07-04", "2023-07-05")
+            assert isinstance(arrays["close"].base, np.memmap) or isinstance(arrays["close"], np.memmap)
+            assert arrays["close"].tolist() == [2.5, 3.0]
+
+            df = store.get_history_data("600900", start_date="2023-07-01")
+            assert df["时间"].tolist() == ["2023-07-03", "2023-07-04", "2023-07-05", "2023-07-06"]
+            assert store.get_latest_timestamp("600900") == "2023-07-06"
+
+            assert store.delete_history_data("600900", "2023-07-05") == 2
+            assert store.get_latest_timestamp("600900") == "2023-07-04"
+            # 不同周期互不影响
+            assert store.get_history_data("600900", period="weekly") is None
+
+    def test_minute_time_format(self):
+        """测试分钟数据按完整时间格式返回"""
+        from nebula.utils.column_store import ColumnStore
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = ColumnStore(tmp_dir)
+            store.save_history_frame("600900", self._frame(["2025-07-09 13:05:00", "2025-07-09 13:10:00"],
+                                                           [1.0, 2.0]), "5")
+            df = store.get_history_data("600900", "2025-07-09 13:06:00", "2025-07-09", period="5")
+            assert df["时间"].tolist() == ["2025-07-09 13:10:00"]
+
 # 测试数据库模块
 class TestDatabase:
     def test_database_manager_init(self):
@@ -52,5 +846,74 @@ class TestDatabase:
         assert conn is not None
         conn.close()
 
+    def test_save_stock_info_batch(self):
+        """测试批量保存股票信息"""
+        from nebula.utils.database import DatabaseManager
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = DatabaseManager(os.path.join(tmp_dir, "test.db"))
+            db.save_stock_info("600900", [{"item": "股票简称", "value": "长江电力"},
+                                          {"item": "行业", "value": "电力行业"}])
+
+            saved = db.save_stock_info_batch([{"symbol": "600900", "name": "长江电力"},
+                                              {"symbol": "000001", "name": "平安银行"}])
+            assert saved == 2
+
+            info = {item['item']: item['value'] for item in db.get_stock_info("600900")}
+            # 已有的行业信息不应被覆盖
+            assert info['行业'] == "电力行业"
+            assert db.get_stock_info("000001")[3]['value'] == 'SZ'
+
+    def test_migrate_legacy_history_tables(self):
+        """测试旧版行情表迁移为区分周期和复权方式的新表"""
+        import sqlite3
+        from nebula.utils.database import DatabaseManager
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, "legacy.db")
+            with sqlite3.connect(db_path) as conn:
+                conn.execute('''
+                    CREATE TABLE stock_history (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT, symbol TEXT, date TEXT,
+                        open REAL, high REAL, low REAL, close REAL, volume INTEGER, amount REAL,
+                        amplitude REAL, change_percent REAL, change_amount REAL, turnover_rate REAL,
+                        UNIQUE(symbol, date)
+                    )
+                ''')
+                conn.execute("INSERT INTO stock_history (symbol, date, close) VALUES ('600900', '2023-07-03', 22.3)")
+
+            db = DatabaseManager(db_path)
+            df = db.get_history_data("600900", period="daily")
+            assert df["收盘"].tolist() == [22.3]
+            assert db.save_history_data("600900", [{"时间": "2023-07-03", "开盘": 1, "最高": 1, "最低": 1,
+                                                     "收盘": 1, "成交量": 1, "成交额": 1}], "weekly") == 1
+            assert db.get_history_data("600900", period="daily")["收盘"].tolist() == [22.3]
+
+    def test_save_history_frame(self):
+        """测试按列批量写入历史行情"""
+        import pandas as pd
+        from nebula.utils.database import DatabaseManager
+
+        frame = pd.DataFrame({
+            "时间": ["2023-07-03", "2023-07-04", "2023-07-05"],
+            "开盘": [22.1, 22.3, None],
+            "收盘": [22.3, 22.2, 22.6],
+            "最高": [22.5, 22.4, 22.7],
+            "最低": [22.0, 22.1, 22.1],
+            "成交量": [100000, 90000, 95000],
+            "成交额": [2.23e8, 2.0e8, 2.1e8],
+        })
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = DatabaseManager(os.path.join(tmp_dir, "bulk.db"))
+            # 缺少必填字段的行被跳过，可选字段使用默认值
+            assert db.save_history_frame("600900", frame, "daily", batch_size=1) == 2
+            df = db.get_history_data("600900", period="daily")
+            assert df["时间"].tolist() == ["2023-07-03", "2023-07-04"]
+            assert df["成交量"].tolist() == [100000, 90000]
+            assert df["换手率"].tolist() == [0.0, 0.0]
+
+            with db.get_connection() as conn:
+                assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
 if __name__ == '__main__':
     pytest.main([__file__, "-v"])
\ No newline at end of file